@@ -5,4 +5,4 @@ from flask import Blueprint
 api_bp = Blueprint('api', __name__)
 
 from api import errors  # noqa: E402, F401
-from api.routes import discovery, projects, folders, files, reports, worker  # noqa: E402, F401
+from api.routes import admin, discovery, projects, folders, files, reports, worker  # noqa: E402, F401
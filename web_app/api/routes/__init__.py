@@ -1,2 +1,2 @@
 """Register API route modules."""
-from api.routes import discovery, projects, folders, files, reports, worker  # noqa: F401
+from api.routes import admin, discovery, projects, folders, files, reports, worker  # noqa: F401
@@ -0,0 +1,96 @@
+"""Admin-only operational API routes."""
+
+from flask import jsonify, request
+
+from cache import cache
+from logger import api_logger as logger
+
+from api import api_bp
+from api.auth import validate_api_key
+from osprey import apikeys, db
+
+
+def _require_admin(url):
+    """Return None for an admin api_key, else the (response, status) to send."""
+    api_key = request.values.get("api_key")
+    if api_key is None or api_key == "":
+        return jsonify({'error': 'api_key is missing'}), 400
+    valid_api_key, is_admin = validate_api_key(api_key, url=url, params=None)
+    if not valid_api_key or not is_admin:
+        return jsonify({'error': 'Forbidden'}), 403
+    return None
+
+
+@api_bp.route('/admin/db-stats', methods=['GET', 'POST'], strict_slashes=False, provide_automatic_options=False)
+def api_admin_db_stats():
+    """Query timing aggregates for this process (admin api_key required).
+
+    Lists endpoints by average queries per request, statement fingerprints by
+    total time, and the most recent requests. Pass ``reset=1`` to clear them.
+    """
+    denied = _require_admin('/admin/db-stats')
+    if denied is not None:
+        return denied
+    data = db.query_stats.snapshot()
+    data['slow_query_ms'] = db.SLOW_QUERY_MS
+    data['query_budget'] = db.QUERY_BUDGET
+    if request.values.get("reset") == "1":
+        db.query_stats.reset()
+        logger.info("api_admin_db_stats: stats reset")
+    return jsonify(data)
+
+
+@api_bp.route('/admin/db-pool', methods=['GET', 'POST'], strict_slashes=False, provide_automatic_options=False)
+def api_admin_db_pool():
+    """Connection pool usage for this process (admin api_key required).
+
+    In-use and peak connections, overflow use, borrow waits and how many
+    borrows gave up because the pool stayed exhausted.
+    """
+    denied = _require_admin('/admin/db-pool')
+    if denied is not None:
+        return denied
+    return jsonify(db.pool_stats())
+
+
+@api_bp.route('/admin/cache-stats', methods=['GET', 'POST'], strict_slashes=False, provide_automatic_options=False)
+def api_admin_cache_stats():
+    """Cache hits, misses and evictions per namespace for this process (admin api_key required).
+
+    Namespaces are the page cache, tag versions, stale-while-revalidate
+    entries and each memoized function. Also reports entries and bytes
+    held by the in-process and shared tiers. Pass ``reset=1`` to clear the
+    counters.
+    """
+    denied = _require_admin('/admin/cache-stats')
+    if denied is not None:
+        return denied
+    backend = cache.cache
+    stats = getattr(backend, 'stats', None)
+    if stats is None:
+        return jsonify({'error': 'Cache backend {} keeps no stats'.format(type(backend).__name__)}), 404
+    data = stats.snapshot()
+    data['size'] = backend.size()
+    if request.values.get("reset") == "1":
+        stats.reset()
+        logger.info("api_admin_cache_stats: stats reset")
+    return jsonify(data)
+
+
+@api_bp.route('/admin/api-keys/revoke', methods=['POST'], strict_slashes=False, provide_automatic_options=False)
+def api_admin_revoke_api_key():
+    """Deactivate the API key in ``key`` (admin api_key required).
+
+    It stops working on this process at once and on the others once their
+    cached entry expires (settings.api_key_cache_seconds).
+    """
+    denied = _require_admin('/admin/api-keys/revoke')
+    if denied is not None:
+        return denied
+    key = request.values.get("key")
+    if key is None or key == "":
+        return jsonify({'error': 'key is missing'}), 400
+    if apikeys.revoke(key) is False:
+        return jsonify({'error': 'Could not revoke the key'}), 500
+    logger.info("api_admin_revoke_api_key: key revoked")
+    return jsonify({"result": True})
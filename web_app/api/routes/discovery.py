@@ -19,7 +19,7 @@ def api_route_list():
     for rule in current_app.url_map.iter_rules():
         if not rule.rule.startswith('/api'):
             continue
-        if '/new/' in rule.rule or '/update/' in rule.rule:
+        if '/new/' in rule.rule or '/update/' in rule.rule or '/admin/' in rule.rule:
             continue
         if rule.rule in ('/api/reports/', '/api/reports/<report_id>/'):
             continue
@@ -1,6 +1,5 @@
 """Folder read API routes."""
 
-import pandas as pd
 from flask import jsonify, request
 
 from api import api_bp
@@ -64,8 +63,7 @@ def api_get_folder_details(folder_id=None):
 
     project_id = data['project_id']
     filechecks_list = folder_service.list_project_file_checks(project_id)
-    files_list = folder_service.list_folder_files_base(folder_id, transcription)
-    folder_files_df = pd.DataFrame(files_list)
+    folder_files_df = folder_service.list_folder_files_base(folder_id, transcription, result='dataframe')
     if not folder_files_df.empty and filechecks_list:
         folder_files_df = folder_service.attach_checks_flat(
             folder_files_df, folder_id, transcription, filechecks_list,
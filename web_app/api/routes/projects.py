@@ -1,20 +1,24 @@
 """Project read API routes."""
 
-from flask import jsonify, request
+import itertools
+
+from flask import Response, current_app, jsonify, request
 
-from cache import cache
 from logger import api_logger as logger
 
 from api import api_bp
 from api.auth import validate_api_key
+from osprey.conditional import conditional, project_validators, projects_validators
 from osprey.db import run_query
+from osprey.invalidation import publish
+from osprey.pagecache import cached_page, project_page_tags
 from osprey.services import folder_stats as folder_stats_service
 from osprey.services import folders as folder_service
 from osprey.services import projects as project_service
 
 
-@cache.memoize()
 @api_bp.route('/projects/', methods=['POST', 'GET'], strict_slashes=False, provide_automatic_options=False)
+@conditional(projects_validators)
 def api_get_projects():
     """Get the list of projects."""
     section = request.form.get("section")
@@ -26,8 +30,9 @@ def api_get_projects():
     return jsonify({"projects": projects_data, "last_update": last_update[0]['updated_at']})
 
 
-@cache.memoize()
 @api_bp.route('/projects/<project_alias>', methods=['POST', 'GET'], strict_slashes=False, provide_automatic_options=False)
+@conditional(project_validators)
+@cached_page(tags=project_page_tags)
 def api_get_project_details(project_alias=None):
     """Get project details and folder list by project_alias (used by the dashboard sidebar)."""
     logger.info("api_get_project_details called | project_alias={}".format(project_alias))
@@ -38,16 +43,35 @@ def api_get_project_details(project_alias=None):
     return jsonify({'error': 'Project was not found'}), 404
 
 
-@cache.memoize()
+def _json_array(batches, dumps):
+    """Serialize row batches as one JSON array, a batch at a time."""
+    yield '['
+    sep = ''
+    for rows in batches:
+        chunk = ','.join(dumps(row) for row in rows)
+        yield sep + chunk
+        sep = ','
+    yield ']'
+
+
 @api_bp.route('/projects/<project_alias>/files', methods=['POST', 'GET'], strict_slashes=False, provide_automatic_options=False)
+@conditional(project_validators)
 def api_get_project_files(project_alias=None):
-    """Get the list of files of a project by specifying the project_alias."""
+    """Get the list of files of a project by specifying the project_alias.
+
+    The list is streamed from the database so large projects are never held
+    in memory in full.
+    """
     logger.info("api_get_project_files called | project_alias={}".format(project_alias))
-    data = project_service.list_project_files(project_alias)
-    if len(data) == 0:
+    batches = project_service.iter_project_files(project_alias)
+    first = next(batches, None)
+    if first is None:
         logger.warning("api_get_project_files: no files found | project_alias={}".format(project_alias))
         return jsonify({'result': False}), 404
-    return jsonify(data)
+    return Response(
+        _json_array(itertools.chain([first], batches), current_app.json.dumps),
+        mimetype='application/json',
+    )
 
 
 @api_bp.route(
@@ -110,7 +134,7 @@ def api_recalculate_project_folder_stats(project_alias=None):
     except ValueError as err:
         return jsonify({'error': str(err)}), 400
 
-    cache.delete_memoized(api_get_project_details, project_alias)
+    publish(project_id, project_alias=project_alias, summary=True)
 
     return jsonify({
         'result': True,
@@ -1,13 +1,10 @@
 """API routes (auto-split from legacy app.py)."""
 import json
 import re
-import urllib.error
-import urllib.parse
-import urllib.request
 import uuid
 
 import pandas as pd
-from flask import current_app, jsonify, request
+from flask import current_app, jsonify, request, url_for
 
 import settings
 from cache import cache
@@ -15,12 +12,28 @@ from logger import api_logger as logger
 
 from api import api_bp
 from api.auth import validate_api_key
-from osprey.db import query_database_insert, run_query
+from osprey.db import batch, query_database_insert, run_query, stick_to_primary
+from osprey.idempotency import idempotent
+from osprey.invalidation import nothing_published, publish, publishes_changes
+from osprey.services import aspace as aspace_service
 from osprey.services import folder_stats as folder_stats_service
+from osprey.services import name_index as name_index_service
+from osprey.services import stats_jobs as stats_jobs_service
+from osprey.services.exif import exif_folders, exif_rows, parse_exif_entries, store_exif
 from osprey.services.file_checks import (
+    bulk_upsert_file_checks,
     filename_check_enabled,
+    parse_check_rows,
     run_filename_check,
 )
+from osprey.services.file_registration import parse_file_rows, register_files, unique_file_check
+
+# Largest JSON array accepted by the bulk worker endpoints.
+BULK_MAX_ROWS = getattr(settings, 'bulk_max_rows', 50000)
+
+# property=stats queues a debounced job instead of recalculating in the request.
+# Needs db/stats_jobs.sql and a running scripts/run_stats_jobs.py --loop.
+STATS_ASYNC = getattr(settings, 'stats_async', False)
 
 
 def _parse_preview_type(value):
@@ -45,8 +58,12 @@ def _upsert_preview_type_badge(fid, folder_id, badge_text, badge_css):
     )
 
 @api_bp.route('/update/<project_alias>', methods=['POST', 'GET'], strict_slashes=False, provide_automatic_options=False)
+@idempotent
+@publishes_changes
 def api_update_project_details(project_alias=None):
     """Update a project properties."""
+    # Worker calls read back what they write; keep them off the replica
+    stick_to_primary()
     # Check api_key
     api_key = request.form.get("api_key")
     if api_key is None or api_key == "":
@@ -80,13 +97,7 @@ def api_update_project_details(project_alias=None):
                 files_table = "files"
                 fileid = "file_id"
             if query_type == "startup":
-                query = (f"DELETE FROM folders_badges WHERE badge_type = 'verification' and {fid} in (SELECT {fid} from {folder_table} WHERE project_id = %(project_id)s)")
-                res = run_query(query, {'project_id': project_id}, return_val=False)
-                query = (f"DELETE FROM folders_badges WHERE badge_type = 'filename_spaces' and {fid} in (SELECT {fid} from {folder_table} WHERE project_id = %(project_id)s)")
-                res = run_query(query, {'project_id': project_id}, return_val=False)
-                query = (f"DELETE FROM folders_badges WHERE badge_type = 'folder_error' and {fid} in (SELECT {fid} from {folder_table} WHERE project_id = %(project_id)s)")
-                res = run_query(query, {'project_id': project_id}, return_val=False)
-                query = (f"DELETE FROM folders_badges WHERE badge_type = 'error_files' and {fid} in (SELECT {fid} from {folder_table} WHERE project_id = %(project_id)s)")
+                query = (f"DELETE FROM folders_badges WHERE badge_type IN ('verification', 'filename_spaces', 'folder_error', 'error_files') and {fid} in (SELECT {fid} from {folder_table} WHERE project_id = %(project_id)s)")
                 res = run_query(query, {'project_id': project_id}, return_val=False)
                 return jsonify({"result": True})
             elif query_type == "folder":
@@ -103,47 +114,48 @@ def api_update_project_details(project_alias=None):
                             res = run_query(query, {'folder_id': folder_id})
                             clear_badges = run_query("DELETE FROM folders_badges WHERE folder_id = %(folder_id)s and badge_type = 'folder_error'",
                                 {'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, clear_badges))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, clear_badges)
                     elif query_property == "status9":
                         query = (f"UPDATE {folder_table} SET status = 9, error_info = %(value)s WHERE {fid} = %(folder_id)s")
                         res = query_database_insert(query, {'value': query_value, 'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "status1":
                         if transcription == 1:
                             query = (f"UPDATE transcription_folders SET status = 1, error_info = %(value)s WHERE folder_transcription_id = %(folder_id)s")
                         else:
                             query = (f"UPDATE folders SET status = 1, error_info = %(value)s WHERE folder_id = %(folder_id)s")
                         res = query_database_insert(query, {'value': query_value, 'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                         clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'folder_error'",
                             {'folder_id': folder_id})
                         query = (f"INSERT INTO folders_badges ({fid}, badge_type, badge_css, badge_text, updated_at) VALUES (%(folder_id)s, 'folder_error', 'bg-danger', %(msg)s, CURRENT_TIMESTAMP) ON DUPLICATE KEY UPDATE badge_text = %(msg)s, badge_css = 'bg-danger', updated_at = CURRENT_TIMESTAMP")
                         res = query_database_insert(query, {'folder_id': folder_id, 'msg': query_value})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "checking_folder":
-                        # Clear badges
-                        clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'no_files'",
-                            {'folder_id': folder_id})
-                        clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'error_files'",
-                            {'folder_id': folder_id})
-                        clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'folder_raw_md5'",
-                            {'folder_id': folder_id})
-                        clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'folder_md5'",
-                            {'folder_id': folder_id})
-                        clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'verification'",
-                            {'folder_id': folder_id})
-                        clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'folder_error'",
-                            {'folder_id': folder_id})
-                        query = (f"INSERT INTO folders_badges ({fid}, badge_type, badge_css, badge_text, updated_at) VALUES (%(folder_id)s, 'verification', 'bg-secondary', 'Folder under verification...', CURRENT_TIMESTAMP)")
-                        res = query_database_insert(query, {'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
-                        if transcription == 1:
-                            query = ("UPDATE transcription_folders SET previews = 1 WHERE folder_transcription_id = %(folder_id)s")
-                        else:
-                            query = ("UPDATE folders SET previews = 1 WHERE folder_id = %(folder_id)s")
-                        res = query_database_insert(query, {'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        # Clear badges and flag the folder in one transaction
+                        with batch(multi=True) as tx:
+                            tx.add(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type IN "
+                                   "('no_files', 'error_files', 'folder_raw_md5', 'folder_md5', 'verification', 'folder_error')",
+                                {'folder_id': folder_id})
+                            query = (f"INSERT INTO folders_badges ({fid}, badge_type, badge_css, badge_text, updated_at) VALUES (%(folder_id)s, 'verification', 'bg-secondary', 'Folder under verification...', CURRENT_TIMESTAMP)")
+                            tx.add(query, {'folder_id': folder_id})
+                            if transcription == 1:
+                                query = ("UPDATE transcription_folders SET previews = 1 WHERE folder_transcription_id = %(folder_id)s")
+                            else:
+                                query = ("UPDATE folders SET previews = 1 WHERE folder_id = %(folder_id)s")
+                            tx.add(query, {'folder_id': folder_id})
+                        logger.info("query: update|%s|%s|%s|%s", query_type, query_property, query, folder_id)
                     elif query_property == "stats":
+                        if STATS_ASYNC:
+                            # Debounced: scripts/run_stats_jobs.py recalculates and publishes
+                            job_id = stats_jobs_service.enqueue(project_id, folder_id)
+                            if job_id is None:
+                                return jsonify({'error': 'Could not queue stats job'}), 500
+                            logger.info("query: update|%s|%s|stats_job|%s|%s", query_type, query_property, folder_id, job_id)
+                            # Nothing changed yet; the runner publishes once the stats are written
+                            nothing_published()
+                            return jsonify({"result": True, "job_id": job_id,
+                                            "status_url": url_for('api.api_stats_job_status', job_id=job_id)})
                         folder_stats_service.recalculate_folder_stats(
                             project_id, folder_id, transcription,
                         )
@@ -153,46 +165,42 @@ def api_update_project_details(project_alias=None):
                             )
                         except ValueError as err:
                             return jsonify({'error': str(err)}), 400
-                        logger.info(
-                            "query: update|{}|{}|folder_stats|{}".format(
-                                query_type, query_property, folder_id,
-                            )
-                        )
+                        logger.info("query: update|%s|%s|folder_stats|%s", query_type, query_property, folder_id)
                     elif query_property == "raw0":
                         query = ("INSERT INTO folders_md5 (folder_id, md5_type, md5) "
                                     " VALUES (%(folder_id)s, %(value)s, 0) ON DUPLICATE KEY UPDATE md5 = 0")
                         res = query_database_insert(query, {'value': query_value, 'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "raw1":
                         query = ("INSERT INTO folders_md5 (folder_id, md5_type, md5) "
                                     " VALUES (%(folder_id)s, %(value)s, 1) ON DUPLICATE KEY UPDATE md5 = 1")
                         res = query_database_insert(query, {'value': query_value, 'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "tif_md5_matches_error":
                         query = (f"INSERT INTO folders_badges ({fid}, badge_type, badge_css, badge_text, updated_at) VALUES (%(folder_id)s, 'folder_md5', 'bg-danger', %(value)s, CURRENT_TIMESTAMP) ON DUPLICATE KEY UPDATE badge_text = %(value)s, badge_css = 'bg-danger', updated_at = CURRENT_TIMESTAMP")
                         res = query_database_insert(query, {'folder_id': folder_id, 'value': query_value})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                         query = (f"UPDATE {folder_table} SET status = 1 WHERE {fid} = %(folder_id)s")
                         res = query_database_insert(query, {'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "tif_md5_matches_ok":
                         query = f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'folder_md5'"
                         clear_badges = run_query(query, {'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, clear_badges))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, clear_badges)
                         query = (f"INSERT INTO folders_badges ({fid}, badge_type, badge_css, badge_text, updated_at) VALUES (%(folder_id)s, 'folder_md5', 'bg-success', %(value)s, CURRENT_TIMESTAMP) ON DUPLICATE KEY UPDATE badge_text = %(value)s, badge_css = 'bg-success', updated_at = CURRENT_TIMESTAMP")
                         res = query_database_insert(query, {'folder_id': folder_id, 'value': 'MD5 Valid'})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "filename_spaces":
                         query = (f"INSERT INTO folders_badges ({fid}, badge_type, badge_css, badge_text, updated_at) VALUES (%(folder_id)s, 'filename_spaces', 'bg-danger', %(value)s, CURRENT_TIMESTAMP) ON DUPLICATE KEY UPDATE badge_text = %(value)s, badge_css = 'bg-danger', updated_at = CURRENT_TIMESTAMP")
                         res = query_database_insert(query, {'folder_id': folder_id, 'value': "Filenames Have Spaces"})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                         clear_badges = run_query(f"DELETE FROM folders_badges WHERE {fid} = %(folder_id)s and badge_type = 'verification'", {'folder_id': folder_id})
                         if transcription == 1:
                             query = ("UPDATE transcription_folders SET status = 1 WHERE folder_transcription_id = %(folder_id)s")
                         else:
                             query = ("UPDATE folders SET status = 1 WHERE folder_id = %(folder_id)s")
                         res = query_database_insert(query, {'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "previews":
                         if transcription == 1:
                             query = ("UPDATE transcription_folders SET previews = %(value)s WHERE folder_transcription_id = %(folder_id)s")
@@ -200,7 +208,7 @@ def api_update_project_details(project_alias=None):
                         else:
                             query = ("UPDATE folders SET previews = %(value)s WHERE folder_id = %(folder_id)s")
                             res = query_database_insert(query, {'folder_id': folder_id, 'value': query_value})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     elif query_property == "preview_type":
                         parsed = _parse_preview_type(query_value)
                         if parsed is None:
@@ -211,9 +219,9 @@ def api_update_project_details(project_alias=None):
                         else:
                             query = ("UPDATE folders SET preview_type = %(value)s WHERE folder_id = %(folder_id)s")
                         res = query_database_insert(query, {'folder_id': folder_id, 'value': preview_type})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                         res = _upsert_preview_type_badge(fid, folder_id, badge_text, badge_css)
-                        logger.info("query: update|{}|{}|badge|{}|{}".format(query_type, query_property, folder_id, res))
+                        logger.info("query: update|%s|%s|badge|%s|%s", query_type, query_property, folder_id, res)
                     elif query_property == "qc":
                         query = ("SELECT * FROM qc_folders WHERE folder_id = %(folder_id)s")
                         folder_qc = run_query(query, {'folder_id': folder_id})
@@ -235,7 +243,7 @@ def api_update_project_details(project_alias=None):
                             " VALUES (%(folder_id)s, 'qc_status', %(badge_css)s, %(qc_status)s, CURRENT_TIMESTAMP) ON DUPLICATE KEY UPDATE badge_text = %(qc_status)s,"
                             "       badge_css = %(badge_css)s, updated_at = CURRENT_TIMESTAMP")
                         res = query_database_insert(query, {'qc_status': qc_status, 'badge_css': badge_css, 'folder_id': folder_id})
-                        logger.info("query: update|{}|{}|{}|{}|{}".format(query_type, query_property, query, folder_id, res))
+                        logger.info("query: update|%s|%s|%s|%s|%s", query_type, query_property, query, folder_id, res)
                     else:
                         return jsonify({'error': 'Invalid operation'}), 401
                     return jsonify({"result": True})
@@ -251,14 +259,9 @@ def api_update_project_details(project_alias=None):
                                 " WHERE f.folder_transcription_id = fol.folder_transcription_id AND f.file_transcription_id != %(file_id)s AND f.folder_transcription_id != %(folder_id)s AND "
                                 " f.folder_transcription_id IN (SELECT folder_transcription_id from transcription_folders where project_id = %(project_id)s) and "
                                 "  f.file_name = finfo.file_name")
+                        res = run_query(query, {'file_id': file_id, 'folder_id': folder_id, 'project_id': project_id})
                     else:
-                        query = ("with fileinfo as (select * from files where file_id = %(file_id)s) "
-                                " SELECT f.file_id, fol.project_folder "
-                                " FROM files f, folders fol, fileinfo finfo " 
-                                " WHERE f.folder_id = fol.folder_id AND f.file_id != %(file_id)s AND f.folder_id != %(folder_id)s AND "
-                                " f.folder_id IN (SELECT folder_id from folders where project_id = %(project_id)s) and "
-                                "  f.file_name = finfo.file_name")
-                    res = run_query(query, {'file_id': file_id, 'folder_id': folder_id, 'project_id': project_id})
+                        res = name_index_service.same_name_in_project(project_id, file_id, folder_id)
                     if len(res) == 0:
                         check_results = 0
                         check_info = "File not found in the project"
@@ -289,15 +292,7 @@ def api_update_project_details(project_alias=None):
                         res = query_database_insert(query, {'file_id': file_id, 'folder_id': folder_id, 'check_results': check_results, 'check_info': check_info})
                 elif query_property == "unique_other":
                     # Check if file is unique across projects
-                    query = ("with fileinfo as (select * from files where file_id = %(file_id)s) "
-                                " SELECT f.file_id, fol.project_folder, fol.project_id "
-                                " FROM files f, folders fol, fileinfo finfo " 
-                                " WHERE f.folder_id = fol.folder_id AND "
-                                " f.file_id != %(file_id)s AND f.folder_id != %(folder_id)s AND "
-                                " f.folder_id NOT IN (SELECT folder_id from folders where project_id = %(project_id)s) and "
-                                "  f.file_name = finfo.file_name")
-                    res = run_query(query, {'file_id': file_id, 
-                                     'folder_id': folder_id, 'project_id': project_id})
+                    res = name_index_service.same_name_elsewhere(project_id, file_id)
                     if len(res) == 0:
                         check_results = 0
                         check_info = "File not found in the project"
@@ -350,42 +345,18 @@ def api_update_project_details(project_alias=None):
                                 projid = str(proj_res[0]['project_id'])
                                 logger.info(f"Project_id: {projid}.")
                                 if projid == "220" or projid == "248":
-                                    # JPCA
-                                    # Login to ASpace
+                                    # JPCA: salvage if the RefID is in ASpace (session and lookups cached)
                                     logger.info("Special process for JPCA.")
-                                    login_params = {"password": getattr(settings, 'aspace_api_password', None)}
-                                    login_url = "{}/users/{}/login?{}".format(
-                                        getattr(settings, 'aspace_api', None),
-                                        getattr(settings, 'aspace_api_username', None),
-                                        urllib.parse.urlencode(login_params),
-                                    )
-                                    try:
-                                        with urllib.request.urlopen(urllib.request.Request(login_url, method="POST")) as resp:
-                                            status_code = resp.status
-                                            reason = resp.reason
-                                            response_json = json.loads(resp.read().decode('utf-8'))
-                                    except urllib.error.HTTPError as err:
-                                        status_code = err.code
-                                        reason = err.reason
-                                        response_json = None
-                                    logger.info(f"ASpace r.status_code: {status_code}")
-                                    if status_code == 200:
-                                        logger.info("Success! Was able to get token")
-                                        session_token = response_json['session']
-                                        Headers = {"X-ArchivesSpace-Session": session_token}
-                                        lookup_url = f"{getattr(settings, 'aspace_api', None)}/repositories/2/find_by_id/archival_objects?ref_id[]={refid};resolve[]=archival_objects"
-                                        with urllib.request.urlopen(urllib.request.Request(lookup_url, headers=Headers)) as resp:
-                                            refid_exists = json.loads(resp.read().decode('utf-8'))
-                                        if len(refid_exists['archival_objects']) != 0:
-                                            if refid_exists['archival_objects'][0]['_resolved']['ref_id'] == refid:
-                                                query = ("insert into jpc_aspace_data (refid, table_id, resource_id, archive_box, archive_type, archive_folder, unit_title) with data as (select distinct SUBSTRING_INDEX(file_name, '_', 1) as refid from files where file_id = %(file_id)s) (select refid, uuid_v4s(), 'a', 'a', 'a', 'a', 'a' from data)")
-                                                logger.info(query)
-                                                res = query_database_insert(query, {'file_id': file_id})
-                                                logger.info("Inserted")
-                                                check_results = 0
-                                                check_info = refid
-                                    else:
-                                        logger.error("\n There was an error when loggin into ASpace: {}".format(reason))
+                                    client = aspace_service.get_client()
+                                    found = client.lookup(refid) if client is not None else None
+                                    logger.info("ASpace RefID %s found: %s", refid, found)
+                                    if found:
+                                        query = ("insert into jpc_aspace_data (refid, table_id, resource_id, archive_box, archive_type, archive_folder, unit_title) with data as (select distinct SUBSTRING_INDEX(file_name, '_', 1) as refid from files where file_id = %(file_id)s) (select refid, uuid_v4s(), 'a', 'a', 'a', 'a', 'a' from data)")
+                                        logger.info(query)
+                                        res = query_database_insert(query, {'file_id': file_id})
+                                        logger.info("Inserted")
+                                        check_results = 0
+                                        check_info = refid
                     if transcription == 1:
                         query = (
                             "INSERT INTO transcription_files_checks (file_transcription_id, file_check, check_results, check_info, updated_at) "
@@ -491,55 +462,14 @@ def api_update_project_details(project_alias=None):
                 elif query_property == "exif":
                     filetype = request.form.get("filetype")
                     data_json = json.loads(query_value)
-                    # exif_data = []
                     if transcription != 1:
-                        res = run_query(f"delete from files_exif where {fileid} = %(file_id)s;", {'file_id': file_id}, return_val=False)
-                        query = (f"INSERT INTO files_exif ({fileid}, filetype, taggroup, tag, tagid, value) "
-                                    " VALUES (%s, %s, %s, %s, %s, %s) "
-                                    " ON DUPLICATE KEY UPDATE value = %s")
-                        for key in data_json[0].keys():
-                            if key == 'SourceFile':
-                                continue
-                            else:
-                                if key.split(':')[0] == "System":
-                                    continue
-                                else:
-                                    for k, item in data_json[0][key].items():
-                                        if k == "id":
-                                            this_key = item
-                                        else:
-                                            if type(item) == 'list':
-                                                this_val = ', '.join(item)
-                                            else:
-                                                this_val = str(item)
-                                    row_data = (file_id, filetype, key.split(':')[0], key.split(':')[1], this_key, this_val, this_val)
-                                    res = query_database_insert(query, row_data)
-                        # Derive files.datetime_created from DateCreated EXIF tag.
-                        res = query_database_insert(
-                            """
-                            WITH data AS (
-                              SELECT file_id,
-                                     MAX(
-                                       STR_TO_DATE(
-                                         REPLACE(SUBSTRING(value, 1, 10), ':', '-'),
-                                         '%Y-%m-%d'
-                                       )
-                                     ) AS datetime_created
-                              FROM files_exif
-                              WHERE tag = 'DateCreated'
-                                AND file_id = %(file_id)s
-                              GROUP BY file_id
-                            )
-                            UPDATE files f, data
-                            SET f.datetime_created = data.datetime_created
-                            WHERE f.file_id = data.file_id
-                            """,
-                            {'file_id': file_id},
-                        )
+                        store_exif([{'file_id': file_id, 'filetype': filetype,
+                                     'rows': exif_rows(file_id, filetype, data_json)}])
                 elif query_property == "delete":
                     if transcription == 1:
                         query = ("DELETE FROM transcription_files WHERE file_transcription_id = %(file_id)s")
                     else:
+                        name_index_service.unindex_file(file_id)
                         query = ("DELETE FROM files WHERE file_id = %(file_id)s")
                     res = run_query(query, {'file_id': file_id}, return_val=False)
                 else:
@@ -551,11 +481,140 @@ def api_update_project_details(project_alias=None):
             return jsonify({'error': 'Missing args'}), 400
 
 
+def _bulk_request(url, project_alias):
+    """Authenticate a bulk worker POST and read its JSON rows.
+
+    The body is a JSON array of rows, or ``{"api_key": ..., "rows": [...]}``;
+    with a bare array the api_key comes from the form or query string.
+    Returns (project row, rows, None) or (None, None, error response).
+    """
+    payload = request.get_json(silent=True)
+    api_key = request.values.get("api_key")
+    if isinstance(payload, dict):
+        api_key = payload.get("api_key", api_key)
+        payload = payload.get("rows")
+    if api_key is None or api_key == "":
+        return None, None, (jsonify({'error': 'api_key is missing'}), 400)
+    valid_api_key, is_admin = validate_api_key(api_key, url=url, params="project_alias={}".format(project_alias))
+    if not valid_api_key or not is_admin:
+        return None, None, (jsonify({'error': 'Forbidden'}), 403)
+    project = run_query("SELECT project_id, transcription FROM projects WHERE project_alias = %(project_alias)s",
+                        {'project_alias': project_alias})
+    if len(project) == 0:
+        return None, None, (jsonify({'error': 'Project not found'}), 404)
+    if not isinstance(payload, list):
+        return None, None, (jsonify({'error': 'Expected a JSON array of rows'}), 400)
+    if len(payload) > BULK_MAX_ROWS:
+        return None, None, (jsonify({'error': 'Too many rows, the limit is {}'.format(BULK_MAX_ROWS)}), 413)
+    return project[0], payload, None
+
+
+@api_bp.route('/update/<project_alias>/filechecks', methods=['POST'], strict_slashes=False, provide_automatic_options=False)
+@idempotent
+def api_update_file_checks_bulk(project_alias=None):
+    """Upsert many file check results at once.
+
+    Body: JSON array of ``{file_id, folder_id, file_check, check_results, check_info}``
+    (admin api_key required). All rows are written in one transaction or none
+    are. ``filename`` rows need no check_results: the server computes them,
+    looking up the failing JPCA RefIDs in ArchivesSpace together. Transcription
+    projects must still post them per file to ``/api/update/<project_alias>``.
+    """
+    stick_to_primary()
+    project, rows, error = _bulk_request('/update/filechecks', project_alias)
+    if error is not None:
+        return error
+    project_id = project['project_id']
+    transcription = project['transcription']
+    try:
+        rows = parse_check_rows(rows, transcription)
+        written = bulk_upsert_file_checks(project_id, rows, transcription)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    for folder_id in sorted({row['folder_id'] for row in rows}, key=str):
+        publish(project_id, folder_id=folder_id, project_alias=project_alias)
+    return jsonify({"result": True, "rows": written})
+
+
+@api_bp.route('/new/<project_alias>/files', methods=['POST'], strict_slashes=False, provide_automatic_options=False)
+@idempotent
+def api_new_files_bulk(project_alias=None):
+    """Register all the files of a folder at once.
+
+    Body: ``{"api_key": ..., "folder_id": ..., "rows": [{filename, timestamp, filetype}, ...]}``
+    (or a bare array with api_key and folder_id in the query string). Files
+    already in the folder are left as they are. Returns the file_id and the
+    unique_file check of every row, for the worker to post with its other checks.
+    """
+    stick_to_primary()
+    project, rows, error = _bulk_request('/new/files', project_alias)
+    if error is not None:
+        return error
+    body = request.get_json(silent=True)
+    folder_id = body.get("folder_id") if isinstance(body, dict) else None
+    if folder_id is None:
+        folder_id = request.values.get("folder_id")
+    if folder_id is None or folder_id == "":
+        return jsonify({'error': 'folder_id is missing'}), 400
+    try:
+        rows = parse_file_rows(rows)
+        files = register_files(project['project_id'], folder_id, rows, project['transcription'])
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    publish(project['project_id'], folder_id=folder_id, project_alias=project_alias)
+    return jsonify({"result": True, "files": files})
+
+
+@api_bp.route('/update/<project_alias>/exif', methods=['POST'], strict_slashes=False, provide_automatic_options=False)
+@idempotent
+def api_update_exif_bulk(project_alias=None):
+    """Store the EXIF tags of many files at once.
+
+    Body: JSON array of ``{file_id, filetype, exiftool_json}`` (admin api_key
+    required), where exiftool_json is the ``exiftool -j -G -D`` output of the
+    file, as a string or as JSON. All files are written in one transaction.
+    Transcription projects do not store EXIF; their entries are accepted and ignored.
+    """
+    stick_to_primary()
+    project, entries, error = _bulk_request('/update/exif', project_alias)
+    if error is not None:
+        return error
+    if project['transcription'] == 1:
+        return jsonify({"result": True, "rows": 0})
+    project_id = project['project_id']
+    try:
+        entries = parse_exif_entries(entries)
+        written = store_exif(entries, project_id=project_id)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    for folder_id in exif_folders(entries):
+        publish(project_id, folder_id=folder_id, project_alias=project_alias)
+    return jsonify({"result": True, "rows": written})
+
+
+@api_bp.route('/stats-jobs/<int:job_id>', methods=['GET', 'POST'], strict_slashes=False, provide_automatic_options=False)
+def api_stats_job_status(job_id=None):
+    """Status of a queued stats recalculation (queued, running, succeeded or failed)."""
+    api_key = request.values.get("api_key")
+    if api_key is None or api_key == "":
+        return jsonify({'error': 'api_key is missing'}), 400
+    valid_api_key, is_admin = validate_api_key(api_key, url='/stats-jobs/', params=str(job_id))
+    if not valid_api_key:
+        return jsonify({'error': 'Forbidden'}), 403
+    job = stats_jobs_service.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 
 # ok
 @api_bp.route('/new/<project_alias>', methods=['POST', 'GET'], strict_slashes=False, provide_automatic_options=False)
+@idempotent
+@publishes_changes
 def api_new_folder(project_alias=None):
     """Update a project properties."""
+    # Worker calls read back what they write; keep them off the replica
+    stick_to_primary()
     # Check api_key
     api_key = request.form.get("api_key")
     if api_key is None or api_key == "":
@@ -641,7 +700,7 @@ def api_new_folder(project_alias=None):
                                  "  VALUES (%(file_uid)s, %(folder_id)s, %(filename)s, %(timestamp)s, uuid_v4s(), %(file_ext)s)")
                             data = query_database_insert(query, {'file_uid': file_uid, 'folder_id': folder_id, 'filename': filename,
                                                              'timestamp': timestamp, 'file_ext': filetype})
-                        logger.debug("new_file:{}".format(data))
+                        logger.debug("new_file:%s", data)
                         if transcription == 1:
                             file_id = file_uid
                         else:
@@ -649,30 +708,16 @@ def api_new_folder(project_alias=None):
                             file_info = run_query(query, {'folder_id': folder_id, 'filename': filename})
                             file_id = file_info[0]['file_id']
                             # file_uid = file_info[0]['uid']
+                            name_index_service.index_file(file_id)
                         # Check for unique file
                         if transcription == 1:
                             query = ("SELECT f.file_transcription_id as file_id, fol.folder as project_folder FROM transcription_files f, transcription_folders fol "
                                     " WHERE f.folder_transcription_id = fol.folder_transcription_id AND f.file_name = %(filename)s AND f.folder_transcription_id != %(folder_id)s"
                                     " AND f.folder_transcription_id IN (SELECT folder_transcription_id from transcription_folders where project_id = %(project_id)s)")
+                            res = run_query(query, {'filename': filename, 'folder_id': folder_id, 'project_id': project_id})
                         else:
-                            query = ("SELECT f.file_id, fol.project_folder FROM files f, folders fol "
-                                    " WHERE f.folder_id = fol.folder_id AND f.file_name = %(filename)s AND f.folder_id != %(folder_id)s"
-                                    " AND f.folder_id IN (SELECT folder_id from folders where project_id = %(project_id)s)")
-                        res = run_query(query, {'filename': filename, 'folder_id': folder_id, 'project_id': project_id})
-                        if len(res) == 0:
-                            check_results = 0
-                            check_info = ""
-                        elif len(res) == 1:
-                            check_results = 1
-                            conflict_folder = res[0]['project_folder']
-                            check_info = "File with the same name in folder: {}".format(conflict_folder)
-                        else:
-                            check_results = 1
-                            conflict_folder = []
-                            for row in res:
-                                conflict_folder.append(row['project_folder'])
-                            conflict_folder = ', '.join(conflict_folder)
-                            check_info = "Files with the same name in folders: {}".format(conflict_folder)
+                            res = name_index_service.same_name_in_project(project_id, file_id, folder_id)
+                        check_results, check_info = unique_file_check([row['project_folder'] for row in res])
                         if transcription == 1:
                             query = ("INSERT INTO transcription_files_checks (file_transcription_id, file_check, check_results, check_info, updated_at) "
                                 "VALUES (%(file_id)s, 'unique_file', %(check_results)s, %(check_info)s, CURRENT_TIME)"
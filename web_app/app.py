@@ -28,8 +28,12 @@ import random
 from auth_service import AuthBaseUser, get_auth_service
 
 # MySQL — shared connection pool
-from osprey.db import init_db, query_database_insert, run_query
+from osprey.db import init_app as init_db_app, init_db, query_database_insert, run_query
+from osprey.conditional import conditional, project_validators
 from osprey.files import attach_preview_paths, resolve_image_viewer, static_fullsize_path, static_preview_path
+from osprey.invalidation import publish
+from osprey.pagecache import PROJECTS_TAG, cached_page, project_page_tags
+from osprey.services import homepage as homepage_service
 from osprey.services import reports as report_service
 # Flask Login
 from flask_login import LoginManager
@@ -133,6 +137,8 @@ try:
     init_db()
 except Exception as err:
     logger.error(err)
+# One connection per request, returned to the pool at teardown
+init_db_app(app)
 
 
 # From http://flask.pocoo.org/docs/1.0/patterns/apierrors/
@@ -213,10 +219,6 @@ FILES_TABLE_HTML_CLASSES = [
     'display', 'table', 'table-sm', 'table-hover', 'dashboard-files-table', 'w-100'
 ]
 
-HOMEPAGE_TABLE_CLASSES = [
-    'display', 'table', 'table-hover', 'homepage-project-table', 'w-100'
-]
-
 HOMEPAGE_FEATURED_PROJECTS = [
     {
         'title': 'Digitization of the JPC Archive is Now in Production',
@@ -288,10 +290,6 @@ def _about_contact_info():
     }
 
 
-def _homepage_stat_value(total):
-    return "{:,}".format(total or 0)
-
-
 def label_file_check_column(name):
     return FILE_CHECK_LABELS.get(name, name.replace('_', ' ').title())
 
@@ -341,10 +339,10 @@ def favicon():
     return send_from_directory('static', 'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
 
-@cache.memoize()
 @app.route('/team/<team>/<subset>', methods=['GET', 'POST'], provide_automatic_options=False)
 @app.route('/team/<team>', methods=['GET', 'POST'], provide_automatic_options=False)
 @app.route('/', methods=['GET', 'POST'], provide_automatic_options=False)
+@cached_page(tags=[PROJECTS_TAG])
 def homepage(team=None, subset=None):
     """Main homepage for the system"""
     # If API, not allowed - to improve
@@ -364,228 +362,29 @@ def homepage(team=None, subset=None):
     # Flask message injected into the page, in case of any errors
     msg = None
 
-    # Last update
-    last_update = run_query("SELECT date_format(MAX(updated_at), '%d-%b-%Y') AS updated_at FROM projects_stats")
-
-    mass_digi_total = 0
+    if subset is None:
+        subset = ""
 
     if team is None:
         team = "summary"
         team_heading = "Collections Digitization - Highlights"
         html_title = "Collections Digitization Dashboard"
-
-        # Summary stats
-        summary_stats = {
-            'objects_digitized': _homepage_stat_value(run_query(
-                "SELECT SUM(objects_digitized) as total "
-                "FROM projects_stats WHERE project_id NOT IN "
-                "(SELECT project_id FROM projects WHERE skip_project IS True)")[0]['total']),
-            'images_captured': _homepage_stat_value(run_query(
-                "SELECT SUM(images_taken) as total "
-                "FROM projects_stats WHERE project_id NOT IN "
-                "(SELECT project_id FROM projects WHERE skip_project IS True)")[0]['total']),
-            'digitization_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects WHERE skip_project IS NOT True")[0]['total']),
-            'active_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects "
-                "WHERE skip_project IS NOT True AND project_status='Ongoing'")[0]['total']),
-            'images_public': _homepage_stat_value(run_query(
-                "SELECT SUM(images_public) as total FROM projects_stats "
-                "WHERE project_id NOT IN "
-                "(SELECT project_id FROM projects WHERE skip_project IS True)")[0]['total']),
-        }
     elif team == "md":
         team_heading = "Summary of Mass Digitization Team Projects"
         html_title = "Mass Digitization Team Projects, Collections Digitization"
-
-        # MD stats
-        summary_stats = {
-            'objects_digitized': _homepage_stat_value(run_query(
-                "SELECT SUM(objects_digitized) as total FROM projects_stats WHERE project_id IN "
-                "(SELECT project_id FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True)"
-            )[0]['total']),
-            'images_captured': _homepage_stat_value(run_query(
-                "SELECT SUM(images_taken) as total FROM projects_stats WHERE project_id IN "
-                "(SELECT project_id FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True)"
-            )[0]['total']),
-            'digitization_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True"
-            )[0]['total']),
-            'active_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'MD' AND "
-                "skip_project IS NOT True AND project_status='Ongoing'"
-            )[0]['total']),
-            'images_public': _homepage_stat_value(run_query(
-                "SELECT SUM(images_public) as total FROM projects_stats WHERE project_id IN "
-                "(SELECT project_id FROM projects WHERE skip_project IS NOT True AND project_section = 'MD')"
-            )[0]['total']),
-        }
-        no_items = run_query(("SELECT SUM(objects_digitized) as total from projects_stats where project_id IN (SELECT project_id FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True)"))[0]['total']
-        mass_digi_total = math.floor((int(no_items)*1.0)/100000)/10
-
     elif team == "is":
-        if subset and subset.lower() == "sawhm":
+        if subset.lower() == "sawhm":
             team_heading = "Summary of Imaging Services Team Projects (SAWHM)"
         else:
             team_heading = "Summary of Imaging Services Team Projects"
         html_title = "Imaging Services Team Projects, Collections Digitization"
-        summary_stats = {
-            'objects_digitized': _homepage_stat_value(run_query(
-                "SELECT SUM(objects_digitized) as total FROM projects_stats WHERE project_id IN "
-                "(SELECT project_id FROM projects WHERE project_section = 'IS' AND skip_project IS NOT True)"
-            )[0]['total']),
-            'images_captured': _homepage_stat_value(run_query(
-                "SELECT SUM(images_taken) as total FROM projects_stats WHERE project_id IN "
-                "(SELECT project_id FROM projects WHERE project_section = 'IS' AND skip_project IS NOT True)"
-            )[0]['total']),
-            'digitization_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'IS' AND skip_project IS NOT True"
-            )[0]['total']),
-            'active_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'IS' AND "
-                "skip_project IS NOT True AND project_status='Ongoing'"
-            )[0]['total']),
-            'images_public': _homepage_stat_value(run_query(
-                "SELECT SUM(images_public) as total FROM projects_stats WHERE project_id IN "
-                "(SELECT project_id FROM projects WHERE skip_project IS NOT True AND project_section = 'IS')"
-            )[0]['total']),
-        }
-
     elif team == "inf":
         team_heading = "Summary of Informatics Team Projects"
         html_title = "Summary of the Informatics Team Projects, Collections Digitization"
-        # IS stats
-        summary_stats = {
-            'digitization_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects_informatics")[0]['total']),
-            'active_projects': _homepage_stat_value(run_query(
-                "SELECT COUNT(*) as total FROM projects_informatics WHERE project_status='Ongoing'"
-            )[0]['total']),
-            'records': _homepage_stat_value(run_query(
-                "SELECT SUM(records) as total FROM projects_informatics WHERE records_redundant IS False"
-            )[0]['total']),
-        }
-
-    section_query = ((" SELECT "
-                     " p.projects_order, "
-                     " CONCAT('<abbr title=\"', u.unit_fullname, '\">', p.project_unit, '</abbr>') as project_unit, "
-                     "      CASE WHEN "
-                     "             p.project_alias IS NULL "
-                     "              THEN p.project_title "
-                     "      ELSE "
-                     "          (CASE WHEN "
-                     "              p.project_status = 'Ongoing' and ps.collex_to_digitize != 0 "
-                     "              THEN "
-                     "              CONCAT('<a href=\"{app_root}/dashboard/', p.project_alias, '\">', p.project_title, '</a><br>"
-                     "                  <small>Estimated Progress: ', ROUND((ps.objects_digitized/ps.collex_to_digitize) * 100), ' % "
-                     "                  <div class=\"progress dashboard-progress\"> "
-                     "                      <div class=\"progress-bar bg-success\" role=\"progressbar\" style=\"width: ', "
-                     "                          ROUND((ps.objects_digitized/ps.collex_to_digitize) * 100), '%\" "
-                     "                         aria-valuenow=\"', ROUND((ps.objects_digitized/ps.collex_to_digitize) * 100), '\" aria-valuemin=\"0\" aria-valuemax=\"100\"> "
-                     "                      </div> "
-                     "                   </div></small>"
-                     "              ') "
-                     "          ELSE "
-                     "              CONCAT('<a href=\"{app_root}/dashboard/', p.project_alias, '\">', p.project_title, '</a>') "
-                     "          END) "
-                     "      END as project_title, "
-                     " p.project_status, "
-                     " p.project_manager, "
-                     " CASE "
-                     "      WHEN p.project_end IS NULL THEN CONCAT(date_format(p.project_start, '%d %b %Y'), ' -') "
-                     "      WHEN p.project_start = p.project_end THEN date_format(p.project_start, '%d %b %Y') "                     
-                     "      WHEN date_format(p.project_start, '%Y-%c') = date_format(p.project_end, '%Y-%c') "
-                     "          THEN CONCAT(date_format(p.project_start, '%d'), ' - ', date_format(p.project_end, '%d %b %Y')) "
-                     "      WHEN date_format(p.project_start, '%Y') = date_format(p.project_end, '%Y') "
-                     "          THEN CONCAT(date_format(p.project_start, '%d %b'), ' - ', date_format(p.project_end, '%d %b %Y')) "
-                     "      ELSE CONCAT(date_format(p.project_start, '%d %b %Y'), ' - ', date_format(p.project_end, '%d %b %Y')) END "
-                     "         as project_dates, "
-                     " CASE WHEN p.objects_estimated IS True THEN CONCAT(coalesce(format(ps.objects_digitized, 0), 0), '*') ELSE "
-                     " coalesce(format(ps.objects_digitized, 0), 0) END as objects_digitized, "
-                     " CASE WHEN p.images_estimated IS True THEN CONCAT(coalesce(format(ps.images_taken, 0), 0), '*') ELSE coalesce(format(ps.images_taken, 0), 0) END as images_taken, "
-                     " CASE WHEN p.images_estimated IS True THEN CONCAT(coalesce(format(ps.images_public, 0), 0), '*') ELSE coalesce(format(ps.images_public, 0), 0) END as images_public "
-                     " FROM projects p LEFT JOIN projects_stats ps ON (p.project_id = ps.project_id) LEFT JOIN si_units u ON (p.project_unit = u.unit_id) "
-                     " WHERE p.skip_project = 0 AND p.project_section = %(section)s "
-                     " GROUP BY "
-                     "        p.project_id, p.project_title, p.project_unit, p.project_status, p.project_description, "
-                     "        p.project_method, p.project_manager, p.project_start, p.project_end, p.updated_at, p.projects_order, p.project_type, "
-                     "        ps.collex_to_digitize, p.images_estimated, p.objects_estimated, ps.images_taken, ps.objects_digitized, ps.images_public"
-                     " ORDER BY p.projects_order DESC").format(app_root=settings.app_root))
-    list_projects_md = pd.DataFrame(run_query(section_query, {'section': 'MD'}))
-    list_projects_md = list_projects_md.drop("images_public", axis=1)
-    list_projects_md = list_projects_md.rename(columns={
-        "project_unit": "Unit",
-        "project_title": "Title",
-        "project_status": "Status",
-        "project_manager": "<abbr title=\"Project Manager\">PM</abbr>",
-        "project_dates": "Dates",
-        "objects_digitized": "Specimens/Objects Digitized",
-        "images_taken": "Images Captured"
-    })
 
-    if subset is None:
-        subset = ""
-    is_section_query = section_query
-    if subset.lower() == "sawhm":
-        is_section_query = section_query.replace(
-            "WHERE p.skip_project = 0 AND p.project_section = %(section)s",
-            "WHERE p.skip_project = 0 AND p.project_section = %(section)s AND p.project_unit = 'SAWHM'",
-        )
-    list_projects_is = pd.DataFrame(run_query(is_section_query, {'section': 'IS'}))
-    list_projects_is = list_projects_is.drop("images_public", axis=1)
-
-    list_projects_is = list_projects_is.rename(columns={
-        "project_unit": "Unit",
-        "project_title": "Title",
-        "project_status": "Status",
-        "project_manager": "<abbr title=\"Project Manager\">PM</abbr>",
-        "project_dates": "Dates",
-        "objects_digitized": "Specimens/Objects Digitized",
-        "images_taken": "Images Captured"
-    })
-
-    # Informatics Table
-    inf_section_query = (" SELECT "
-                     " CONCAT('<abbr title=\"', u.unit_fullname, '\">', p.project_unit, '</abbr>') as project_unit, "
-                     " CONCAT('<strong>', p.project_title, '</strong><br>', p.summary) as project_title, "
-                     " p.project_status, "
-                     " CASE WHEN p.github_link IS NULL THEN 'NA' ELSE "
-                     "       CONCAT('<a href=\"', p.github_link, '\" title=\"Link to code repository of ', p.project_title, ' in Github\">Repository</a>') END as github_link, "
-                     " CASE "
-                     "      WHEN p.project_end IS NULL THEN CONCAT(date_format(p.project_start, '%b %Y'), ' -') "
-                     "      WHEN date_format(p.project_start, '%b %Y') = date_format(p.project_end, '%b %Y') THEN date_format(p.project_start, '%b %Y') "                     
-                     "      ELSE CONCAT(date_format(p.project_start, '%b %Y'), ' - ', date_format(p.project_end, '%b %Y')) END "
-                     "         as project_dates, "
-                     " CASE WHEN p.records = 0 THEN 'NA' ELSE "
-                     " (CASE WHEN p.records_estimated IS True THEN CONCAT(coalesce(format(p.records, 0), 0), '*') ELSE "
-                     "      coalesce(format(p.records, 0), 0) END) END as records, "
-                     " CASE WHEN p.info_link IS NULL THEN 'NA' ELSE p.info_link END AS info_link "
-                     " FROM projects_informatics p LEFT JOIN si_units u ON (p.project_unit = u.unit_id) "
-                     " ORDER BY p.project_start DESC, p.project_end DESC")
-    list_projects_inf = pd.DataFrame(run_query(inf_section_query))
-    list_projects_inf = list_projects_inf.rename(columns={
-        "project_unit": "Unit",
-        "project_title": "Title",
-        "project_status": "Status",
-        "github_link": "Repository",
-        "info_link": "More Info",
-        "project_manager": "<abbr title=\"Project Manager\">PM</abbr>",
-        "project_dates": "Dates",
-        "records": "Records Created or Enhanced"
-    })
-
-    # Informatics Software
-    inf_software = ("SELECT CONCAT('<strong>', software_name, '</strong>') as software_name, software_details, "
-                    " CONCAT('<a href=\"', repository, '\" title=\"Link to code repository in Github\"><img src=\"/static/github-32.png\" alt=\"Github Logo\"></a>') as repository, "
-                    " CONCAT('<a href=\"', more_info, '\" title=\"Link to a page with more information about the software\">More Info</a>') as more_info "
-                    " FROM informatics_software ORDER BY sortby DESC")
-    list_software = pd.DataFrame(run_query(inf_software))
-    list_software = list_software.rename(columns={
-        "software_name": "Software",
-        "software_details": "Details",
-        "repository": "Repository",
-        "more_info": "Details"
-    })
+    # Served stale-while-revalidate, see osprey/services/homepage.py
+    summary = homepage_service.team_summary(team)
+    tables = homepage_service.section_tables(subset.lower() == "sawhm")
 
     # kiosk mode
     kiosk, user_address = kiosk_mode(request, settings.kiosks)
@@ -599,24 +398,14 @@ def homepage(team=None, subset=None):
 
     return render_template('home.html',
                            form=form, msg=msg, user_exists=user_exists,
-                           username=username, summary_stats=summary_stats, team=team,
-                           tables_md=[list_projects_md.to_html(table_id='list_projects_md', index=False,
-                                                               border=0, escape=False,
-                                                               classes=HOMEPAGE_TABLE_CLASSES)],
-                           tables_is=[list_projects_is.to_html(table_id='list_projects_is', index=False,
-                                                               border=0, escape=False,
-                                                               classes=HOMEPAGE_TABLE_CLASSES)],
-                           tables_inf=[list_projects_inf.to_html(table_id='list_projects_inf', index=False,
-                                                               border=0, escape=False,
-                                                               classes=HOMEPAGE_TABLE_CLASSES)],
-                           tables_software=[list_software.to_html(table_id='list_software', index=False,
-                                                               border=0, escape=False,
-                                                               classes=HOMEPAGE_TABLE_CLASSES + ['homepage-software-table'])],
+                           username=username, summary_stats=summary['summary_stats'], team=team,
+                           tables_md=tables['tables_md'], tables_is=tables['tables_is'],
+                           tables_inf=tables['tables_inf'], tables_software=tables['tables_software'],
                            featured_projects=HOMEPAGE_FEATURED_PROJECTS,
                            is_table_title=is_table_title,
                            asklogin=asklogin, site_env=site_env, site_net=site_net, site_ver=site_ver,
-                           last_update=last_update[0]['updated_at'] or 'unknown',
-                           mass_digi_total=mass_digi_total,
+                           last_update=homepage_service.last_update() or 'unknown',
+                           mass_digi_total=summary['mass_digi_total'],
                            kiosk=kiosk, user_address=user_address, team_heading=team_heading,
                            html_title=html_title, analytics_code=settings.analytics_code,
                            app_root=settings.app_root,
@@ -684,10 +473,11 @@ def dashboard_empty():
     return redirect(url_for('homepage'))
 
 
-@cache.memoize()
 @app.route('/dashboard/<project_alias>/<folder_id>/<tab>/<page>/', methods=['POST', 'GET'], provide_automatic_options=False)
 @app.route('/dashboard/<project_alias>/<folder_id>/<tab>/', methods=['POST', 'GET'], provide_automatic_options=False)
 @app.route('/dashboard/<project_alias>/<folder_id>/', methods=['POST', 'GET'], provide_automatic_options=False)
+@conditional(project_validators)
+@cached_page(tags=project_page_tags)
 def dashboard_f(project_alias=None, folder_id=None, tab=None, page=None):
     """Dashboard for a project"""
 
@@ -1067,8 +857,9 @@ def dashboard_f(project_alias=None, folder_id=None, tab=None, page=None):
                            )
 
 
-@cache.memoize()
 @app.route('/dashboard/<project_alias>/', methods=['GET', 'POST'], provide_automatic_options=False)
+@conditional(project_validators)
+@cached_page(tags=project_page_tags)
 def dashboard(project_alias=None, folder_id=None):
     """Dashboard for a project"""
     
@@ -1314,8 +1105,9 @@ def dashboard(project_alias=None, folder_id=None):
                            analytics_code=settings.analytics_code, project_stats_other=project_stats_other, no_cols=None)
 
 
-@cache.memoize()
 @app.route('/dashboard/<project_alias>/statistics/', methods=['POST', 'GET'], provide_automatic_options=False)
+@conditional(project_validators)
+@cached_page(tags=project_page_tags)
 def proj_statistics(project_alias=None):
     """Statistics for a project"""
 
@@ -1385,8 +1177,8 @@ def proj_statistics_dl(project_id=None, step_id=None):
     return response
 
 
-@cache.memoize()
 @app.route('/about/', methods=['GET'], provide_automatic_options=False)
+@cached_page()
 def about():
     """About page for the system"""
     
@@ -2587,12 +2379,12 @@ def qc_process(folder_id):
                                                 "           ELSE check_info END AS check_info "
                                                 "   FROM transcription_files_checks WHERE file_transcription_id = %(file_id)s"),
                                                 {'file_id': file_qc['file_id']})
-                    file_metadata = pd.DataFrame(run_query(("SELECT tag, taggroup, tagid, value "
+                    file_metadata = run_query(("SELECT tag, taggroup, tagid, value "
                                                                 "   FROM files_exif "
                                                                 "   WHERE file_uid = %(file_id)s "
                                                                 "       AND lower(filetype) = 'tif' "
                                                                 "   ORDER BY taggroup, tag "),
-                                                            {'file_id': file_qc['file_id']}))
+                                                            {'file_id': file_qc['file_id']}, result='dataframe')
                     folder = run_query(
                         ("SELECT folder_transcription_id as folder_id, folder as project_folder, delivered_to_dams FROM transcription_folders "
                         "  WHERE folder_transcription_id IN (SELECT folder_transcription_id FROM transcription_files WHERE file_transcription_id = %(file_id)s)"),
@@ -2622,12 +2414,12 @@ def qc_process(folder_id):
                                                 "           ELSE check_info END AS check_info "
                                                 "   FROM files_checks WHERE file_id = %(file_id)s"),
                                                 {'file_id': file_qc['file_id']})
-                    file_metadata = pd.DataFrame(run_query(("SELECT tag, taggroup, tagid, value "
+                    file_metadata = run_query(("SELECT tag, taggroup, tagid, value "
                                                                 "   FROM files_exif "
                                                                 "   WHERE file_id = %(file_id)s "
                                                                 "       AND lower(filetype) = 'tif' "
                                                                 "   ORDER BY taggroup, tag "),
-                                                            {'file_id': file_qc['file_id']}))
+                                                            {'file_id': file_qc['file_id']}, result='dataframe')
                     folder = run_query(
                         ("SELECT * FROM folders "
                         "  WHERE folder_id IN (SELECT folder_id FROM files WHERE file_id = %(file_id)s)"),
@@ -2997,12 +2789,12 @@ def qc_process_transcript(source_id, folder_id):
                 # Transcriptions
                 tables = {}
                 t_source = run_query("SELECT transcription_source_id, transcription_source_name, CONCAT(transcription_source_notes, ' ', transcription_source_date) as source_notes FROM transcription_sources WHERE project_id = %(project_id)s AND transcription_source_id = %(source_id)s", {'project_id': project_id['project_id'], 'source_id': source_id})[0]
-                transcription_text = pd.DataFrame(run_query(("""
+                transcription_text = run_query(("""
                                             SELECT fields.field_name as field, COALESCE(t.transcription_text, '') as value 
                                                 FROM transcription_fields fields LEFT JOIN transcription_files_text t ON (fields.field_id = t.field_id and t.file_transcription_id = %(file_id)s) 
                                                 WHERE fields.transcription_source_id = %(source_id)s 
                                                 ORDER BY fields.sort_by
-                                                """), {'source_id': t_source['transcription_source_id'], 'file_id': file_qc['file_transcription_id']}))
+                                                """), {'source_id': t_source['transcription_source_id'], 'file_id': file_qc['file_transcription_id']}, result='dataframe')
                 tables = {'name': t_source['transcription_source_name'],
                                 'table': transcription_text.to_html(table_id='transcription_text', index=False, border=0,
                                                                     escape=True,
@@ -3324,6 +3116,7 @@ def qc_done(folder_id):
             " VALUES (%(folder_id)s, 'qc_status', %(badgecss)s, %(msg)s, CURRENT_TIMESTAMP) ON DUPLICATE KEY UPDATE badge_text = %(msg)s,"
             " badge_css = %(badgecss)s, updated_at = CURRENT_TIMESTAMP")
     res = query_database_insert(query, {'folder_id': folder_id, 'badgecss': badgecss, 'msg': qc_info})
+    publish(project_id, folder_id=folder_id)
     # Change inspection level, if needed
     project_qc_settings = run_query(("SELECT * FROM qc_settings WHERE project_id = %(project_id)s"),
                              {'project_id': project_id})[0]
@@ -2,20 +2,64 @@
 #
 # Cache module
 #
-# Import flask
-from flask import Flask
-import os 
+# Two tiers (see osprey/tiercache.py): a small in-process LRU in front of a
+# store shared by every process and node. settings.cache_backend picks the
+# store: 'redis' (settings.cache_redis_url), 'memcached'
+# (settings.cache_memcached_servers) or 'filesystem' (settings.cache_folder,
+# one per node; the default). 'memcached' needs a client library that is
+# not in requirements.txt: install pylibmc (preferred), python-memcached or
+# libmc.
+#
+# Keys carry settings.cache_version (default: the app version), so entries
+# survive restarts and a deploy starts a fresh namespace. The file cache
+# keeps one directory per version; older ones are deleted at startup.
+#
+import os
 import shutil
 # Import caching
 from flask_caching import Cache
 
 import settings
+from osprey.version import __version__
 
-shutil.rmtree(settings.cache_folder, ignore_errors=True)
+CACHE_BACKEND = getattr(settings, 'cache_backend', 'filesystem')
+CACHE_VERSION = str(getattr(settings, 'cache_version', __version__))
 
-os.makedirs(settings.cache_folder, exist_ok=True)
+_L2_TYPES = {
+    'redis': 'RedisCache',
+    'memcached': 'MemcachedCache',
+    'filesystem': 'FileSystemCache',
+}
 
 # Cache config
-cache = Cache(config={'CACHE_TYPE': 'FileSystemCache',
-                      "CACHE_DIR": settings.cache_folder,
-                      "CACHE_DEFAULT_TIMEOUT": 3600})
+config = {'CACHE_TYPE': 'osprey.tiercache.TwoTierCache',
+          'CACHE_L2_TYPE': _L2_TYPES[CACHE_BACKEND],
+          'CACHE_KEY_PREFIX': 'osprey:{}:'.format(CACHE_VERSION),
+          'CACHE_DEFAULT_TIMEOUT': getattr(settings, 'cache_seconds', 3600),
+          'CACHE_L1_SIZE': getattr(settings, 'cache_l1_size', 1000),
+          'CACHE_L1_TIMEOUT': getattr(settings, 'cache_l1_seconds', 5),
+          # Page cache tag versions and SWR expiry marks must be seen by every node at once
+          'CACHE_L1_BYPASS': ('tag:', 'swr-expired:'),
+          # Hit ratio summary in the log (0 to disable); details at /api/admin/cache-stats
+          'CACHE_STATS_LOG_SECONDS': getattr(settings, 'cache_stats_log_seconds', 600)}
+
+if CACHE_BACKEND == 'redis':
+    config['CACHE_REDIS_URL'] = getattr(settings, 'cache_redis_url', 'redis://localhost:6379/0')
+elif CACHE_BACKEND == 'memcached':
+    config['CACHE_MEMCACHED_SERVERS'] = getattr(settings, 'cache_memcached_servers', ['127.0.0.1:11211'])
+else:
+    # The file cache does not prefix keys; version the directory instead
+    config['CACHE_DIR'] = os.path.join(settings.cache_folder, CACHE_VERSION)
+    os.makedirs(config['CACHE_DIR'], exist_ok=True)
+    for entry in os.scandir(settings.cache_folder):
+        if entry.name == CACHE_VERSION:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+cache = Cache(config=config)
@@ -0,0 +1,25 @@
+-- Per-project file name index for the unique_file / unique_other checks
+-- (osprey/services/name_index.py). One row per file of an image project;
+-- the worker API adds rows when files are registered and removes them when
+-- files are deleted through it. Files deleted directly in the database are
+-- removed by the foreign key. file_name and file_id must match the type and
+-- collation of the same columns in `files`.
+
+CREATE TABLE IF NOT EXISTS `files_name_index` (
+  `project_id` int NOT NULL,
+  `file_name` varchar(254) NOT NULL,
+  `file_id` int NOT NULL,
+  `folder_id` int NOT NULL,
+  PRIMARY KEY (`project_id`, `file_name`, `file_id`),
+  UNIQUE KEY `files_name_index_file` (`file_id`),
+  KEY `files_name_index_name` (`file_name`),
+  KEY `files_name_index_folder` (`folder_id`),
+  CONSTRAINT `files_name_index_file_fk` FOREIGN KEY (`file_id`) REFERENCES `files` (`file_id`) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Backfill (safe to re-run).
+INSERT INTO files_name_index (project_id, file_name, file_id, folder_id)
+SELECT fol.project_id, f.file_name, f.file_id, f.folder_id
+  FROM files f, folders fol
+ WHERE f.folder_id = fol.folder_id
+    ON DUPLICATE KEY UPDATE file_id = VALUES(file_id);
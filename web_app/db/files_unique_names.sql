@@ -0,0 +1,17 @@
+-- One row per file name in a folder. Bulk file registration
+-- (osprey/services/file_registration.py) inserts with ON DUPLICATE KEY
+-- UPDATE so a retried request keeps the rows already registered; without
+-- this key a retry would insert the folder's files a second time.
+--
+-- Skip a statement if SHOW INDEX already lists a unique key on those
+-- columns. Duplicates must be resolved before the key can be added; this
+-- lists them:
+--
+-- SELECT folder_id, file_name, COUNT(*) FROM files
+--  GROUP BY folder_id, file_name HAVING COUNT(*) > 1;
+
+ALTER TABLE `files`
+  ADD UNIQUE KEY `files_folder_file_name` (`folder_id`, `file_name`);
+
+ALTER TABLE `transcription_files`
+  ADD UNIQUE KEY `transcription_files_folder_file_name` (`folder_transcription_id`, `file_name`);
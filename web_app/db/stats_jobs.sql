@@ -0,0 +1,28 @@
+-- Debounced folder/project stats recalculations (osprey/services/stats_jobs.py).
+-- The worker API queues a row per folder; scripts/run_stats_jobs.py drains them.
+-- dedupe_key is set while a job is queued, so repeated requests for the same
+-- folder share it, and cleared when the job is claimed.
+
+CREATE TABLE IF NOT EXISTS `stats_jobs` (
+  `job_id` bigint NOT NULL AUTO_INCREMENT,
+  `project_id` int NOT NULL,
+  `folder_id` varchar(64) NOT NULL,
+  `dedupe_key` varchar(100) DEFAULT NULL,
+  `status` varchar(16) NOT NULL DEFAULT 'queued',
+  `requests` int NOT NULL DEFAULT 1,
+  `run_after` datetime NOT NULL,
+  `requested_at` datetime NOT NULL,
+  `claimed_by` varchar(32) DEFAULT NULL,
+  `started_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  `error_message` text,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`job_id`),
+  UNIQUE KEY `stats_jobs_dedupe` (`dedupe_key`),
+  KEY `stats_jobs_due` (`status`, `run_after`),
+  KEY `stats_jobs_folder` (`project_id`, `folder_id`),
+  KEY `stats_jobs_claim` (`claimed_by`)
+) ENGINE=InnoDB;
+
+-- Finished jobs are only kept for the status endpoint; prune them from cron, e.g.
+-- DELETE FROM stats_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < NOW() - INTERVAL 7 DAY;
@@ -54,3 +54,24 @@ api_logger = logging.getLogger("osprey_api")
 api_logger.setLevel(log_level)
 api_logger.addHandler(api_handler)
 api_logger.propagate = False
+
+# Statements slower than settings.db_slow_query_ms (see osprey.db). Logged at
+# WARNING so they are kept in prod, where the main log level is ERROR.
+slow_logfile = '{}/ospreyslow_{}.log'.format(settings.log_folder, current_time)
+slow_handler = RotatingFileHandler(slow_logfile, maxBytes=10000000, backupCount=10)
+slow_handler.setFormatter(logging.Formatter(log_format, datefmt=log_datefmt))
+slow_handler.rotator = rotator
+slow_handler.namer = namer
+
+slow_query_logger = logging.getLogger("osprey_slow_query")
+slow_query_logger.setLevel(logging.WARNING)
+slow_query_logger.addHandler(slow_handler)
+slow_query_logger.propagate = False
+
+# Statement logging from osprey.db. Off with db_query_log = False; otherwise
+# one statement in db_query_log_sample is logged, plus every statement at or
+# over db_slow_query_ms. Messages use lazy %-formatting so disabled or
+# unsampled statements cost no string building.
+query_logger = logging.getLogger("osprey_webapp.queries")
+if not getattr(settings, 'db_query_log', settings.env != "prod"):
+    query_logger.setLevel(logging.CRITICAL + 1)
@@ -0,0 +1,141 @@
+"""API key lookups and usage logging for ``api.auth``.
+
+Active keys are cached in-process for ``settings.api_key_cache_seconds``
+(60), so the API does not query ``api_keys`` on every call. ``revoke()``
+deactivates a key and drops it from this process's cache. Other processes
+stop accepting it once their entry expires, so keep the TTL short.
+
+``api_keys_usage`` rows are queued and written in batches with
+``executemany`` by a background thread. The queue holds up to
+``settings.api_usage_queue_size`` rows; when it is full, rows are dropped
+and counted rather than slowing requests down.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+import settings
+from logger import api_logger as logger
+from osprey.db import executemany, run_query
+from osprey.tiercache import LRU
+
+KEY_CACHE_SECONDS = getattr(settings, 'api_key_cache_seconds', 60)
+
+_keys = LRU(getattr(settings, 'api_key_cache_size', 1000))
+
+
+def lookup(api_key):
+    """``{'is_admin': bool}`` for an active key, None if the key is unknown or inactive."""
+    entry = _keys.get(api_key)
+    if entry is not None:
+        return entry
+    data = run_query("SELECT api_key, is_admin from api_keys WHERE api_key = %(api_key)s and is_active = 1",
+                     {'api_key': api_key})
+    if not data or data[0]['api_key'] != api_key:
+        return None
+    entry = {'is_admin': data[0]['is_admin'] == 1}
+    _keys.set(api_key, entry, KEY_CACHE_SECONDS)
+    return entry
+
+
+def forget(api_key=None):
+    """Drop one key (or every key) from this process's cache."""
+    if api_key is None:
+        _keys.clear()
+    else:
+        _keys.delete(api_key)
+
+
+def revoke(api_key):
+    """Deactivate a key; it stops working here at once and elsewhere within the cache TTL."""
+    res = run_query("UPDATE api_keys SET is_active = 0 WHERE api_key = %(api_key)s", {'api_key': api_key},
+                    return_val=False)
+    forget(api_key)
+    return res
+
+
+class UsageBuffer:
+    """Bounded queue of rows written by a background thread with executemany."""
+
+    def __init__(self, query, maxsize=10000, batch_size=500, flush_seconds=5):
+        self.query = query
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def record(self, row):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning("api usage queue full, %s rows dropped so far", dropped)
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked worker process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='api-usage-flusher', daemon=True).start()
+
+    def _take(self, block):
+        """Up to batch_size rows; when blocking, waits for a first row and then up to flush_seconds."""
+        rows = []
+        try:
+            if block:
+                rows.append(self._queue.get())
+            deadline = time.monotonic() + self.flush_seconds
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if block and remaining > 0:
+                    rows.append(self._queue.get(timeout=remaining))
+                else:
+                    rows.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    def _write(self, rows):
+        try:
+            executemany(self.query, rows)
+        except Exception:
+            logger.exception("api usage: failed to write %s rows", len(rows))
+
+    def _run(self):
+        while True:
+            rows = self._take(block=True)
+            if rows:
+                self._write(rows)
+
+    def flush(self):
+        """Write whatever is queued now, in the calling thread."""
+        while True:
+            rows = self._take(block=False)
+            if not rows:
+                return
+            self._write(rows)
+
+
+usage = UsageBuffer(
+    "INSERT INTO api_keys_usage (api_key, valid, url, params) "
+    "VALUES (%(api_key)s, %(valid)s, %(url)s, %(params)s)",
+    maxsize=getattr(settings, 'api_usage_queue_size', 10000),
+    batch_size=getattr(settings, 'api_usage_batch_size', 500),
+    flush_seconds=getattr(settings, 'api_usage_flush_seconds', 5),
+)
+atexit.register(usage.flush)
+
+
+def record_usage(api_key, valid, url=None, params=None):
+    usage.record({'api_key': api_key, 'valid': 1 if valid else 0, 'url': url, 'params': params})
@@ -0,0 +1,113 @@
+"""Cache hit/miss/eviction counters used by osprey.tiercache.
+
+Kept free of Flask and cache imports so it can be unit tested on its own.
+``namespace()`` maps a cache key to what stored it (page cache, tag
+versions, stale-while-revalidate entries, one memoized function each) and
+``CacheStatsRegistry`` keeps process-wide counters per namespace, which is
+what the admin cache stats endpoint reports.
+"""
+
+import threading
+import time
+
+_MEMVER = '_memver'
+
+# Per-thread name of the function whose memoize version was just read.
+_local = threading.local()
+
+
+def namespace(key):
+    """Group for a cache key: 'page', 'tag', 'swr:<function>', a memoized function, ..."""
+    if key.endswith(_MEMVER):
+        return 'memoize-version'
+    prefix, sep, rest = key.partition(':')
+    if sep:
+        if prefix == 'swr':
+            return 'swr:' + rest.partition(':')[0]
+        if prefix in ('page', 'tag', 'lock', 'idem', 'swr-expired'):
+            return prefix
+    # Flask-Caching memoize keys are opaque hashes, but it always reads the
+    # function's version key right before the value (see note_versions) and
+    # writes the value under the same key on a miss.
+    name = getattr(_local, 'memoized', None)
+    if name is not None:
+        _local.memoized = None
+        _local.last = (key, name)
+        return name
+    last_key, last_name = getattr(_local, 'last', (None, None))
+    if key == last_key:
+        return last_name
+    return 'other'
+
+
+def note_versions(keys):
+    """Remember which memoized function the next lookup on this thread is for."""
+    for key in keys:
+        if key.endswith(_MEMVER):
+            _local.memoized = key[:-len(_MEMVER)]
+            return
+
+
+class CacheStatsRegistry:
+    """Thread-safe counters per namespace."""
+
+    EVENTS = ('l1_hits', 'l2_hits', 'misses', 'sets', 'deletes', 'evictions')
+
+    def __init__(self, log_seconds=600):
+        self.log_seconds = log_seconds
+        self._lock = threading.Lock()
+        self._namespaces = {}
+        self._since = time.time()
+        self._last_log = time.monotonic()
+
+    def record(self, name, event, count=1):
+        with self._lock:
+            entry = self._namespaces.get(name)
+            if entry is None:
+                entry = self._namespaces[name] = dict.fromkeys(self.EVENTS, 0)
+            entry[event] += count
+
+    def due(self):
+        """True once every ``log_seconds``, for the periodic log summary."""
+        if self.log_seconds <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < self.log_seconds:
+                return False
+            self._last_log = now
+        return True
+
+    def snapshot(self):
+        """Counters and hit ratio per namespace, busiest first, plus totals."""
+        with self._lock:
+            rows = [dict(e, namespace=name) for name, e in self._namespaces.items()]
+            since = self._since
+        totals = dict.fromkeys(self.EVENTS, 0)
+        for row in rows:
+            for event in self.EVENTS:
+                totals[event] += row[event]
+            row['hit_ratio'] = _ratio(row)
+        totals['hit_ratio'] = _ratio(totals)
+        rows.sort(key=lambda r: r['l1_hits'] + r['l2_hits'] + r['misses'], reverse=True)
+        return {'since': since, 'totals': totals, 'namespaces': rows}
+
+    def summary(self):
+        """One log line: overall and the five busiest namespaces."""
+        data = self.snapshot()
+        parts = ['{} {:.0%} of {}'.format(r['namespace'], r['hit_ratio'] or 0,
+                                          r['l1_hits'] + r['l2_hits'] + r['misses'])
+                 for r in data['namespaces'][:5]]
+        return 'hit ratio {:.0%}, evictions {} | {}'.format(
+            data['totals']['hit_ratio'] or 0, data['totals']['evictions'], '; '.join(parts))
+
+    def reset(self):
+        with self._lock:
+            self._namespaces.clear()
+            self._since = time.time()
+
+
+def _ratio(counts):
+    hits = counts['l1_hits'] + counts['l2_hits']
+    lookups = hits + counts['misses']
+    return round(hits / lookups, 4) if lookups else None
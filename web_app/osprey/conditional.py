@@ -0,0 +1,109 @@
+"""ETag / Last-Modified validators for polled dashboard and API responses.
+
+``@conditional(validators)`` goes under the route decorators (and above
+``@cached_page``). ``validators`` takes the view's keyword arguments and
+returns ``(tags, timestamps)``: page cache tags and the ``updated_at`` values
+the response depends on, read with one cheap query. The ETag hashes them
+with the request path, query string and tag versions (so writes published
+through ``osprey.invalidation`` change it too), and Last-Modified is the
+latest of the timestamps and the tags' last invalidation; a matching
+``If-None-Match`` or a fresh ``If-Modified-Since`` gets a bodiless 304
+before the view runs.
+
+Only anonymous GETs are validated: pages for logged-in users carry
+per-user content.
+"""
+
+import datetime
+import functools
+import hashlib
+
+from flask import make_response, request
+from flask_login import current_user
+
+import settings
+from osprey import pagecache
+from osprey.db import run_query
+from osprey.version import __version__
+
+
+def _utc(value):
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def etag_for(tags, timestamps):
+    kiosk = request.remote_addr in getattr(settings, 'kiosks', ())
+    raw = '{}|{}|{}|{}'.format(__version__, pagecache.page_key(tags), kiosk,
+                               [str(t) for t in timestamps])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified <= since
+
+
+def conditional(validators):
+    """Answer conditional GETs from ``validators(**view_kwargs)`` before running the view."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or current_user.is_authenticated:
+                return view(*args, **kwargs)
+            tags, timestamps = validators(**kwargs)
+            stamps = [_utc(t) for t in timestamps if t is not None]
+            # Writes that only bump tags (e.g. file checks) leave updated_at alone.
+            changed_at = pagecache.tags_changed_at(tags)
+            if changed_at is not None:
+                stamps.append(changed_at)
+            # HTTP dates have no fractions of a second.
+            last_modified = max(stamps).replace(microsecond=0) if stamps else None
+            etag = etag_for(tags, timestamps)
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Browsers revalidate on every view instead of guessing freshness.
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def project_validators(project_alias=None, folder_id=None, **kwargs):
+    """Validators for views routed by ``project_alias`` (and ``folder_id``)."""
+    project_id = pagecache.project_id_for_alias(project_alias)
+    rows = run_query(
+        "SELECT (SELECT updated_at FROM projects_stats WHERE project_id = %(project_id)s) AS stats_updated_at, "
+        " (SELECT MAX(updated_at) FROM folders WHERE project_id = %(project_id)s) AS folders_updated_at",
+        {'project_id': project_id})
+    row = rows[0] if rows else {}
+    return (pagecache.project_page_tags(project_alias, folder_id),
+            [row.get('stats_updated_at'), row.get('folders_updated_at')])
+
+
+def report_validators(project_alias=None, report_id=None, **kwargs):
+    """Project validators plus the report's materialization time."""
+    tags, timestamps = project_validators(project_alias)
+    rows = run_query(
+        "SELECT updated_at FROM report_materializations "
+        " WHERE project_id = %(project_id)s AND report_id = %(report_id)s",
+        {'project_id': pagecache.project_id_for_alias(project_alias), 'report_id': report_id})
+    return tags, timestamps + [rows[0]['updated_at'] if rows else None]
+
+
+def projects_validators(**kwargs):
+    """Validators for project lists: the latest stats update of any project."""
+    rows = run_query("SELECT MAX(updated_at) AS updated_at FROM projects_stats")
+    return [pagecache.PROJECTS_TAG], [rows[0]['updated_at'] if rows else None]
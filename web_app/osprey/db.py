@@ -1,11 +1,49 @@
 #!/usr/bin/env python3
-"""MySQL connection pool and query helpers shared by the dashboard and API."""
+"""MySQL connection pool and query helpers shared by the dashboard and API.
+
+Inside a Flask app context every statement reuses one pooled connection bound
+to ``flask.g`` (released by ``init_app``'s teardown hook), so a page that runs
+dozens of queries borrows, configures and health-checks a single connection.
+Outside an app context (scripts, background threads) each call borrows its own
+connection as before.
+
+``stream_query()`` reads large result sets in batches on a dedicated
+connection so memory use does not grow with the number of rows.
+
+``batch()`` pins one connection for a unit of work: statements queued on it
+(and any ``run_query`` calls made inside the block) run in one transaction.
+
+When ``replica_host`` is set, read-only ``run_query``/``stream_query`` calls
+made during a request go to a read replica. Writes always use the primary,
+and after the first write in a request its reads follow (read-your-writes);
+``primary=True``, ``use_primary()`` and ``stick_to_primary()`` force it.
+
+With ``db_backend = 'sqlite'`` (or after ``init_sqlite()``) the pool is an
+embedded SQLite database with MySQL shims (``osprey.sqlite_backend``), so
+services can be tested and benchmarked without a MySQL server.
+
+Every statement is timed. Per-request totals go out in a ``Server-Timing``
+header, process-wide totals are kept in ``query_stats`` (served by the admin
+API) and statements slower than ``db_slow_query_ms`` go to the slow-query log.
+"""
+
+import contextvars
+import itertools
+import logging
+import re
+import time
+from contextlib import contextmanager
 
 import mysql.connector
-from mysql.connector import pooling
+import pandas as pd
+from flask import g, has_app_context, has_request_context, request
 
 import settings
-from logger import logger
+from logger import logger, query_logger, slow_query_logger
+from osprey.pool import BoundedPool
+from osprey.querystats import QueryStatsRegistry, RequestStats
+from osprey.sqlite_backend import SqlitePool
+from osprey.sqltext import is_read_only
 
 
 class DatabasePoolError(Exception):
@@ -13,6 +51,59 @@ class DatabasePoolError(Exception):
 
 
 _pool = None
+_replica_pool = None
+
+# 'mysql', or 'sqlite' for the embedded test/benchmark backend.
+DB_BACKEND = getattr(settings, 'db_backend', 'mysql')
+SQLITE_PATH = getattr(settings, 'sqlite_path', ':memory:')
+
+# Pool sizing: pooled connections, extra short-lived connections allowed on
+# top, and how long (seconds) a caller waits for one before PoolError.
+POOL_SIZE = getattr(settings, 'db_pool_size', 10)
+POOL_OVERFLOW = getattr(settings, 'db_pool_overflow', 5)
+POOL_TIMEOUT = getattr(settings, 'db_pool_timeout', 10)
+
+# A connection idle for longer than this (seconds) is pinged before reuse;
+# within the window the last successful statement is proof enough.
+HEALTH_CHECK_INTERVAL = getattr(settings, 'db_health_check_seconds', 30)
+
+# Statements slower than this (ms) are written to the slow-query log.
+SLOW_QUERY_MS = getattr(settings, 'db_slow_query_ms', 500)
+
+# Log one statement in this many (slow ones always); see logger.query_logger.
+QUERY_LOG_SAMPLE = max(1, int(getattr(settings, 'db_query_log_sample', 1)))
+
+_log_counter = itertools.count()
+
+# Requests running more statements than this are logged as over budget
+# (usually an N+1 loop); 0 disables the check.
+QUERY_BUDGET = getattr(settings, 'db_query_budget', 100)
+
+# Optional read replica; user/password/database/port default to the primary's.
+REPLICA_HOST = getattr(settings, 'replica_host', None) if DB_BACKEND == 'mysql' else None
+
+# After a failed replica checkout, read from the primary for this long.
+REPLICA_RETRY_SECONDS = getattr(settings, 'replica_retry_seconds', 60)
+
+_replica_down_until = 0
+
+_G_CONN = '_osprey_db_conn'
+_G_REPLICA = '_osprey_db_replica_conn'
+_G_WROTE = '_osprey_db_wrote'
+_G_STATS = '_osprey_db_stats'
+
+query_stats = QueryStatsRegistry()
+
+# Batch currently holding a connection in this thread/context, if any.
+_pinned = contextvars.ContextVar('osprey_db_batch', default=None)
+
+# Set by use_primary(): skip the replica for the enclosed block.
+_force_primary = contextvars.ContextVar('osprey_db_primary', default=False)
+
+# Rows fetched per round trip by stream_query().
+STREAM_BATCH_SIZE = getattr(settings, 'db_stream_batch_size', 5000)
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s")
 
 
 def init_db():
@@ -20,10 +111,15 @@ def init_db():
     global _pool
     if _pool is not None:
         return
+    if DB_BACKEND == 'sqlite':
+        init_sqlite(SQLITE_PATH)
+        return
     try:
-        _pool = pooling.MySQLConnectionPool(
-            pool_name='osprey_pool',
-            pool_size=10,
+        _pool = BoundedPool(
+            'osprey_pool',
+            size=POOL_SIZE,
+            overflow=POOL_OVERFLOW,
+            timeout=POOL_TIMEOUT,
             host=settings.host,
             user=settings.user,
             password=settings.password,
@@ -38,73 +134,500 @@ def init_db():
         raise DatabasePoolError(f"Failed to initialize database pool: {err}") from err
 
 
-def _borrow_cursor():
-    init_db()
-    conn = _pool.get_connection()
-    conn.time_zone = '-05:00'
-    return conn, conn.cursor(dictionary=True)
+def init_sqlite(path=':memory:'):
+    """Replace the pool with an embedded SQLite database; returns the new pool."""
+    global _pool
+    _pool = SqlitePool(path)
+    return _pool
+
+
+def init_replica():
+    """Initialize the read replica pool (idempotent; no-op without replica_host)."""
+    global _replica_pool
+    if _replica_pool is not None or REPLICA_HOST is None:
+        return
+    try:
+        _replica_pool = BoundedPool(
+            'osprey_replica_pool',
+            size=POOL_SIZE,
+            overflow=POOL_OVERFLOW,
+            timeout=POOL_TIMEOUT,
+            host=REPLICA_HOST,
+            user=getattr(settings, 'replica_user', settings.user),
+            password=getattr(settings, 'replica_password', settings.password),
+            database=getattr(settings, 'replica_database', settings.database),
+            port=getattr(settings, 'replica_port', settings.port),
+            connection_timeout=getattr(settings, 'replica_connection_timeout', 5),
+            autocommit=True,
+        )
+    except mysql.connector.Error as err:
+        raise DatabasePoolError(f"Failed to initialize replica pool: {err}") from err
+
+
+def pool_stats():
+    """Usage counters of the primary and replica pools (None if not started)."""
+    return {
+        'primary': _pool.snapshot() if isinstance(_pool, BoundedPool) else None,
+        'replica': _replica_pool.snapshot() if isinstance(_replica_pool, BoundedPool) else None,
+    }
+
 
+def init_app(app):
+    """Release the request-scoped connection when the app context ends."""
+    app.after_request(_report_request_stats)
+    app.teardown_appcontext(release_request_connection)
 
-def run_query(query, parameters=None, return_val=True, log_vals=True):
-    if log_vals:
-        logger.info("parameters: {}".format(parameters))
-        logger.info("query: {}".format(query))
-    conn, cur = _borrow_cursor()
+
+def release_request_connection(exc=None):
+    for key in (_G_CONN, _G_REPLICA):
+        conn = g.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+
+@contextmanager
+def use_primary():
+    """Send every statement in the block to the primary."""
+    token = _force_primary.set(True)
     try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def stick_to_primary():
+    """Send the rest of this request's statements to the primary."""
+    if has_app_context():
+        setattr(g, _G_WROTE, True)
+
+
+def _use_replica(query, primary=False):
+    if primary or REPLICA_HOST is None or _force_primary.get() or _pinned.get() is not None:
+        return False
+    # Scripts and background jobs read what they just wrote: primary only.
+    if not has_app_context() or g.get(_G_WROTE):
+        return False
+    if time.monotonic() < _replica_down_until:
+        return False
+    return is_read_only(query)
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or request.path
+    return None
+
+
+def _timed(execute, query, *args, log_vals=True):
+    """Call a cursor method, recording how long the statement took."""
+    start = time.perf_counter()
+    try:
+        return execute(query, *args)
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        query_stats.record_statement(query, elapsed_ms)
+        if has_app_context():
+            stats = g.get(_G_STATS)
+            if stats is None:
+                stats = RequestStats()
+                setattr(g, _G_STATS, stats)
+            stats.record(query, elapsed_ms)
+        slow = elapsed_ms >= SLOW_QUERY_MS
+        if slow:
+            slow_query_logger.warning("%.1f ms | %s | %s", elapsed_ms, _endpoint(), query)
+        if query_logger.isEnabledFor(logging.INFO) and (
+                slow or (log_vals and next(_log_counter) % QUERY_LOG_SAMPLE == 0)):
+            query_logger.info("query: %s | parameters: %s | %.1f ms",
+                              query, args[0] if args and log_vals else None, elapsed_ms)
+
+
+def _report_request_stats(response):
+    stats = g.get(_G_STATS)
+    if stats is None:
+        return response
+    response.headers.add('Server-Timing', stats.server_timing())
+    endpoint = _endpoint()
+    query_stats.record_request(endpoint, stats)
+    if QUERY_BUDGET and stats.count > QUERY_BUDGET:
+        slow_query_logger.warning("query budget exceeded | %s | %s queries, %.1f ms, slowest: %s",
+                                  endpoint, stats.count, stats.total_ms, stats.slowest)
+    return response
+
+
+def _raw(conn):
+    # Pooled wrappers are recreated on every checkout; the health-check
+    # timestamp lives on the underlying connection so it survives reuse.
+    return getattr(conn, '_cnx', conn)
+
+
+def _health_check(conn):
+    raw = _raw(conn)
+    now = time.monotonic()
+    if now - getattr(raw, '_osprey_checked_at', 0) > HEALTH_CHECK_INTERVAL:
+        conn.ping(reconnect=True, attempts=3, delay=1)
+    raw._osprey_checked_at = now
+
+
+def _checkout(replica=False):
+    if replica:
+        init_replica()
+        conn = _replica_pool.get_connection()
+    else:
+        init_db()
+        conn = _pool.get_connection()
+    try:
+        _health_check(conn)
+        conn.time_zone = '-05:00'
+    except mysql.connector.Error:
+        _discard(conn)
+        raise
+    return conn
+
+
+def _checkout_replica():
+    """Borrow a replica connection, or None (backing off) if it is unavailable."""
+    global _replica_down_until
+    try:
+        return _checkout(replica=True)
+    except (mysql.connector.Error, DatabasePoolError) as err:
+        logger.error("replica unavailable, reading from primary: %s", err)
+        _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+        return None
+
+
+def _scoped(key, checkout):
+    conn = g.get(key)
+    if conn is None:
+        conn = checkout()
+        if conn is not None:
+            setattr(g, key, conn)
+    else:
         try:
-            conn.ping(reconnect=True, attempts=3, delay=1)
-        except mysql.connector.InterfaceError as error:
-            logger.error("mysql connection error: {}".format(error))
-            return False
+            _health_check(conn)
+        except mysql.connector.Error:
+            _discard(conn, scoped=True)
+            raise
+    return conn
+
+
+def _acquire(replica=False):
+    """Return (conn, scoped); scoped connections stay open until teardown."""
+    tx = _pinned.get()
+    if tx is not None:
+        # Keep statement order: queued batch statements go out first.
+        tx.flush()
+        return tx.conn, True
+    if has_app_context():
+        if replica:
+            try:
+                conn = _scoped(_G_REPLICA, _checkout_replica)
+            except mysql.connector.Error:
+                conn = None
+            if conn is not None:
+                return conn, True
+        return _scoped(_G_CONN, _checkout), True
+    return _checkout(), False
+
+
+def _release(conn, scoped):
+    _raw(conn)._osprey_checked_at = time.monotonic()
+    if not scoped:
+        conn.close()
+
+
+def _discard(conn, scoped=False):
+    """Drop a connection after a connection-level error so the next call re-borrows it."""
+    if _in_batch(conn):
+        # The open batch owns this connection and rolls it back on exit.
+        return
+    if scoped and has_app_context():
+        for key in (_G_CONN, _G_REPLICA):
+            if g.get(key) is conn:
+                g.pop(key)
+    # Force a ping the next time the pool hands this connection out.
+    _raw(conn)._osprey_checked_at = 0
+    try:
+        conn.close()
+    except mysql.connector.Error:
+        pass
+
+
+def _in_batch(conn):
+    tx = _pinned.get()
+    return tx is not None and tx.conn is conn
+
+
+def _is_connection_error(err):
+    return isinstance(err, (mysql.connector.InterfaceError, mysql.connector.OperationalError))
+
+
+def _shape_result(column_names, rows, result):
+    """Build a 'tuples', 'columns' or 'dataframe' result from raw cursor rows."""
+    column_names = list(column_names or ())
+    if result == 'tuples':
+        return column_names, rows
+    if result == 'columns':
+        if not rows:
+            return {name: [] for name in column_names}
+        return {name: list(values) for name, values in zip(column_names, zip(*rows))}
+    if result == 'dataframe':
+        return pd.DataFrame.from_records(rows, columns=column_names)
+    raise ValueError("Unknown result mode: {}".format(result))
+
+
+def run_query(query, parameters=None, return_val=True, log_vals=True, primary=False, result='dicts'):
+    """Run a statement; returns rows, True (return_val=False) or False on error.
+
+    ``result`` picks the row format: 'dicts' (default, a list of dicts),
+    'tuples' (``(column_names, rows)``), 'columns' (dict of column lists) or
+    'dataframe'. The last three skip the per-row dict, which matters for
+    queries that return tens of thousands of rows.
+    """
+    replica = _use_replica(query, primary)
+    if REPLICA_HOST is not None and not replica and not is_read_only(query):
+        stick_to_primary()
+    try:
+        conn, scoped = _acquire(replica)
+    except (mysql.connector.InterfaceError, mysql.connector.PoolError) as error:
+        logger.error("mysql connection error: %s", error)
+        return False
+    # Buffered so a statement never leaves unread rows on a shared connection.
+    cur = conn.cursor(dictionary=(result == 'dicts'), buffered=True)
+    try:
         try:
             if parameters is None:
-                cur.execute(query)
+                _timed(cur.execute, query, log_vals=log_vals)
             else:
-                cur.execute(query, parameters)
+                _timed(cur.execute, query, parameters, log_vals=log_vals)
         except mysql.connector.Error as err:
-            logger.error("mysql error: {} (err_no: {}|query: {})".format(err, err.errno, query))
+            logger.error("mysql error: %s (err_no: %s|query: %s)", err, err.errno, query)
+            if _in_batch(conn):
+                # Abort the enclosing unit of work instead of committing half of it.
+                raise
+            if _is_connection_error(err):
+                cur.close()
+                _discard(conn, scoped)
+                conn = None
             return False
         if return_val:
             data = cur.fetchall()
-            logger.info("No of results: {}".format(len(data)))
+            if result != 'dicts':
+                return _shape_result(cur.column_names, data, result)
             return data
         return True
     finally:
-        cur.close()
-        conn.close()
+        if conn is not None:
+            cur.close()
+            _release(conn, scoped)
 
 
 def query_database_insert(query, parameters, return_res=False):
-    logger.info("query: {}".format(query))
-    logger.info("parameters: {}".format(parameters))
-    conn, cur = _borrow_cursor()
+    stick_to_primary()
+    try:
+        conn, scoped = _acquire()
+    except (mysql.connector.InterfaceError, mysql.connector.PoolError) as error:
+        logger.error("mysql connection error: %s", error)
+        return False
+    cur = conn.cursor(dictionary=True, buffered=True)
     try:
         try:
-            conn.ping(reconnect=True, attempts=3, delay=1)
-        except mysql.connector.InterfaceError as error:
-            logger.error("mysql connection error: {}".format(error))
-            return False
-        try:
-            cur.execute(query, parameters)
+            _timed(cur.execute, query, parameters)
         except Exception as error:
             logger.error(error)
+            if _in_batch(conn):
+                raise
+            if isinstance(error, mysql.connector.Error) and _is_connection_error(error):
+                cur.close()
+                _discard(conn, scoped)
+                conn = None
             return False
-        logger.info("Query: {}".format(cur.statement))
         if return_res:
             return cur.lastrowid
         return True
     finally:
-        cur.close()
-        conn.close()
+        if conn is not None:
+            cur.close()
+            _release(conn, scoped)
 
 
 def executemany(query, params_list):
     """Run executemany and return rowcount."""
-    conn, cur = _borrow_cursor()
+    stick_to_primary()
+    conn, scoped = _acquire()
+    cur = conn.cursor(dictionary=True, buffered=True)
     try:
-        conn.ping(reconnect=True, attempts=3, delay=1)
-        cur.executemany(query, params_list)
+        _timed(cur.executemany, query, params_list)
         return cur.rowcount
+    except mysql.connector.Error as err:
+        if _is_connection_error(err):
+            cur.close()
+            _discard(conn, scoped)
+            conn = None
+        raise
     finally:
-        cur.close()
-        conn.close()
+        if conn is not None:
+            cur.close()
+            _release(conn, scoped)
+
+
+def stream_query(query, parameters=None, batch_size=None, primary=False):
+    """Yield the rows of a query as lists of dicts, ``batch_size`` rows at a time.
+
+    Uses an unbuffered cursor on its own connection (never the request one),
+    so rows stay on the server until fetched and the generator can be
+    consumed after the request context is gone, e.g. by a streamed response.
+    Errors are raised, not returned as False.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    conn = None
+    if _use_replica(query, primary):
+        conn = _checkout_replica()
+    if conn is None:
+        conn = _checkout()
+    cur = conn.cursor(dictionary=True)
+    no_rows = 0
+    try:
+        _timed(cur.execute, query, parameters)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            no_rows += len(rows)
+            yield rows
+    except mysql.connector.Error as err:
+        logger.error("mysql error: %s (err_no: %s|query: %s)", err, err.errno, query)
+        _discard(conn)
+        conn = None
+        raise
+    finally:
+        if conn is not None:
+            try:
+                # Drain rows left by a consumer that stopped early so the
+                # connection goes back to the pool clean.
+                conn.consume_results()
+                cur.close()
+                _release(conn, False)
+            except mysql.connector.Error:
+                _discard(conn)
+        query_logger.info("rows streamed: %s", no_rows)
+
+
+def _combine_statements(statements):
+    """Join queued (query, parameters) pairs into one multi-statement call.
+
+    Named placeholders are prefixed per statement so identical names in
+    different statements do not collide.
+    """
+    if all(params is None or isinstance(params, dict) for _, params in statements):
+        parts = []
+        merged = {}
+        for i, (query, params) in enumerate(statements):
+            prefix = 's{}_'.format(i)
+            parts.append(_NAMED_PARAM.sub(
+                lambda m: '%({}{})s'.format(prefix, m.group(1)), query.strip().rstrip(';')))
+            for key, value in (params or {}).items():
+                merged[prefix + key] = value
+        return '; '.join(parts), merged
+    if all(params is None or isinstance(params, (list, tuple)) for _, params in statements):
+        parts = []
+        merged = []
+        for query, params in statements:
+            parts.append(query.strip().rstrip(';'))
+            merged.extend(params or ())
+        return '; '.join(parts), tuple(merged)
+    raise ValueError("Cannot mix named and positional parameters in one multi-statement batch")
+
+
+class Batch:
+    """Statements queued on one connection, committed together by ``batch()``."""
+
+    def __init__(self, conn, multi=False):
+        self.conn = conn
+        self.multi = multi
+        self._pending = []
+
+    def add(self, query, parameters=None):
+        """Queue a statement; it is sent on the next flush, query or commit."""
+        self._pending.append((query, parameters))
+
+    def flush(self):
+        """Send queued statements, as a single multi-statement call when enabled."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        query_logger.info("batch: sending %s statement(s)", len(pending))
+        cur = self.conn.cursor()
+        try:
+            if self.multi and len(pending) > 1:
+                query, parameters = _combine_statements(pending)
+                _timed(cur.execute, query, parameters or None)
+                while cur.nextset():
+                    pass
+            else:
+                for query, parameters in pending:
+                    _timed(cur.execute, query, parameters)
+        finally:
+            cur.close()
+
+    def query(self, query, parameters=None):
+        """Flush, then run a read inside the transaction and return its rows."""
+        self.flush()
+        cur = self.conn.cursor(dictionary=True, buffered=True)
+        try:
+            _timed(cur.execute, query, parameters)
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+    def executemany(self, query, params_list):
+        """Flush, then run executemany inside the transaction and return rowcount."""
+        self.flush()
+        cur = self.conn.cursor()
+        try:
+            _timed(cur.executemany, query, params_list)
+            return cur.rowcount
+        finally:
+            cur.close()
+
+
+@contextmanager
+def batch(multi=False):
+    """Unit of work: queued statements and nested queries share one transaction.
+
+    Usage::
+
+        with batch(multi=True) as tx:
+            tx.add("DELETE ...", params)
+            rows = tx.query("SELECT ...", params)
+            tx.add("INSERT ...", params)
+
+    Everything is committed when the block exits and rolled back if it raises,
+    so readers never see a partial update. Errors are raised, not returned as
+    False. Nested ``batch()`` calls join the outer unit of work.
+    """
+    outer = _pinned.get()
+    if outer is not None:
+        yield outer
+        return
+    stick_to_primary()
+    conn, scoped = _acquire()
+    conn.start_transaction()
+    tx = Batch(conn, multi=multi)
+    token = _pinned.set(tx)
+    ok = False
+    try:
+        yield tx
+        tx.flush()
+        conn.commit()
+        ok = True
+    finally:
+        _pinned.reset(token)
+        if ok:
+            _release(conn, scoped)
+        else:
+            logger.error("batch rolled back")
+            try:
+                conn.rollback()
+                _release(conn, scoped)
+            except mysql.connector.Error:
+                _discard(conn, scoped)
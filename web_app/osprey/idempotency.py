@@ -0,0 +1,88 @@
+"""Replay protection for worker API writes.
+
+A worker may send ``request_id`` (form, query string or JSON body) with a
+POST. The first request with that id runs normally and its response is kept
+in the shared cache for ``settings.worker_dedupe_seconds``; a retry with the
+same id gets the stored response back without running the view, so a
+timed-out request that did complete is not written twice. While the first
+request is still running, a retry gets 409 and should try again later.
+
+Entries are scoped by endpoint and api_key, and a replay is only served
+while the key is still active (403 otherwise, e.g. after it was revoked).
+Reusing an id with a different body is refused with 422. 5xx responses are
+not stored, so those retries run again. Requests without ``request_id`` are
+not affected.
+"""
+
+import functools
+import hashlib
+
+from flask import current_app, jsonify, make_response, request
+
+import settings
+from cache import cache
+from logger import api_logger as logger
+from osprey import apikeys
+
+DEDUPE_SECONDS = getattr(settings, 'worker_dedupe_seconds', 600)
+
+# How long a request may run before a retry is allowed to run it again.
+IN_FLIGHT_SECONDS = getattr(settings, 'worker_dedupe_in_flight_seconds', 300)
+
+
+def _request_fields():
+    """(request_id, api_key) from the form, query string or a JSON object body."""
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    request_id = request.values.get('request_id') or body.get('request_id')
+    api_key = request.values.get('api_key') or body.get('api_key') or ''
+    return request_id, api_key
+
+
+def _fingerprint():
+    digest = hashlib.sha1(request.get_data())
+    for key, values in sorted(request.form.lists()) + sorted(request.args.lists()):
+        digest.update(repr((key, values)).encode())
+    return digest.hexdigest()
+
+
+def idempotent(view):
+    """Serve replays of a POST with a known ``request_id`` from the dedupe store.
+
+    Goes right under the route decorator, above ``@publishes_changes``, so a
+    replay does not publish again.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request_id, api_key = _request_fields()
+        if request.method != 'POST' or not request_id or DEDUPE_SECONDS <= 0:
+            return view(*args, **kwargs)
+        scope = hashlib.sha1('{}\0{}\0{}'.format(request.endpoint, api_key, request_id).encode()).hexdigest()
+        key = 'idem:{}'.format(scope)
+        fingerprint = _fingerprint()
+        stored = cache.get(key)
+        if stored is not None:
+            # The view checks the key itself; a replay skips the view.
+            if apikeys.lookup(api_key) is None:
+                return jsonify({'error': 'Forbidden'}), 403
+            if stored['fingerprint'] != fingerprint:
+                return jsonify({'error': 'request_id was already used for a different request'}), 422
+            logger.info("replayed request_id=%s | endpoint=%s", request_id, request.endpoint)
+            response = current_app.response_class(stored['body'], status=stored['status'],
+                                                   headers=stored['headers'])
+            response.headers['X-Osprey-Replayed'] = 'true'
+            return response
+        if not cache.add('lock:' + key, True, timeout=IN_FLIGHT_SECONDS):
+            response = jsonify({'error': 'A request with this request_id is in progress'})
+            response.headers['Retry-After'] = '5'
+            return response, 409
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 500 and not response.direct_passthrough:
+                cache.set(key, {'fingerprint': fingerprint, 'status': response.status_code,
+                                'headers': list(response.headers.items()), 'body': response.get_data()},
+                          timeout=DEDUPE_SECONDS)
+        finally:
+            cache.delete('lock:' + key)
+        return response
+    return wrapper
@@ -0,0 +1,100 @@
+"""Change events for cache invalidation.
+
+Code that writes project or folder data calls ``publish()`` once the write
+is done; every handler registered with ``subscribe()`` is then called with
+``project_id``, ``folder_id`` and ``project_alias`` (either of the last two
+may be None) and ``summary``, and evicts whatever it cached for them.
+``summary`` is set when data shown on the homepage changed (project or
+folder stats, folder status, a new folder); file-level writes leave it
+unset so they do not retire the homepage. The worker routes publish
+through ``@publishes_changes``, so pages can be cached for long periods
+and still be fresh right after a worker run.
+
+Handlers run in the request that made the change. A failing handler is
+logged and does not fail the write or stop the other handlers.
+"""
+
+import functools
+
+from flask import g, make_response, request
+
+from logger import logger
+from osprey import pagecache, swr
+
+_subscribers = []
+
+
+def subscribe(handler):
+    """Register ``handler(project_id, folder_id, project_alias, summary)``; usable as a decorator."""
+    if handler not in _subscribers:
+        _subscribers.append(handler)
+    return handler
+
+
+def unsubscribe(handler):
+    if handler in _subscribers:
+        _subscribers.remove(handler)
+
+
+def publish(project_id, folder_id=None, project_alias=None, summary=False):
+    """Tell every subscriber that a project (and optionally one folder) changed."""
+    logger.info("invalidation: project=%s folder=%s alias=%s summary=%s",
+                project_id, folder_id, project_alias, summary)
+    for handler in list(_subscribers):
+        try:
+            handler(project_id, folder_id, project_alias, summary)
+        except Exception:
+            logger.exception("invalidation: handler %s failed", getattr(handler, '__name__', handler))
+
+
+@subscribe
+def _evict_pages(project_id, folder_id, project_alias, summary):
+    tags = []
+    if summary:
+        # Before the tag bump, so no new page is stored with the old summaries.
+        swr.expire(pagecache.PROJECTS_TAG)
+        tags.append(pagecache.PROJECTS_TAG)
+    if project_id is not None:
+        tags.append(pagecache.project_tag(project_id))
+    if folder_id is not None:
+        tags.append(pagecache.folder_tag(folder_id))
+    if tags:
+        pagecache.invalidate_tags(*tags)
+
+
+# Folder properties of worker writes that change what the homepage shows.
+_SUMMARY_PROPERTIES = {'stats', 'status0', 'status1', 'status9'}
+
+
+def _summary_changed():
+    """Whether the worker write in this request changes homepage data."""
+    if request.form.get('type') != 'folder':
+        return False
+    query_property = request.form.get('property')
+    # New folders (/new/) carry no property.
+    return query_property is None or query_property in _SUMMARY_PROPERTIES
+
+
+def nothing_published():
+    """Tell ``@publishes_changes`` that this request changed nothing yet (e.g. it only queued work)."""
+    g.osprey_nothing_published = True
+
+
+def publishes_changes(view):
+    """Publish a change for ``project_alias`` (and form ``folder_id``) after a successful write.
+
+    Goes under the route decorator of views routed by ``project_alias``.
+    Nothing is published for GETs, error responses or after ``nothing_published()``.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if (request.method == 'POST' and response.status_code < 400
+                and not g.pop('osprey_nothing_published', False)):
+            project_alias = kwargs.get('project_alias')
+            project_id = pagecache.project_id_for_alias(project_alias)
+            if project_id is not None:
+                publish(project_id, folder_id=request.form.get('folder_id') or None,
+                        project_alias=project_alias, summary=_summary_changed())
+        return response
+    return wrapper
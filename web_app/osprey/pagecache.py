@@ -0,0 +1,173 @@
+"""Response cache for anonymous dashboard pages.
+
+``@cached_page`` goes *under* the ``@app.route`` decorators (Flask registers
+whatever function the route decorator receives, so a cache above it is
+never called). Anonymous GETs are served from ``cache`` keyed by site_net,
+path and query string; logged-in users, kiosks and non-GET requests always
+run the view.
+
+Entries are tagged (``project_tag``, ``folder_tag``, ``PROJECTS_TAG``) and
+each tag has a version number stored in the cache that is part of the key,
+so ``invalidate_tags()`` retires every page of a project in one write and
+works the same on any cache backend.
+
+The CSRF token rendered into a page belongs to the visitor who rendered it;
+it is swapped for a placeholder when stored and for the current visitor's
+token when served.
+"""
+
+import datetime
+import functools
+import hashlib
+import math
+import time
+
+from flask import g, make_response, request
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+import settings
+from cache import cache
+from logger import logger
+from osprey.db import run_query
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'page_cache_seconds', 300)
+
+# Pages that list every project (homepage tabs) carry this tag.
+PROJECTS_TAG = 'projects'
+
+_CSRF_PLACEHOLDER = b'__osprey_csrf_token__'
+_SKIP_HEADERS = {'set-cookie', 'content-length', 'vary'}
+
+
+def project_tag(project_id):
+    return 'project:{}'.format(project_id)
+
+
+def folder_tag(folder_id):
+    return 'folder:{}'.format(folder_id)
+
+
+def _tag_key(tag):
+    return 'tag:{}'.format(tag)
+
+
+def _tag_versions(tags):
+    if not tags:
+        return []
+    keys = [_tag_key(t) for t in tags]
+    return [v or 0 for v in cache.get_many(*keys)]
+
+
+def _changed_at_key(tag):
+    return '{}:at'.format(_tag_key(tag))
+
+
+def tags_changed_at(tags):
+    """When one of ``tags`` was last invalidated (UTC, rounded up to the second), or None."""
+    if not tags:
+        return None
+    stamps = [t for t in cache.get_many(*[_changed_at_key(t) for t in tags]) if t]
+    if not stamps:
+        return None
+    return datetime.datetime.fromtimestamp(math.ceil(max(stamps)), datetime.timezone.utc)
+
+
+def invalidate_tags(*tags):
+    """Retire every cached page carrying one of ``tags``."""
+    for tag in tags:
+        key = _tag_key(tag)
+        # Created without expiry (a reset to 0 could revive old entries), then
+        # incremented atomically so concurrent publishes never share a version.
+        if not cache.add(key, 1, timeout=0):
+            cache.cache.inc(key)
+    # For Last-Modified (osprey.conditional); written after the bump.
+    now = time.time()
+    cache.set_many({_changed_at_key(tag): now for tag in tags}, timeout=0)
+    logger.info("pagecache: invalidated %s", ', '.join(tags))
+
+
+def _cacheable():
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if current_user.is_authenticated:
+        return False
+    # Kiosk screens get their own layout.
+    return request.remote_addr not in getattr(settings, 'kiosks', ())
+
+
+def page_key(tags=()):
+    """Cache key for the current request."""
+    args = sorted(request.args.items(multi=True))
+    raw = '{}|{}|{}|{}'.format(
+        getattr(settings, 'site_net', ''), request.path, args,
+        list(zip(tags, _tag_versions(tags))))
+    return 'page:{}'.format(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def _tags_for(tags, kwargs):
+    if tags is None:
+        return []
+    if callable(tags):
+        return list(tags(**kwargs))
+    return list(tags)
+
+
+def _store(key, response, timeout):
+    body = response.get_data()
+    token = generate_csrf().encode('utf-8')
+    body = body.replace(token, _CSRF_PLACEHOLDER)
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS]
+    cache.set(key, (response.status_code, headers, body), timeout=timeout)
+
+
+def _restore(entry):
+    status, headers, body = entry
+    if _CSRF_PLACEHOLDER in body:
+        body = body.replace(_CSRF_PLACEHOLDER, generate_csrf().encode('utf-8'))
+    response = make_response(body, status)
+    for name, value in headers:
+        response.headers[name] = value
+    response.headers['X-Osprey-Cache'] = 'hit'
+    return response
+
+
+def cached_page(timeout=None, tags=None):
+    """Cache the response of an anonymous GET view.
+
+    ``tags`` is a list of tags or a callable taking the view's keyword
+    arguments and returning them. Only 200 responses are stored, and not
+    when the view was served a stale ``osprey.swr`` value.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable():
+                return view(*args, **kwargs)
+            key = page_key(_tags_for(tags, kwargs))
+            entry = cache.get(key)
+            if entry is not None:
+                return _restore(entry)
+            response = make_response(view(*args, **kwargs))
+            if (response.status_code == 200 and not response.direct_passthrough
+                    and not g.get('osprey_swr_stale')):
+                _store(key, response, PAGE_CACHE_TIMEOUT if timeout is None else timeout)
+                response.headers['X-Osprey-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+@cache.memoize()
+def project_id_for_alias(project_alias):
+    rows = run_query("SELECT project_id FROM projects WHERE project_alias = %(project_alias)s",
+                     {'project_alias': project_alias})
+    return rows[0]['project_id'] if rows else None
+
+
+def project_page_tags(project_alias=None, folder_id=None, **kwargs):
+    """Tags for views routed by ``project_alias`` (and ``folder_id``)."""
+    tags = [project_tag(project_id_for_alias(project_alias))]
+    if folder_id is not None:
+        tags.append(folder_tag(folder_id))
+    return tags
@@ -0,0 +1,124 @@
+"""Bounded MySQL connection pool with overflow and usage metrics.
+
+mysql-connector's pool raises ``PoolError`` as soon as every connection is
+borrowed and caps the pool at 32 connections. ``BoundedPool`` wraps it:
+up to ``size`` pooled connections plus ``overflow`` short-lived ones, and
+callers beyond that wait up to ``timeout`` seconds for a free slot instead
+of failing straight away.
+"""
+
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+from logger import logger, slow_query_logger
+
+
+class _Borrowed:
+    """A borrowed connection that gives its slot back when closed."""
+
+    def __init__(self, conn, pool, overflow):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_cnx', getattr(conn, '_cnx', conn))
+        object.__setattr__(self, '_owner', pool)
+        object.__setattr__(self, 'overflow', overflow)
+        object.__setattr__(self, '_closed', False)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def close(self):
+        if self._closed:
+            return
+        object.__setattr__(self, '_closed', True)
+        try:
+            self._conn.close()
+        finally:
+            self._owner._returned(self.overflow)
+
+
+class BoundedPool:
+    """Pool of ``size`` connections, ``overflow`` extra, bounded wait for a slot."""
+
+    def __init__(self, pool_name, size=10, overflow=0, timeout=10, wait_log_ms=1000, **config):
+        self.name = pool_name
+        self.size = min(size, pooling.CNX_POOL_MAXSIZE)
+        # Anything over the connector's hard limit is served as overflow.
+        self.overflow = overflow + max(0, size - self.size)
+        self.timeout = timeout
+        self.wait_log_ms = wait_log_ms
+        self._config = config
+        self._pool = pooling.MySQLConnectionPool(pool_name=pool_name, pool_size=self.size, **config)
+        self._slots = threading.BoundedSemaphore(self.size + self.overflow)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.overflow_in_use = 0
+        self.peak_in_use = 0
+        self.borrows = 0
+        self.waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.exhausted = 0
+
+    def get_connection(self):
+        start = time.perf_counter()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.exhausted += 1
+            logger.error("db pool %s exhausted after %ss: %s", self.name, self.timeout, self.snapshot())
+            raise PoolError("Pool {} exhausted: no connection free after {}s".format(self.name, self.timeout))
+        wait_ms = (time.perf_counter() - start) * 1000
+        try:
+            try:
+                conn = self._pool.get_connection()
+                overflow = False
+            except PoolError:
+                conn = mysql.connector.connect(**self._config)
+                overflow = True
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.borrows += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if overflow:
+                self.overflow_in_use += 1
+            if waited:
+                self.waits += 1
+                self.wait_ms_total += wait_ms
+                self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        if wait_ms >= self.wait_log_ms:
+            slow_query_logger.warning("db pool %s wait %.1f ms (%s in use)", self.name, wait_ms, self.in_use)
+        return _Borrowed(conn, self, overflow)
+
+    def _returned(self, overflow):
+        with self._lock:
+            self.in_use -= 1
+            if overflow:
+                self.overflow_in_use -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pool': self.name,
+                'size': self.size,
+                'overflow': self.overflow,
+                'timeout': self.timeout,
+                'in_use': self.in_use,
+                'overflow_in_use': self.overflow_in_use,
+                'peak_in_use': self.peak_in_use,
+                'borrows': self.borrows,
+                'waits': self.waits,
+                'avg_wait_ms': round(self.wait_ms_total / self.waits, 2) if self.waits else 0.0,
+                'max_wait_ms': round(self.wait_ms_max, 2),
+                'exhausted': self.exhausted,
+            }
@@ -0,0 +1,129 @@
+"""Query timing aggregates used by osprey.db.
+
+Kept free of database and Flask imports so it can be unit tested on its own.
+``RequestStats`` holds the numbers for one request; ``QueryStatsRegistry``
+keeps process-wide totals per statement fingerprint and per endpoint, which
+is what the admin stats endpoint reports.
+"""
+
+import re
+import threading
+from collections import deque
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """Normalize a statement so calls that differ only in values group together."""
+    text = _STRING.sub('?', str(query))
+    text = _PARAM.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('(?+)', text)
+    return _SPACE.sub(' ', text).strip().lower()
+
+
+class RequestStats:
+    """Statement count, total time and slowest statement for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest = None
+
+    def record(self, query, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest = fingerprint(query)
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.total_ms, 2),
+            'slowest_ms': round(self.slowest_ms, 2),
+            'slowest': self.slowest,
+        }
+
+    def server_timing(self):
+        """Value for the Server-Timing response header."""
+        return 'db;dur={:.1f};desc="{} queries"'.format(self.total_ms, self.count)
+
+
+class QueryStatsRegistry:
+    """Thread-safe, bounded process-wide totals."""
+
+    def __init__(self, max_statements=500, recent=100):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._endpoints = {}
+        self._recent = deque(maxlen=recent)
+
+    def record_statement(self, query, elapsed_ms):
+        key = fingerprint(query)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    # Drop the cheapest statement to stay bounded.
+                    cheapest = min(self._statements, key=lambda k: self._statements[k]['total_ms'])
+                    del self._statements[cheapest]
+                entry = self._statements[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+    def record_request(self, endpoint, stats):
+        endpoint = endpoint or 'unknown'
+        with self._lock:
+            entry = self._endpoints.setdefault(
+                endpoint, {'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0})
+            entry['requests'] += 1
+            entry['queries'] += stats.count
+            entry['max_queries'] = max(entry['max_queries'], stats.count)
+            entry['db_ms'] += stats.total_ms
+            self._recent.append(dict(stats.as_dict(), endpoint=endpoint))
+
+    def snapshot(self, limit=50):
+        """Endpoints by queries per request, statements by total time."""
+        with self._lock:
+            endpoints = [
+                {
+                    'endpoint': name,
+                    'requests': e['requests'],
+                    'avg_queries': round(e['queries'] / e['requests'], 2),
+                    'max_queries': e['max_queries'],
+                    'avg_db_ms': round(e['db_ms'] / e['requests'], 2),
+                }
+                for name, e in self._endpoints.items()
+            ]
+            statements = [
+                {
+                    'fingerprint': key,
+                    'count': s['count'],
+                    'total_ms': round(s['total_ms'], 2),
+                    'avg_ms': round(s['total_ms'] / s['count'], 2),
+                    'max_ms': round(s['max_ms'], 2),
+                }
+                for key, s in self._statements.items()
+            ]
+            recent = list(self._recent)
+        endpoints.sort(key=lambda e: e['avg_queries'], reverse=True)
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        return {
+            'endpoints': endpoints[:limit],
+            'statements': statements[:limit],
+            'recent_requests': recent[-limit:],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._endpoints.clear()
+            self._recent.clear()
@@ -0,0 +1,129 @@
+"""ArchivesSpace RefID lookups for the JPCA filename check.
+
+``ASpaceClient`` logs in once and reuses the session token until
+``session_seconds`` pass or ArchivesSpace rejects it. RefID lookups are
+cached in-process, found for ``found_seconds`` and missing for the shorter
+``missing_seconds``, since a missing RefID may be catalogued later.
+``lookup_many()`` looks up several RefIDs at once on a small thread pool.
+Failed requests return None and are not cached.
+
+``get_client()`` returns the process-wide client built from
+``settings.aspace_api``, ``aspace_api_username`` and ``aspace_api_password``.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from logger import api_logger as logger
+from osprey.tiercache import LRU
+
+# Responses that mean the session token is no longer valid.
+_EXPIRED_SESSION = (401, 403, 412)
+
+
+class ASpaceError(Exception):
+    """ArchivesSpace could not be reached or refused the request."""
+
+
+class ASpaceClient:
+
+    def __init__(self, base_url, username, password, repository=2, session_seconds=1800,
+                 found_seconds=86400, missing_seconds=600, cache_size=10000, timeout=10, max_workers=4):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.repository = repository
+        self.session_seconds = session_seconds
+        self.found_seconds = found_seconds
+        self.missing_seconds = missing_seconds
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.refids = LRU(cache_size)
+        self._token = None
+        self._token_expires = 0
+        self._login_lock = threading.Lock()
+
+    def _request(self, url, method='GET', headers=None):
+        request = urllib.request.Request(url, method=method, headers=headers or {})
+        with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode('utf-8'))
+
+    def session(self, renew=False):
+        """Session token, logging in only when there is none, it expired or ``renew``."""
+        with self._login_lock:
+            if renew or self._token is None or time.monotonic() >= self._token_expires:
+                url = "{}/users/{}/login?{}".format(
+                    self.base_url, urllib.parse.quote(str(self.username)),
+                    urllib.parse.urlencode({"password": self.password}))
+                try:
+                    self._token = self._request(url, method='POST')['session']
+                except (urllib.error.URLError, OSError, ValueError, KeyError) as err:
+                    self._token = None
+                    raise ASpaceError("ArchivesSpace login failed: {}".format(getattr(err, 'reason', err)))
+                self._token_expires = time.monotonic() + self.session_seconds
+                logger.info("aspace: logged in")
+            return self._token
+
+    def _find(self, refid):
+        url = "{}/repositories/{}/find_by_id/archival_objects?{}".format(
+            self.base_url, self.repository,
+            urllib.parse.urlencode({'ref_id[]': refid, 'resolve[]': 'archival_objects'}))
+        token = self.session()
+        for attempt in range(2):
+            try:
+                return self._request(url, headers={"X-ArchivesSpace-Session": token})
+            except urllib.error.HTTPError as err:
+                if err.code not in _EXPIRED_SESSION or attempt:
+                    raise
+                token = self.session(renew=True)
+
+    def lookup(self, refid):
+        """True if an archival object has this RefID, False if not, None if ArchivesSpace failed."""
+        found = self.refids.get(refid)
+        if found is not None:
+            return found
+        try:
+            data = self._find(refid)
+        except (ASpaceError, urllib.error.URLError, OSError, ValueError) as err:
+            logger.error("aspace: lookup of %s failed: %s", refid, getattr(err, 'reason', err))
+            return None
+        found = any(obj.get('_resolved', {}).get('ref_id') == refid for obj in data.get('archival_objects', []))
+        self.refids.set(refid, found, self.found_seconds if found else self.missing_seconds)
+        return found
+
+    def lookup_many(self, refids):
+        """``{refid: True/False/None}`` for many RefIDs, looked up concurrently."""
+        refids = list(dict.fromkeys(refids))
+        if not refids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(refids))) as pool:
+            return dict(zip(refids, pool.map(self.lookup, refids)))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client from settings, or None when ArchivesSpace is not configured."""
+    global _client
+    with _client_lock:
+        if _client is None and getattr(settings, 'aspace_api', None):
+            _client = ASpaceClient(
+                settings.aspace_api,
+                getattr(settings, 'aspace_api_username', None),
+                getattr(settings, 'aspace_api_password', None),
+                session_seconds=getattr(settings, 'aspace_session_seconds', 1800),
+                found_seconds=getattr(settings, 'aspace_refid_found_seconds', 86400),
+                missing_seconds=getattr(settings, 'aspace_refid_missing_seconds', 600),
+                max_workers=getattr(settings, 'aspace_max_workers', 4),
+            )
+        return _client
@@ -0,0 +1,126 @@
+"""Store exiftool output posted by the worker."""
+
+from __future__ import annotations
+
+import json
+
+from logger import api_logger as logger
+from osprey.db import batch, run_query
+from osprey.services.file_checks import BULK_CHUNK_SIZE, foreign_files
+
+_INSERT_EXIF = (
+    "INSERT INTO files_exif (file_id, filetype, taggroup, tag, tagid, value) "
+    " VALUES (%(file_id)s, %(filetype)s, %(taggroup)s, %(tag)s, %(tagid)s, %(value)s) "
+    " ON DUPLICATE KEY UPDATE value = VALUES(value)")
+
+# Derive files.datetime_created from the DateCreated EXIF tag.
+_UPDATE_DATETIME_CREATED = """
+    WITH data AS (
+      SELECT file_id,
+             MAX(
+               STR_TO_DATE(
+                 REPLACE(SUBSTRING(value, 1, 10), ':', '-'),
+                 '%Y-%m-%d'
+               )
+             ) AS datetime_created
+      FROM files_exif
+      WHERE tag = 'DateCreated'
+        AND file_id IN ({ids})
+      GROUP BY file_id
+    )
+    UPDATE files f, data
+    SET f.datetime_created = data.datetime_created
+    WHERE f.file_id = data.file_id
+    """
+
+
+def exif_rows(file_id, filetype, data_json) -> list:
+    """
+    files_exif rows from ``exiftool -j -G -D`` output for one file.
+
+    The SourceFile entry and the System group are skipped. Keys are split
+    on ':' into taggroup and tag; anything after a second ':' is dropped.
+    """
+    if isinstance(data_json, str):
+        data_json = json.loads(data_json)
+    rows = []
+    for key, tag_data in data_json[0].items():
+        if key == 'SourceFile':
+            continue
+        parts = key.split(':')
+        if parts[0] == "System":
+            continue
+        tagid = value = None
+        for k, item in tag_data.items():
+            if k == "id":
+                tagid = item
+            else:
+                value = str(item)
+        rows.append({'file_id': file_id, 'filetype': filetype, 'taggroup': parts[0],
+                     'tag': parts[1], 'tagid': tagid, 'value': value})
+    return rows
+
+
+def parse_exif_entries(entries) -> list:
+    """
+    Validate worker entries ``{file_id, filetype, exiftool_json}``.
+
+    Returns ``{file_id, filetype, rows}`` dicts; raises ValueError naming the first bad entry.
+    """
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Expected a non-empty JSON array of EXIF entries")
+    parsed = []
+    for n, entry in enumerate(entries):
+        try:
+            file_id = int(entry['file_id'])
+            filetype = str(entry['filetype'])
+            rows = exif_rows(file_id, filetype, entry['exiftool_json'])
+        except (KeyError, TypeError, ValueError, IndexError, AttributeError):
+            raise ValueError("Entry {} needs file_id, filetype and exiftool_json "
+                             "(exiftool -j -G -D output)".format(n))
+        parsed.append({'file_id': file_id, 'filetype': filetype, 'rows': rows})
+    return parsed
+
+
+def _id_chunks(file_ids):
+    """(placeholders, params) for IN lists of at most BULK_CHUNK_SIZE ids."""
+    for i in range(0, len(file_ids), BULK_CHUNK_SIZE):
+        params = {'f{}'.format(n): file_id for n, file_id in enumerate(file_ids[i:i + BULK_CHUNK_SIZE])}
+        yield ', '.join('%({})s'.format(k) for k in params), params
+
+
+def store_exif(entries, project_id=None) -> int:
+    """
+    Replace the EXIF rows of the files in ``entries`` (from parse_exif_entries).
+
+    One transaction: the old rows are deleted and the new ones inserted with
+    executemany, then files.datetime_created is derived once for the whole
+    batch. With ``project_id`` every file must be in that project, otherwise
+    nothing is written and ValueError lists the offending ids.
+    Returns the number of tags written.
+    """
+    file_ids = sorted({entry['file_id'] for entry in entries})
+    rows = [row for entry in entries for row in entry['rows']]
+    with batch() as tx:
+        if project_id is not None:
+            foreign = foreign_files(tx, project_id, entries)
+            if foreign:
+                raise ValueError("Files not in this project: {}".format(', '.join(foreign[:20])))
+        for ids, params in _id_chunks(file_ids):
+            tx.add("DELETE FROM files_exif WHERE file_id IN ({})".format(ids), params)
+        for i in range(0, len(rows), BULK_CHUNK_SIZE):
+            tx.executemany(_INSERT_EXIF, rows[i:i + BULK_CHUNK_SIZE])
+        for ids, params in _id_chunks(file_ids):
+            tx.add(_UPDATE_DATETIME_CREATED.format(ids=ids), params)
+    logger.debug("stored exif | files=%s | tags=%s", len(file_ids), len(rows))
+    return len(rows)
+
+
+def exif_folders(entries) -> list:
+    """Folder ids of the files in ``entries``, to publish after store_exif."""
+    file_ids = sorted({entry['file_id'] for entry in entries})
+    folder_ids = set()
+    for ids, params in _id_chunks(file_ids):
+        for row in run_query("SELECT DISTINCT folder_id FROM files WHERE file_id IN ({})".format(ids), params):
+            folder_ids.add(row['folder_id'])
+    return sorted(folder_ids)
@@ -0,0 +1,52 @@
+"""Write streamed query results to CSV/XLSX without holding them in memory."""
+
+import csv
+import datetime
+import decimal
+
+from openpyxl import Workbook
+
+_XLSX_TYPES = (str, int, float, bool, decimal.Decimal,
+               datetime.datetime, datetime.date, datetime.time, datetime.timedelta)
+
+
+def _xlsx_value(value):
+    if value is None or isinstance(value, _XLSX_TYPES):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def write_rows(batches, csv_file=None, xlsx_file=None):
+    """Write row batches (lists of dicts, as from ``stream_query``) in one pass.
+
+    ``csv_file`` is an open text file; ``xlsx_file`` a path or binary file.
+    The XLSX workbook is write-only, so rows are flushed to disk as they come.
+    Returns the number of rows written.
+    """
+    writer = None
+    sheet = None
+    workbook = None
+    if xlsx_file is not None:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+    columns = None
+    no_rows = 0
+    for rows in batches:
+        for row in rows:
+            if columns is None:
+                columns = list(row.keys())
+                if csv_file is not None:
+                    writer = csv.writer(csv_file, lineterminator='\n')
+                    writer.writerow(columns)
+                if sheet is not None:
+                    sheet.append(columns)
+            if writer is not None:
+                writer.writerow(['' if row[c] is None else row[c] for c in columns])
+            if sheet is not None:
+                sheet.append([_xlsx_value(row[c]) for c in columns])
+            no_rows += 1
+    if workbook is not None:
+        workbook.save(xlsx_file)
+    return no_rows
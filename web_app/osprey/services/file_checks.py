@@ -5,11 +5,35 @@ from __future__ import annotations
 import re
 
 from logger import api_logger as logger
-from osprey.db import run_query
+from osprey.db import batch, run_query
+from osprey.services import aspace as aspace_service
 
 # Projects that use ArchivesSpace RefID salvage after a failed filename check.
 _JPCA_PROJECT_IDS = {"220", "248"}
 
+# Checks whose result is computed here, not reported by the worker.
+SERVER_SIDE_CHECKS = {"filename"}
+
+# A RefID found in ArchivesSpace, recorded so the filename check passes from now on.
+_INSERT_JPCA_REFID = (
+    "INSERT INTO jpc_aspace_data (refid, table_id, resource_id, archive_box, archive_type, archive_folder, unit_title) "
+    " VALUES (%(refid)s, uuid_v4s(), 'a', 'a', 'a', 'a', 'a')")
+
+# Rows per executemany / ownership lookup in bulk_upsert_file_checks.
+BULK_CHUNK_SIZE = 1000
+
+_UPSERT_CHECKS = (
+    "INSERT INTO files_checks (file_id, folder_id, file_check, check_results, check_info, updated_at) "
+    " VALUES (%(file_id)s, %(folder_id)s, %(file_check)s, %(check_results)s, %(check_info)s, CURRENT_TIMESTAMP) "
+    " ON DUPLICATE KEY UPDATE "
+    " check_results = VALUES(check_results), check_info = VALUES(check_info), updated_at = CURRENT_TIMESTAMP")
+
+_UPSERT_CHECKS_TRANSCRIPTION = (
+    "INSERT INTO transcription_files_checks (file_transcription_id, file_check, check_results, check_info, updated_at) "
+    " VALUES (%(file_id)s, %(file_check)s, %(check_results)s, %(check_info)s, CURRENT_TIMESTAMP) "
+    " ON DUPLICATE KEY UPDATE "
+    " check_results = VALUES(check_results), check_info = VALUES(check_info), updated_at = CURRENT_TIMESTAMP")
+
 # Statement keywords / comment markers that must never appear in scalar expressions.
 _FORBIDDEN_SQL = re.compile(
     r"(;|--|/\*|\*/|\b(select|insert|update|delete|drop|alter|truncate|create|replace|"
@@ -104,3 +128,130 @@ def run_filename_check(file_id, project_id=None) -> dict:
         logger.warning("filename check: file_id not found | file_id=%s", file_id)
         return {'result': 1, 'info': 'File not found', 'refid': None}
     return rows[0]
+
+
+def parse_check_rows(rows, transcription=0) -> list:
+    """
+    Validate worker check rows ``{file_id, folder_id, file_check, check_results, check_info}``.
+
+    Returns normalized dicts; raises ValueError naming the first bad row.
+    ``folder_id`` is required except for transcription projects. ``filename``
+    rows need no check_results: bulk_upsert_file_checks computes them.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Expected a non-empty JSON array of check rows")
+    parsed = []
+    for n, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise ValueError("Row {} is not an object".format(n))
+        server_side = str(row.get('file_check', '')).strip() in SERVER_SIDE_CHECKS
+        try:
+            file_check = str(row['file_check']).strip()
+            check_results = None if server_side else int(row['check_results'])
+            file_id = row['file_id'] if transcription == 1 else int(row['file_id'])
+            folder_id = row.get('folder_id') if transcription == 1 else int(row['folder_id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Row {} needs file_id, folder_id, file_check and an integer check_results".format(n))
+        if not file_check:
+            raise ValueError("Row {} has an empty file_check".format(n))
+        if server_side and transcription == 1:
+            raise ValueError("Row {}: the {} check is computed by the server, post it per file".format(n, file_check))
+        check_info = row.get('check_info')
+        parsed.append({
+            'file_id': file_id,
+            'folder_id': folder_id,
+            'file_check': file_check,
+            'check_results': check_results,
+            'check_info': '' if check_info is None else str(check_info),
+        })
+    return parsed
+
+
+def foreign_files(tx, project_id, rows, transcription=0) -> list:
+    """
+    File ids of ``rows`` (dicts with ``file_id``) that are not in the project.
+
+    Rows of image projects that carry a ``folder_id`` must also be in that
+    folder. Looked up with ``tx.query`` in chunks of BULK_CHUNK_SIZE ids.
+    """
+    if transcription == 1:
+        query = ("SELECT file_transcription_id AS file_id, NULL AS folder_id FROM transcription_files "
+                 " WHERE file_transcription_id IN ({ids}) AND folder_transcription_id IN "
+                 " (SELECT folder_transcription_id FROM transcription_folders WHERE project_id = %(project_id)s)")
+    else:
+        query = ("SELECT f.file_id, f.folder_id FROM files f, folders fol "
+                 " WHERE f.folder_id = fol.folder_id AND fol.project_id = %(project_id)s AND f.file_id IN ({ids})")
+
+    ids = sorted({row['file_id'] for row in rows}, key=str)
+    found = {}
+    for i in range(0, len(ids), BULK_CHUNK_SIZE):
+        params = {'f{}'.format(n): file_id for n, file_id in enumerate(ids[i:i + BULK_CHUNK_SIZE])}
+        placeholders = ', '.join('%({})s'.format(k) for k in params)
+        params['project_id'] = project_id
+        for row in tx.query(query.format(ids=placeholders), params):
+            found[str(row['file_id'])] = str(row['folder_id'])
+    foreign = set()
+    for row in rows:
+        file_id = str(row['file_id'])
+        folder_id = row.get('folder_id') if transcription != 1 else None
+        if file_id not in found or (folder_id is not None and str(folder_id) != found[file_id]):
+            foreign.add(file_id)
+    return sorted(foreign)
+
+
+def _filename_results(project_id, rows) -> list:
+    """
+    Set check_results/check_info of ``filename`` rows as the per-file path does.
+
+    For JPCA projects the RefIDs that failed are looked up in ArchivesSpace
+    together (``lookup_many``); files whose RefID is found pass. Returns the
+    RefIDs to record in jpc_aspace_data.
+    """
+    if not filename_check_enabled(project_id):
+        for row in rows:
+            row['check_results'], row['check_info'] = 1, "Query for filename not found"
+        return []
+    failed = {}
+    for row in rows:
+        res = run_filename_check(row['file_id'], project_id=project_id)
+        row['check_results'], row['check_info'] = int(res['result']), res['info']
+        if row['check_results'] == 1 and res['refid']:
+            failed.setdefault(res['refid'], []).append(row)
+    if not failed or str(project_id) not in _JPCA_PROJECT_IDS:
+        return []
+    client = aspace_service.get_client()
+    if client is None:
+        return []
+    found = [refid for refid, ok in client.lookup_many(list(failed)).items() if ok]
+    for refid in found:
+        for row in failed[refid]:
+            row['check_results'], row['check_info'] = 0, refid
+    logger.info("filename checks: %s of %s failing RefIDs found in ArchivesSpace", len(found), len(failed))
+    return found
+
+
+def bulk_upsert_file_checks(project_id, rows, transcription=0) -> int:
+    """
+    Upsert parsed check rows with executemany in one transaction.
+
+    Every file must belong to ``project_id`` (and to the row's folder);
+    otherwise nothing is written and ValueError lists the offending ids.
+    ``filename`` rows are computed here first, with the ArchivesSpace
+    lookups made before the write transaction starts.
+    Returns the number of rows written.
+    """
+    query = _UPSERT_CHECKS_TRANSCRIPTION if transcription == 1 else _UPSERT_CHECKS
+    with batch() as tx:
+        foreign = foreign_files(tx, project_id, rows, transcription)
+    if foreign:
+        raise ValueError("Files not in this project or folder: {}".format(
+            ', '.join(foreign[:20])))
+    filename_rows = [row for row in rows if row['file_check'] in SERVER_SIDE_CHECKS]
+    refids = _filename_results(project_id, filename_rows) if filename_rows else []
+    with batch() as tx:
+        if refids:
+            tx.executemany(_INSERT_JPCA_REFID, [{'refid': refid} for refid in refids])
+        for i in range(0, len(rows), BULK_CHUNK_SIZE):
+            tx.executemany(query, rows[i:i + BULK_CHUNK_SIZE])
+    logger.info("bulk file checks | project_id=%s | rows=%s", project_id, len(rows))
+    return len(rows)
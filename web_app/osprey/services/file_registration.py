@@ -0,0 +1,111 @@
+"""Register the files of a new folder (worker API)."""
+
+from __future__ import annotations
+
+import uuid
+
+from logger import api_logger as logger
+from osprey.db import batch
+from osprey.services.name_index import FOLDER_CONFLICTS, INDEX_FOLDER
+
+# Rows per executemany in register_files.
+BULK_CHUNK_SIZE = 1000
+
+# Files already in the folder are left as they are; this relies on the
+# unique (folder, file_name) keys from db/files_unique_names.sql.
+_INSERT_FILES = (
+    "INSERT INTO files (file_uid, folder_id, file_name, file_timestamp, uid, file_ext) "
+    " VALUES (%(file_uid)s, %(folder_id)s, %(filename)s, %(timestamp)s, uuid_v4s(), %(filetype)s) "
+    " ON DUPLICATE KEY UPDATE file_id = file_id")
+
+_INSERT_FILES_TRANSCRIPTION = (
+    "INSERT INTO transcription_files (file_transcription_id, folder_transcription_id, file_name, file_timestamp, file_ext) "
+    " VALUES (%(file_uid)s, %(folder_id)s, %(filename)s, %(timestamp)s, %(filetype)s) "
+    " ON DUPLICATE KEY UPDATE file_transcription_id = file_transcription_id")
+
+
+def unique_file_check(conflict_folders) -> tuple[int, str]:
+    """(check_results, check_info) of the unique_file check given the other folders holding the name."""
+    if len(conflict_folders) == 0:
+        return 0, ""
+    if len(conflict_folders) == 1:
+        return 1, "File with the same name in folder: {}".format(conflict_folders[0])
+    return 1, "Files with the same name in folders: {}".format(', '.join(conflict_folders))
+
+
+def parse_file_rows(rows) -> list:
+    """
+    Validate worker file rows ``{filename, timestamp, filetype}``.
+
+    Returns normalized dicts; raises ValueError naming the first bad row.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Expected a non-empty JSON array of files")
+    parsed = []
+    seen = set()
+    for n, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise ValueError("Row {} is not an object".format(n))
+        filename = row.get('filename')
+        timestamp = row.get('timestamp')
+        if not isinstance(filename, str) or not filename.strip() or timestamp in (None, ""):
+            raise ValueError("Row {} needs filename and timestamp".format(n))
+        filename = filename.strip()
+        if filename in seen:
+            raise ValueError("Row {}: {} is listed twice".format(n, filename))
+        seen.add(filename)
+        parsed.append({'filename': filename, 'timestamp': timestamp, 'filetype': row.get('filetype')})
+    return parsed
+
+
+def register_files(project_id, folder_id, rows, transcription=0) -> list:
+    """
+    Insert parsed file rows into a folder and run the unique_file check.
+
+    One transaction: an executemany insert (files already registered in the
+    folder are kept as they are), one read back of the folder's ids and one
+    query for names also used in other folders of the project (through
+    files_name_index for image projects, which is updated here too).
+    Returns ``{filename, file_id, unique_file: {check_results, check_info}}``
+    per row, in input order. Raises ValueError if the folder is not in the project.
+    """
+    if transcription == 1:
+        folder_query = ("SELECT folder_transcription_id AS folder_id FROM transcription_folders "
+                        " WHERE folder_transcription_id = %(folder_id)s AND project_id = %(project_id)s")
+        insert = _INSERT_FILES_TRANSCRIPTION
+        ids_query = ("SELECT file_transcription_id AS file_id, file_name FROM transcription_files "
+                     " WHERE folder_transcription_id = %(folder_id)s")
+        conflicts_query = (
+            "SELECT src.file_name, fol.folder AS project_folder "
+            " FROM transcription_files src, transcription_files f, transcription_folders fol "
+            " WHERE src.folder_transcription_id = %(folder_id)s AND f.file_name = src.file_name "
+            " AND f.folder_transcription_id != src.folder_transcription_id "
+            " AND f.folder_transcription_id = fol.folder_transcription_id AND fol.project_id = %(project_id)s "
+            " ORDER BY fol.folder")
+    else:
+        folder_query = ("SELECT folder_id FROM folders "
+                        " WHERE folder_id = %(folder_id)s AND project_id = %(project_id)s")
+        insert = _INSERT_FILES
+        ids_query = "SELECT file_id, file_name FROM files WHERE folder_id = %(folder_id)s"
+        conflicts_query = FOLDER_CONFLICTS
+    params = {'folder_id': folder_id, 'project_id': project_id}
+    values = [dict(row, folder_id=folder_id, file_uid=str(uuid.uuid4())) for row in rows]
+    with batch() as tx:
+        if not tx.query(folder_query, params):
+            raise ValueError("Folder {} is not in this project".format(folder_id))
+        for i in range(0, len(values), BULK_CHUNK_SIZE):
+            tx.executemany(insert, values[i:i + BULK_CHUNK_SIZE])
+        if transcription != 1:
+            tx.add(INDEX_FOLDER, params)
+        ids = {row['file_name']: row['file_id'] for row in tx.query(ids_query, params)}
+        conflicts = {}
+        for row in tx.query(conflicts_query, params):
+            conflicts.setdefault(row['file_name'], []).append(row['project_folder'])
+    logger.info("registered files | project_id=%s | folder_id=%s | rows=%s", project_id, folder_id, len(rows))
+    result = []
+    for row in rows:
+        check_results, check_info = unique_file_check(conflicts.get(row['filename'], []))
+        result.append({'filename': row['filename'],
+                       'file_id': ids.get(row['filename']),
+                       'unique_file': {'check_results': check_results, 'check_info': check_info}})
+    return result
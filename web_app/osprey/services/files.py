@@ -2,8 +2,6 @@
 
 from uuid import UUID
 
-import pandas as pd
-
 from osprey.db import query_database_insert, run_query
 
 
@@ -82,13 +80,13 @@ def get_file_postprocessing(file_id):
 
 
 def get_file_metadata(file_id, file_ext):
-    return pd.DataFrame(run_query(("SELECT tag, taggroup, tagid, value "
+    return run_query(("SELECT tag, taggroup, tagid, value "
                                      " FROM files_exif "
                                      " WHERE file_id = %(file_id)s AND "
                                      "       lower(filetype) = %(file_ext)s AND "
                                      "       lower(taggroup) != 'system' "
                                      " ORDER BY taggroup, tag "),
-                                    {'file_id': str(file_id), 'file_ext': file_ext}))
+                                    {'file_id': str(file_id), 'file_ext': file_ext}, result='dataframe')
 
 
 def get_file_links(file_id):
@@ -118,13 +116,13 @@ def get_transcription_sources(project_id):
 
 
 def get_transcription_text_table(source_id, file_id):
-    return pd.DataFrame(run_query(("""
+    return run_query(("""
                                 SELECT fields.field_name as field, COALESCE(t.transcription_text, '') as value
                                     FROM transcription_fields fields LEFT JOIN transcription_files_text t
                                                  ON (fields.field_id = t.field_id and t.file_transcription_id = %(file_id)s)
                                     WHERE fields.transcription_source_id = %(source_id)s
                                             ORDER BY fields.sort_by
-                                    """), {'source_id': source_id, 'file_id': file_id}))
+                                    """), {'source_id': source_id, 'file_id': file_id}, result='dataframe')
 
 
 def get_file_details_transcription(folder_id, file_id):
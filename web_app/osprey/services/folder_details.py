@@ -2,8 +2,6 @@
 
 import uuid
 
-import pandas as pd
-
 from osprey.db import run_query
 
 CHECK_RESULTS_SQL = (
@@ -97,7 +95,8 @@ def list_project_postprocessing(project_id):
     return [row['post_step'] for row in rows]
 
 
-def list_folder_files_base(folder_id, transcription):
+def list_folder_files_base(folder_id, transcription, result='dicts'):
+    """Folder files with timestamps and tif md5; ``result`` as in run_query."""
     if transcription == 1:
         return run_query(
             ("SELECT f.file_transcription_id as file_id, f.file_name, "
@@ -110,6 +109,7 @@ def list_folder_files_base(folder_id, transcription):
              " WHERE f.folder_transcription_id = %(folder_id)s "
              " ORDER BY f.file_name"),
             {'folder_id': folder_id},
+            result=result,
         )
     return run_query(
         ("SELECT f.file_id, f.file_name, "
@@ -122,10 +122,16 @@ def list_folder_files_base(folder_id, transcription):
          " WHERE f.folder_id = %(folder_id)s "
          " ORDER BY f.file_name"),
         {'folder_id': folder_id},
+        result=result,
     )
 
 
 def list_folder_file_check_rows(folder_id, transcription, project_id):
+    """(columns, rows) of file_id, file_check, check_results, check_info, updated_at.
+
+    Fetched as tuples: one row per file and check, so this is the largest
+    result on the folder page.
+    """
     if transcription == 1:
         return run_query(
             ("WITH checks AS ("
@@ -143,6 +149,7 @@ def list_folder_file_check_rows(folder_id, transcription, project_id):
              " LEFT JOIN transcription_files_checks c "
              "   ON (ff.file_id = c.file_transcription_id AND c.file_check = d.file_check)"),
             {'folder_id': folder_id, 'project_id': project_id},
+            result='tuples',
         )
     return run_query(
         ("WITH checks AS ("
@@ -159,6 +166,7 @@ def list_folder_file_check_rows(folder_id, transcription, project_id):
          " LEFT JOIN files_checks c "
          "   ON (ff.file_id = c.file_id AND c.file_check = d.file_check)"),
         {'folder_id': folder_id, 'project_id': project_id},
+        result='tuples',
     )
 
 
@@ -217,15 +225,18 @@ def build_file_postprocessing_arrays(base_files, postproc_rows, project_postproc
 
 
 def build_file_checks_arrays(base_files, check_rows, project_checks):
-    """Attach ordered file_checks arrays to each file dict."""
+    """Attach ordered file_checks arrays to each file dict.
+
+    ``check_rows`` is the (columns, rows) pair from list_folder_file_check_rows.
+    """
     by_file = {}
-    for row in check_rows:
-        file_id = row['file_id']
-        by_file.setdefault(file_id, {})[row['file_check']] = {
-            'file_check': row['file_check'],
-            'check_results': row['check_results'],
-            'check_info': row['check_info'],
-            'updated_at': row['updated_at'],
+    _columns, rows = check_rows
+    for file_id, file_check, check_results, check_info, updated_at in rows:
+        by_file.setdefault(file_id, {})[file_check] = {
+            'file_check': file_check,
+            'check_results': check_results,
+            'check_info': check_info,
+            'updated_at': updated_at,
         }
 
     files = []
@@ -250,7 +261,7 @@ def attach_checks_flat(folder_files_df, folder_id, transcription, filechecks_lis
     """Merge flat OK/Pending/Failed columns (legacy API response)."""
     for fcheck in filechecks_list:
         if transcription == 1:
-            list_files = pd.DataFrame(run_query(
+            list_files = run_query(
                 ("SELECT f.file_transcription_id as file_id, "
                  "   CASE WHEN check_results = 0 THEN 'OK' "
                  "       WHEN check_results = 9 THEN 'Pending' "
@@ -263,9 +274,10 @@ def attach_checks_flat(folder_files_df, folder_id, transcription, filechecks_lis
                  "   select file_transcription_id from transcription_files "
                  "   where folder_transcription_id = %(folder_id)s)").format(fcheck=fcheck),
                 {'file_check': fcheck, 'folder_id': folder_id},
-            ))
+                result='dataframe',
+            )
         else:
-            list_files = pd.DataFrame(run_query(
+            list_files = run_query(
                 ("SELECT f.file_id, "
                  "   CASE WHEN check_results = 0 THEN 'OK' "
                  "       WHEN check_results = 9 THEN 'Pending' "
@@ -275,7 +287,8 @@ def attach_checks_flat(folder_files_df, folder_id, transcription, filechecks_lis
                  "   ON (f.file_id=c.file_id AND c.file_check = %(file_check)s) "
                  " WHERE f.folder_id = %(folder_id)s").format(fcheck=fcheck),
                 {'file_check': fcheck, 'folder_id': folder_id},
-            ))
+                result='dataframe',
+            )
         if list_files.shape[0] > 0:
             folder_files_df = folder_files_df.merge(list_files, how='outer', on='file_id')
     return folder_files_df
@@ -0,0 +1,253 @@
+"""Homepage summary statistics and project tables.
+
+These are the heaviest queries of the most visited page and only change
+when workers report, so they are served stale-while-revalidate
+(``osprey.swr``): callers get the cached value at once and a background
+thread refreshes it after ``settings.swr_soft_seconds``, or as soon as a
+stats change is published (the ``PROJECTS_TAG`` group).
+"""
+
+import math
+
+import settings
+from osprey.db import run_query
+from osprey.pagecache import PROJECTS_TAG
+from osprey.swr import stale_while_revalidate
+
+HOMEPAGE_TABLE_CLASSES = [
+    'display', 'table', 'table-hover', 'homepage-project-table', 'w-100'
+]
+
+
+def _stat_value(total):
+    return "{:,}".format(total or 0)
+
+
+@stale_while_revalidate(group=PROJECTS_TAG)
+def last_update():
+    return run_query("SELECT date_format(MAX(updated_at), '%d-%b-%Y') AS updated_at FROM projects_stats")[0]['updated_at']
+
+
+@stale_while_revalidate(group=PROJECTS_TAG)
+def team_summary(team):
+    """Summary stats of a homepage tab: 'summary', 'md', 'is' or 'inf'."""
+    mass_digi_total = 0
+    if team == "summary":
+        # Summary stats
+        summary_stats = {
+            'objects_digitized': _stat_value(run_query(
+                "SELECT SUM(objects_digitized) as total "
+                "FROM projects_stats WHERE project_id NOT IN "
+                "(SELECT project_id FROM projects WHERE skip_project IS True)")[0]['total']),
+            'images_captured': _stat_value(run_query(
+                "SELECT SUM(images_taken) as total "
+                "FROM projects_stats WHERE project_id NOT IN "
+                "(SELECT project_id FROM projects WHERE skip_project IS True)")[0]['total']),
+            'digitization_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects WHERE skip_project IS NOT True")[0]['total']),
+            'active_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects "
+                "WHERE skip_project IS NOT True AND project_status='Ongoing'")[0]['total']),
+            'images_public': _stat_value(run_query(
+                "SELECT SUM(images_public) as total FROM projects_stats "
+                "WHERE project_id NOT IN "
+                "(SELECT project_id FROM projects WHERE skip_project IS True)")[0]['total']),
+        }
+    elif team == "md":
+        # MD stats
+        summary_stats = {
+            'objects_digitized': _stat_value(run_query(
+                "SELECT SUM(objects_digitized) as total FROM projects_stats WHERE project_id IN "
+                "(SELECT project_id FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True)"
+            )[0]['total']),
+            'images_captured': _stat_value(run_query(
+                "SELECT SUM(images_taken) as total FROM projects_stats WHERE project_id IN "
+                "(SELECT project_id FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True)"
+            )[0]['total']),
+            'digitization_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True"
+            )[0]['total']),
+            'active_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'MD' AND "
+                "skip_project IS NOT True AND project_status='Ongoing'"
+            )[0]['total']),
+            'images_public': _stat_value(run_query(
+                "SELECT SUM(images_public) as total FROM projects_stats WHERE project_id IN "
+                "(SELECT project_id FROM projects WHERE skip_project IS NOT True AND project_section = 'MD')"
+            )[0]['total']),
+        }
+        no_items = run_query(("SELECT SUM(objects_digitized) as total from projects_stats where project_id IN (SELECT project_id FROM projects WHERE project_section = 'MD' AND skip_project IS NOT True)"))[0]['total']
+        mass_digi_total = math.floor((int(no_items)*1.0)/100000)/10
+    elif team == "is":
+        summary_stats = {
+            'objects_digitized': _stat_value(run_query(
+                "SELECT SUM(objects_digitized) as total FROM projects_stats WHERE project_id IN "
+                "(SELECT project_id FROM projects WHERE project_section = 'IS' AND skip_project IS NOT True)"
+            )[0]['total']),
+            'images_captured': _stat_value(run_query(
+                "SELECT SUM(images_taken) as total FROM projects_stats WHERE project_id IN "
+                "(SELECT project_id FROM projects WHERE project_section = 'IS' AND skip_project IS NOT True)"
+            )[0]['total']),
+            'digitization_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'IS' AND skip_project IS NOT True"
+            )[0]['total']),
+            'active_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects WHERE project_section = 'IS' AND "
+                "skip_project IS NOT True AND project_status='Ongoing'"
+            )[0]['total']),
+            'images_public': _stat_value(run_query(
+                "SELECT SUM(images_public) as total FROM projects_stats WHERE project_id IN "
+                "(SELECT project_id FROM projects WHERE skip_project IS NOT True AND project_section = 'IS')"
+            )[0]['total']),
+        }
+    elif team == "inf":
+        # IS stats
+        summary_stats = {
+            'digitization_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects_informatics")[0]['total']),
+            'active_projects': _stat_value(run_query(
+                "SELECT COUNT(*) as total FROM projects_informatics WHERE project_status='Ongoing'"
+            )[0]['total']),
+            'records': _stat_value(run_query(
+                "SELECT SUM(records) as total FROM projects_informatics WHERE records_redundant IS False"
+            )[0]['total']),
+        }
+    return {'summary_stats': summary_stats, 'mass_digi_total': mass_digi_total}
+
+
+@stale_while_revalidate(group=PROJECTS_TAG)
+def section_tables(sawhm=False):
+    """Project tables of the homepage tabs, rendered to HTML."""
+    section_query = ((" SELECT "
+                     " p.projects_order, "
+                     " CONCAT('<abbr title=\"', u.unit_fullname, '\">', p.project_unit, '</abbr>') as project_unit, "
+                     "      CASE WHEN "
+                     "             p.project_alias IS NULL "
+                     "              THEN p.project_title "
+                     "      ELSE "
+                     "          (CASE WHEN "
+                     "              p.project_status = 'Ongoing' and ps.collex_to_digitize != 0 "
+                     "              THEN "
+                     "              CONCAT('<a href=\"{app_root}/dashboard/', p.project_alias, '\">', p.project_title, '</a><br>"
+                     "                  <small>Estimated Progress: ', ROUND((ps.objects_digitized/ps.collex_to_digitize) * 100), ' % "
+                     "                  <div class=\"progress dashboard-progress\"> "
+                     "                      <div class=\"progress-bar bg-success\" role=\"progressbar\" style=\"width: ', "
+                     "                          ROUND((ps.objects_digitized/ps.collex_to_digitize) * 100), '%\" "
+                     "                         aria-valuenow=\"', ROUND((ps.objects_digitized/ps.collex_to_digitize) * 100), '\" aria-valuemin=\"0\" aria-valuemax=\"100\"> "
+                     "                      </div> "
+                     "                   </div></small>"
+                     "              ') "
+                     "          ELSE "
+                     "              CONCAT('<a href=\"{app_root}/dashboard/', p.project_alias, '\">', p.project_title, '</a>') "
+                     "          END) "
+                     "      END as project_title, "
+                     " p.project_status, "
+                     " p.project_manager, "
+                     " CASE "
+                     "      WHEN p.project_end IS NULL THEN CONCAT(date_format(p.project_start, '%d %b %Y'), ' -') "
+                     "      WHEN p.project_start = p.project_end THEN date_format(p.project_start, '%d %b %Y') "                     
+                     "      WHEN date_format(p.project_start, '%Y-%c') = date_format(p.project_end, '%Y-%c') "
+                     "          THEN CONCAT(date_format(p.project_start, '%d'), ' - ', date_format(p.project_end, '%d %b %Y')) "
+                     "      WHEN date_format(p.project_start, '%Y') = date_format(p.project_end, '%Y') "
+                     "          THEN CONCAT(date_format(p.project_start, '%d %b'), ' - ', date_format(p.project_end, '%d %b %Y')) "
+                     "      ELSE CONCAT(date_format(p.project_start, '%d %b %Y'), ' - ', date_format(p.project_end, '%d %b %Y')) END "
+                     "         as project_dates, "
+                     " CASE WHEN p.objects_estimated IS True THEN CONCAT(coalesce(format(ps.objects_digitized, 0), 0), '*') ELSE "
+                     " coalesce(format(ps.objects_digitized, 0), 0) END as objects_digitized, "
+                     " CASE WHEN p.images_estimated IS True THEN CONCAT(coalesce(format(ps.images_taken, 0), 0), '*') ELSE coalesce(format(ps.images_taken, 0), 0) END as images_taken, "
+                     " CASE WHEN p.images_estimated IS True THEN CONCAT(coalesce(format(ps.images_public, 0), 0), '*') ELSE coalesce(format(ps.images_public, 0), 0) END as images_public "
+                     " FROM projects p LEFT JOIN projects_stats ps ON (p.project_id = ps.project_id) LEFT JOIN si_units u ON (p.project_unit = u.unit_id) "
+                     " WHERE p.skip_project = 0 AND p.project_section = %(section)s "
+                     " GROUP BY "
+                     "        p.project_id, p.project_title, p.project_unit, p.project_status, p.project_description, "
+                     "        p.project_method, p.project_manager, p.project_start, p.project_end, p.updated_at, p.projects_order, p.project_type, "
+                     "        ps.collex_to_digitize, p.images_estimated, p.objects_estimated, ps.images_taken, ps.objects_digitized, ps.images_public"
+                     " ORDER BY p.projects_order DESC").format(app_root=settings.app_root))
+    list_projects_md = run_query(section_query, {'section': 'MD'}, result='dataframe')
+    list_projects_md = list_projects_md.drop("images_public", axis=1)
+    list_projects_md = list_projects_md.rename(columns={
+        "project_unit": "Unit",
+        "project_title": "Title",
+        "project_status": "Status",
+        "project_manager": "<abbr title=\"Project Manager\">PM</abbr>",
+        "project_dates": "Dates",
+        "objects_digitized": "Specimens/Objects Digitized",
+        "images_taken": "Images Captured"
+    })
+
+    is_section_query = section_query
+    if sawhm:
+        is_section_query = section_query.replace(
+            "WHERE p.skip_project = 0 AND p.project_section = %(section)s",
+            "WHERE p.skip_project = 0 AND p.project_section = %(section)s AND p.project_unit = 'SAWHM'",
+        )
+    list_projects_is = run_query(is_section_query, {'section': 'IS'}, result='dataframe')
+    list_projects_is = list_projects_is.drop("images_public", axis=1)
+
+    list_projects_is = list_projects_is.rename(columns={
+        "project_unit": "Unit",
+        "project_title": "Title",
+        "project_status": "Status",
+        "project_manager": "<abbr title=\"Project Manager\">PM</abbr>",
+        "project_dates": "Dates",
+        "objects_digitized": "Specimens/Objects Digitized",
+        "images_taken": "Images Captured"
+    })
+
+    # Informatics Table
+    inf_section_query = (" SELECT "
+                     " CONCAT('<abbr title=\"', u.unit_fullname, '\">', p.project_unit, '</abbr>') as project_unit, "
+                     " CONCAT('<strong>', p.project_title, '</strong><br>', p.summary) as project_title, "
+                     " p.project_status, "
+                     " CASE WHEN p.github_link IS NULL THEN 'NA' ELSE "
+                     "       CONCAT('<a href=\"', p.github_link, '\" title=\"Link to code repository of ', p.project_title, ' in Github\">Repository</a>') END as github_link, "
+                     " CASE "
+                     "      WHEN p.project_end IS NULL THEN CONCAT(date_format(p.project_start, '%b %Y'), ' -') "
+                     "      WHEN date_format(p.project_start, '%b %Y') = date_format(p.project_end, '%b %Y') THEN date_format(p.project_start, '%b %Y') "                     
+                     "      ELSE CONCAT(date_format(p.project_start, '%b %Y'), ' - ', date_format(p.project_end, '%b %Y')) END "
+                     "         as project_dates, "
+                     " CASE WHEN p.records = 0 THEN 'NA' ELSE "
+                     " (CASE WHEN p.records_estimated IS True THEN CONCAT(coalesce(format(p.records, 0), 0), '*') ELSE "
+                     "      coalesce(format(p.records, 0), 0) END) END as records, "
+                     " CASE WHEN p.info_link IS NULL THEN 'NA' ELSE p.info_link END AS info_link "
+                     " FROM projects_informatics p LEFT JOIN si_units u ON (p.project_unit = u.unit_id) "
+                     " ORDER BY p.project_start DESC, p.project_end DESC")
+    list_projects_inf = run_query(inf_section_query, result='dataframe')
+    list_projects_inf = list_projects_inf.rename(columns={
+        "project_unit": "Unit",
+        "project_title": "Title",
+        "project_status": "Status",
+        "github_link": "Repository",
+        "info_link": "More Info",
+        "project_manager": "<abbr title=\"Project Manager\">PM</abbr>",
+        "project_dates": "Dates",
+        "records": "Records Created or Enhanced"
+    })
+
+    # Informatics Software
+    inf_software = ("SELECT CONCAT('<strong>', software_name, '</strong>') as software_name, software_details, "
+                    " CONCAT('<a href=\"', repository, '\" title=\"Link to code repository in Github\"><img src=\"/static/github-32.png\" alt=\"Github Logo\"></a>') as repository, "
+                    " CONCAT('<a href=\"', more_info, '\" title=\"Link to a page with more information about the software\">More Info</a>') as more_info "
+                    " FROM informatics_software ORDER BY sortby DESC")
+    list_software = run_query(inf_software, result='dataframe')
+    list_software = list_software.rename(columns={
+        "software_name": "Software",
+        "software_details": "Details",
+        "repository": "Repository",
+        "more_info": "Details"
+    })
+
+    return {
+        'tables_md': [list_projects_md.to_html(table_id='list_projects_md', index=False,
+                                               border=0, escape=False,
+                                               classes=HOMEPAGE_TABLE_CLASSES)],
+        'tables_is': [list_projects_is.to_html(table_id='list_projects_is', index=False,
+                                               border=0, escape=False,
+                                               classes=HOMEPAGE_TABLE_CLASSES)],
+        'tables_inf': [list_projects_inf.to_html(table_id='list_projects_inf', index=False,
+                                                 border=0, escape=False,
+                                                 classes=HOMEPAGE_TABLE_CLASSES)],
+        'tables_software': [list_software.to_html(table_id='list_software', index=False,
+                                                  border=0, escape=False,
+                                                  classes=HOMEPAGE_TABLE_CLASSES + ['homepage-software-table'])],
+    }
@@ -4,7 +4,8 @@ import random
 
 import pandas as pd
 
-from osprey.db import executemany, run_query
+from osprey.db import executemany, run_query, stream_query
+from osprey.services import exports as export_service
 
 
 def list_user_projects(username):
@@ -131,9 +132,12 @@ def reconcile_invoice(project_id, uploaded_file):
     }
 
 
-def build_invoice_export(randomint):
-    return pd.DataFrame(run_query(
-        ("SELECT i.file_name, i.file_id, i.dams_uan, fol.project_folder FROM invoice_recon i "
-         "left join files f on (i.file_id = f.file_id) left join folders fol on (f.folder_id = fol.folder_id) "
-         "WHERE i.randomint = %(randomint)s"),
-        {'randomint': randomint}))
+def write_invoice_export(randomint, xlsx_file):
+    """Stream the reconciliation rows for ``randomint`` into an XLSX file."""
+    return export_service.write_rows(
+        stream_query(
+            ("SELECT i.file_name, i.file_id, i.dams_uan, fol.project_folder FROM invoice_recon i "
+             "left join files f on (i.file_id = f.file_id) left join folders fol on (f.folder_id = fol.folder_id) "
+             "WHERE i.randomint = %(randomint)s"),
+            {'randomint': randomint}),
+        xlsx_file=xlsx_file)
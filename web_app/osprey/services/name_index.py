@@ -0,0 +1,81 @@
+"""Per-project file name index for the unique_file / unique_other checks.
+
+``files_name_index`` holds one ``(project_id, file_name, file_id, folder_id)``
+row per file of an image project (DDL and backfill in
+``db/files_name_index.sql``), so "which other files share this name" is an
+indexed point lookup instead of a self-join of ``files`` with ``folders``.
+The worker API keeps it current when files are registered or deleted.
+Transcription projects are not indexed.
+"""
+
+from __future__ import annotations
+
+from osprey.db import batch, run_query
+
+# Add the files of one folder (run after inserting them). Files already
+# indexed are kept; not INSERT IGNORE, which would turn a too long name into
+# a warning and leave the file out of the index.
+INDEX_FOLDER = (
+    "INSERT INTO files_name_index (project_id, file_name, file_id, folder_id) "
+    " SELECT fol.project_id, f.file_name, f.file_id, f.folder_id FROM files f, folders fol "
+    " WHERE f.folder_id = fol.folder_id AND f.folder_id = %(folder_id)s"
+    " ON DUPLICATE KEY UPDATE file_id = VALUES(file_id)")
+
+# Files of a folder whose name is used in other folders of the project.
+FOLDER_CONFLICTS = (
+    "SELECT src.file_name, fol.project_folder "
+    " FROM files_name_index src, files_name_index i, folders fol "
+    " WHERE src.folder_id = %(folder_id)s AND i.project_id = src.project_id "
+    " AND i.file_name = src.file_name AND i.folder_id != src.folder_id AND fol.folder_id = i.folder_id "
+    " ORDER BY fol.project_folder")
+
+_INDEX_FILE = (
+    "INSERT INTO files_name_index (project_id, file_name, file_id, folder_id) "
+    " SELECT fol.project_id, f.file_name, f.file_id, f.folder_id FROM files f, folders fol "
+    " WHERE f.folder_id = fol.folder_id AND f.file_id = %(file_id)s"
+    " ON DUPLICATE KEY UPDATE file_id = VALUES(file_id)")
+
+_SAME_NAME_IN_PROJECT = (
+    "SELECT i.file_id, fol.project_folder FROM files_name_index i, folders fol "
+    " WHERE i.project_id = %(project_id)s "
+    " AND i.file_name = (SELECT file_name FROM files WHERE file_id = %(file_id)s) "
+    " AND i.file_id != %(file_id)s AND i.folder_id != %(folder_id)s AND fol.folder_id = i.folder_id "
+    " ORDER BY fol.project_folder")
+
+_SAME_NAME_ELSEWHERE = (
+    "SELECT i.file_id, fol.project_folder, i.project_id FROM files_name_index i, folders fol "
+    " WHERE i.file_name = (SELECT file_name FROM files WHERE file_id = %(file_id)s) "
+    " AND i.project_id != %(project_id)s AND fol.folder_id = i.folder_id "
+    " ORDER BY i.project_id, fol.project_folder")
+
+
+def index_file(file_id):
+    """Add one registered file to the index."""
+    return run_query(_INDEX_FILE, {'file_id': file_id}, return_val=False)
+
+
+def unindex_file(file_id):
+    """Drop a deleted file from the index."""
+    return run_query("DELETE FROM files_name_index WHERE file_id = %(file_id)s", {'file_id': file_id},
+                     return_val=False)
+
+
+def rebuild(project_id):
+    """Re-index every file of a project, e.g. after files were changed outside the API."""
+    with batch() as tx:
+        tx.add("DELETE FROM files_name_index WHERE project_id = %(project_id)s", {'project_id': project_id})
+        tx.add("INSERT INTO files_name_index (project_id, file_name, file_id, folder_id) "
+               " SELECT fol.project_id, f.file_name, f.file_id, f.folder_id FROM files f, folders fol "
+               " WHERE f.folder_id = fol.folder_id AND fol.project_id = %(project_id)s"
+               " ON DUPLICATE KEY UPDATE file_id = VALUES(file_id)",
+               {'project_id': project_id})
+
+
+def same_name_in_project(project_id, file_id, folder_id) -> list:
+    """Files named like ``file_id`` in other folders of the project: ``[{file_id, project_folder}]``."""
+    return run_query(_SAME_NAME_IN_PROJECT, {'project_id': project_id, 'file_id': file_id, 'folder_id': folder_id})
+
+
+def same_name_elsewhere(project_id, file_id) -> list:
+    """Files named like ``file_id`` in other projects: ``[{file_id, project_folder, project_id}]``."""
+    return run_query(_SAME_NAME_ELSEWHERE, {'project_id': project_id, 'file_id': file_id})
@@ -1,7 +1,7 @@
 """Project read queries shared by the API."""
 
 from logger import logger
-from osprey.db import query_database_insert, run_query
+from osprey.db import query_database_insert, run_query, stream_query
 from osprey.services import folders as folder_service
 
 
@@ -120,12 +120,14 @@ def list_projects(section=None):
     return run_query(query, {'section': section})
 
 
-def list_project_files(project_alias):
-    return run_query(
+def iter_project_files(project_alias, batch_size=None):
+    """Yield the project's files in batches (see osprey.db.stream_query)."""
+    return stream_query(
         ("SELECT f.file_id, f.uid, f.file_name, f.folder_id FROM files f WHERE f.folder_id in "
          " (SELECT folder_id FROM folders WHERE project_id in "
          "(SELECT project_id from projects WHERE project_alias = %(project_alias)s)) ORDER BY f.file_name"),
         {'project_alias': project_alias},
+        batch_size=batch_size,
     )
 
 
@@ -64,7 +64,7 @@ def get_report_last_updated(report):
 
 def get_report_data(report):
     """Run a non-pregenerated report's query."""
-    return pd.DataFrame(run_query(report['query']))
+    return run_query(report['query'], result='dataframe')
 
 
 def get_pregenerated_preview(report, limit=20):
@@ -0,0 +1,120 @@
+"""Queue of debounced folder/project stats recalculations.
+
+``property=stats`` on the worker API calls ``enqueue()`` instead of
+recalculating in the request. Requests for the same folder within
+``settings.stats_debounce_seconds`` share one queued job (the
+``stats_jobs.dedupe_key`` unique key, cleared once the job is claimed). Each
+repeat pushes the job's ``run_after`` back by the debounce delay, but never
+past ``settings.stats_debounce_max_seconds`` after the first request, and
+``scripts/run_stats_jobs.py`` takes all due jobs of a project at once, so a
+burst of finished folders costs one stats run per folder and a single
+project rollup. DDL: ``db/stats_jobs.sql``.
+"""
+
+from __future__ import annotations
+
+import uuid
+from typing import Any, Dict, Optional
+
+import settings
+from logger import logger
+from osprey.db import run_query
+from osprey.services import folder_stats as folder_stats_service
+
+DEBOUNCE_SECONDS = getattr(settings, 'stats_debounce_seconds', 30)
+# Upper bound on how long repeated requests can hold a job back.
+MAX_WAIT_SECONDS = getattr(settings, 'stats_debounce_max_seconds', 300)
+
+_JOB_COLUMNS = ("job_id, project_id, folder_id, status, requests, run_after, requested_at, "
+                "started_at, finished_at, error_message")
+
+
+def enqueue(project_id, folder_id) -> Optional[int]:
+    """Queue a stats run for a folder (and its project); returns the job id, or None on error."""
+    params = {'project_id': project_id, 'folder_id': str(folder_id),
+              'dedupe_key': '{}:{}'.format(project_id, folder_id), 'debounce': DEBOUNCE_SECONDS,
+              'max_wait': max(MAX_WAIT_SECONDS, DEBOUNCE_SECONDS)}
+    res = run_query(
+        "INSERT INTO stats_jobs (project_id, folder_id, dedupe_key, status, requests, run_after, requested_at) "
+        " VALUES (%(project_id)s, %(folder_id)s, %(dedupe_key)s, 'queued', 1, "
+        "         DATE_ADD(NOW(), INTERVAL %(debounce)s SECOND), NOW()) "
+        " ON DUPLICATE KEY UPDATE requests = requests + 1, "
+        "   run_after = LEAST(GREATEST(run_after, VALUES(run_after)), "
+        "                     DATE_ADD(requested_at, INTERVAL %(max_wait)s SECOND))",
+        params, return_val=False)
+    if res is False:
+        return None
+    # The newest job of the folder: the queued one, or the one claimed since,
+    # which started after this request was recorded.
+    rows = run_query(
+        "SELECT job_id FROM stats_jobs WHERE project_id = %(project_id)s AND folder_id = %(folder_id)s "
+        " ORDER BY job_id DESC LIMIT 1", params)
+    return rows[0]['job_id'] if rows else None
+
+
+def get_job(job_id) -> Optional[Dict[str, Any]]:
+    rows = run_query("SELECT {} FROM stats_jobs WHERE job_id = %(job_id)s".format(_JOB_COLUMNS),
+                     {'job_id': job_id})
+    return rows[0] if rows else None
+
+
+def requeue_stale(seconds) -> bool:
+    """Put back jobs left running by a runner that stopped mid-way."""
+    return run_query(
+        "UPDATE stats_jobs SET status = 'queued', claimed_by = NULL "
+        " WHERE status = 'running' AND started_at < DATE_SUB(NOW(), INTERVAL %(seconds)s SECOND)",
+        {'seconds': seconds}, return_val=False)
+
+
+def claim_next() -> Optional[Dict[str, Any]]:
+    """Claim every due job of the project waiting longest.
+
+    Returns ``{token, project_id, project_alias, transcription, folder_ids}``
+    or None when nothing is due.
+    """
+    rows = run_query(
+        "SELECT project_id FROM stats_jobs WHERE status = 'queued' AND run_after <= NOW() "
+        " ORDER BY run_after LIMIT 1")
+    if not rows:
+        return None
+    token = uuid.uuid4().hex
+    params = {'project_id': rows[0]['project_id'], 'token': token}
+    # dedupe_key is released so new requests queue a fresh job.
+    run_query(
+        "UPDATE stats_jobs SET status = 'running', claimed_by = %(token)s, dedupe_key = NULL, started_at = NOW() "
+        " WHERE project_id = %(project_id)s AND status = 'queued' AND run_after <= NOW()",
+        params, return_val=False)
+    jobs = run_query(
+        "SELECT j.folder_id, p.project_alias, p.transcription FROM stats_jobs j, projects p "
+        " WHERE j.claimed_by = %(token)s AND j.status = 'running' AND p.project_id = j.project_id",
+        params)
+    if not jobs:
+        # Another runner got there first.
+        return None
+    return {'token': token, 'project_id': params['project_id'],
+            'project_alias': jobs[0]['project_alias'], 'transcription': jobs[0]['transcription'],
+            'folder_ids': sorted({job['folder_id'] for job in jobs})}
+
+
+def finish(token, error_message=None) -> bool:
+    return run_query(
+        "UPDATE stats_jobs SET status = %(status)s, error_message = %(error_message)s, finished_at = NOW() "
+        " WHERE claimed_by = %(token)s AND status = 'running'",
+        {'token': token, 'status': 'failed' if error_message else 'succeeded', 'error_message': error_message},
+        return_val=False)
+
+
+def run_claimed(claim) -> None:
+    """Recalculate each claimed folder, then the project once; records the outcome."""
+    project_id = claim['project_id']
+    transcription = claim['transcription']
+    try:
+        for folder_id in claim['folder_ids']:
+            folder_stats_service.recalculate_folder_stats(project_id, folder_id, transcription)
+        folder_stats_service.recalculate_project_stats(project_id, transcription)
+    except Exception as exc:
+        logger.exception("stats_jobs: failed project_id=%s folders=%s", project_id, claim['folder_ids'])
+        finish(claim['token'], error_message=str(exc) or exc.__class__.__name__)
+        raise
+    finish(claim['token'])
+    logger.info("stats_jobs: project_id=%s folders=%s", project_id, len(claim['folder_ids']))
@@ -0,0 +1,847 @@
+"""Embedded SQLite stand-in for the MySQL pool, for service tests and benchmarks.
+
+Selected with ``db_backend = 'sqlite'`` in settings (``sqlite_path`` defaults
+to an in-memory database) or ``osprey.db.init_sqlite()``. ``SqlitePool``
+hands out connections that look enough like mysql-connector's for
+``osprey.db`` to run unchanged: dict/tuple cursors, ``column_names``,
+``fetchmany``, ``nextset``, ``start_transaction`` and so on.
+
+Statements are translated on the way in: ``%(name)s``/``%s`` placeholders,
+``ON DUPLICATE KEY UPDATE``, ``INSERT IGNORE``, multi-table ``UPDATE``,
+``IF()``, ``INTERVAL`` and ``GROUP_CONCAT(... SEPARATOR ...)``; the MySQL
+functions the services use (``DATE_FORMAT``, ``NOW``, ``CONCAT``,
+``SUBSTRING_INDEX``, ``FORMAT``, ...) are registered as SQL functions.
+It covers the SQL in this repo, not MySQL in general.
+
+All connections share one sqlite3 connection, so it is meant for a single
+thread at a time (tests, benchmarks, scripts), not for serving requests.
+"""
+
+import datetime
+import decimal
+import re
+import sqlite3
+import threading
+import uuid
+
+import mysql.connector
+
+# Tables the services read and write, in MySQL column order where it matters.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    proj_id INTEGER,
+    project_title TEXT,
+    project_alias TEXT UNIQUE,
+    project_unit TEXT,
+    project_section TEXT,
+    project_status TEXT DEFAULT 'Ongoing',
+    project_description TEXT,
+    summary TEXT,
+    project_type TEXT DEFAULT 'production',
+    project_method TEXT,
+    project_manager TEXT,
+    project_area TEXT,
+    project_start DATE,
+    project_end DATE,
+    projects_order INTEGER DEFAULT 0,
+    skip_project INTEGER DEFAULT 0,
+    images_estimated INTEGER DEFAULT 0,
+    objects_estimated INTEGER DEFAULT 0,
+    records_estimated INTEGER DEFAULT 0,
+    records INTEGER DEFAULT 0,
+    info_link TEXT,
+    github_link TEXT,
+    dams_project_cd TEXT,
+    qc_status TEXT,
+    transcription INTEGER DEFAULT 0,
+    img2obj TEXT,
+    project_object_query TEXT DEFAULT 'COUNT(DISTINCT f.file_name)',
+    user_id INTEGER,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS projects_stats (
+    project_id INTEGER PRIMARY KEY,
+    collex_to_digitize INTEGER DEFAULT 0,
+    images_taken INTEGER DEFAULT 0,
+    objects_digitized INTEGER DEFAULT 0,
+    images_public INTEGER DEFAULT 0,
+    project_ok INTEGER DEFAULT 0,
+    project_err INTEGER DEFAULT 0,
+    other_icon TEXT,
+    other_name TEXT,
+    other_stat INTEGER DEFAULT 0,
+    other_stat_calc TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS projects_settings (
+    table_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    project_setting TEXT NOT NULL,
+    settings_value TEXT,
+    settings_details TEXT
+);
+
+CREATE TABLE IF NOT EXISTS jpc_aspace_data (
+    table_id TEXT PRIMARY KEY,
+    refid TEXT,
+    resource_id TEXT,
+    archive_box TEXT,
+    archive_type TEXT,
+    archive_folder TEXT,
+    unit_title TEXT
+);
+
+CREATE TABLE IF NOT EXISTS folders (
+    folder_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    project_folder TEXT,
+    path TEXT,
+    status INTEGER DEFAULT 0,
+    notes TEXT,
+    error_info TEXT,
+    date DATE,
+    delivered_to_dams INTEGER DEFAULT 9,
+    previews INTEGER DEFAULT 0,
+    preview_type TEXT DEFAULT 'image',
+    file_errors INTEGER DEFAULT 0,
+    no_files INTEGER DEFAULT 0,
+    no_files_total INTEGER DEFAULT 0,
+    no_files_errors INTEGER DEFAULT 0,
+    no_files_ok INTEGER DEFAULT 0,
+    processing INTEGER DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS folders_project ON folders (project_id);
+
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_uid TEXT,
+    folder_id INTEGER NOT NULL,
+    file_name TEXT,
+    file_ext TEXT,
+    uid TEXT,
+    dams_uan TEXT,
+    preview_image TEXT,
+    sensitive_contents INTEGER DEFAULT 0,
+    file_timestamp DATETIME,
+    datetime_created DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (folder_id, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS files_name_index (
+    project_id INTEGER NOT NULL,
+    file_name TEXT NOT NULL,
+    file_id INTEGER NOT NULL UNIQUE,
+    folder_id INTEGER NOT NULL,
+    PRIMARY KEY (project_id, file_name, file_id)
+);
+CREATE INDEX IF NOT EXISTS files_name_index_name ON files_name_index (file_name);
+CREATE INDEX IF NOT EXISTS files_name_index_folder ON files_name_index (folder_id);
+
+CREATE TABLE IF NOT EXISTS stats_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    folder_id TEXT NOT NULL,
+    dedupe_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    requests INTEGER NOT NULL DEFAULT 1,
+    run_after DATETIME NOT NULL,
+    requested_at DATETIME NOT NULL,
+    claimed_by TEXT,
+    started_at DATETIME,
+    finished_at DATETIME,
+    error_message TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS files_checks (
+    file_id INTEGER NOT NULL,
+    folder_id INTEGER,
+    file_check TEXT NOT NULL,
+    check_results INTEGER DEFAULT 9,
+    check_info TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (file_id, file_check)
+);
+
+CREATE TABLE IF NOT EXISTS file_postprocessing (
+    file_id INTEGER NOT NULL,
+    post_step TEXT NOT NULL,
+    post_results INTEGER DEFAULT 9,
+    post_info TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (file_id, post_step)
+);
+
+CREATE TABLE IF NOT EXISTS file_md5 (
+    file_id INTEGER,
+    file_uid TEXT,
+    filetype TEXT NOT NULL,
+    md5 TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id, filetype)
+);
+
+CREATE TABLE IF NOT EXISTS files_exif (
+    file_id INTEGER NOT NULL,
+    filetype TEXT NOT NULL,
+    taggroup TEXT,
+    tagid TEXT,
+    tag TEXT NOT NULL,
+    value TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id, filetype, tag)
+);
+
+CREATE TABLE IF NOT EXISTS files_size (
+    file_id INTEGER NOT NULL,
+    filetype TEXT NOT NULL,
+    filesize INTEGER,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (file_id, filetype)
+);
+
+CREATE TABLE IF NOT EXISTS folders_badges (
+    folder_id INTEGER,
+    folder_uid TEXT,
+    badge_type TEXT NOT NULL,
+    badge_css TEXT,
+    badge_text TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (folder_id, badge_type),
+    UNIQUE (folder_uid, badge_type)
+);
+
+CREATE TABLE IF NOT EXISTS qc_folders (
+    folder_id INTEGER,
+    folder_uid TEXT,
+    qc_status INTEGER DEFAULT 9,
+    qc_by INTEGER,
+    qc_ip TEXT,
+    qc_info TEXT,
+    qc_level TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (folder_id),
+    UNIQUE (folder_uid)
+);
+
+CREATE TABLE IF NOT EXISTS qc_files (
+    folder_id INTEGER,
+    folder_uid TEXT,
+    file_id INTEGER,
+    file_uid TEXT,
+    file_qc INTEGER DEFAULT 9,
+    qc_info TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id),
+    UNIQUE (file_uid)
+);
+
+CREATE TABLE IF NOT EXISTS qc_settings (
+    project_id INTEGER PRIMARY KEY,
+    qc_level TEXT DEFAULT 'Normal',
+    qc_percent REAL DEFAULT 10,
+    qc_threshold_critical REAL DEFAULT 0,
+    qc_threshold_major REAL DEFAULT 1.5,
+    qc_threshold_minor REAL DEFAULT 4,
+    qc_normal_percent REAL DEFAULT 10,
+    qc_reduced_percent REAL DEFAULT 5,
+    qc_tightened_percent REAL DEFAULT 40,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS projects_detail_statistics_steps (
+    step_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER,
+    step_info TEXT,
+    step_notes TEXT,
+    step_units TEXT,
+    css TEXT,
+    round_val INTEGER DEFAULT 2,
+    stat_type TEXT,
+    active INTEGER DEFAULT 1,
+    step_order INTEGER DEFAULT 0,
+    step_updated_on DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS projects_detail_statistics (
+    step_id INTEGER NOT NULL,
+    date DATE,
+    step_value TEXT,
+    file_name TEXT
+);
+"""
+
+_LOCK = threading.RLock()
+
+# Statement text -> (translated statements); the services reuse a few hundred
+# distinct statements, so translating each once is enough.
+_TRANSLATED = {}
+_TRANSLATED_MAX = 2000
+
+
+# ---------------------------------------------------------------------------
+# MySQL functions
+# ---------------------------------------------------------------------------
+
+def _to_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    try:
+        return datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+_DATE_PARTS = {
+    'Y': lambda d: '{:04d}'.format(d.year),
+    'y': lambda d: '{:02d}'.format(d.year % 100),
+    'm': lambda d: '{:02d}'.format(d.month),
+    'c': lambda d: str(d.month),
+    'd': lambda d: '{:02d}'.format(d.day),
+    'e': lambda d: str(d.day),
+    'H': lambda d: '{:02d}'.format(d.hour),
+    'k': lambda d: str(d.hour),
+    'h': lambda d: d.strftime('%I'),
+    'I': lambda d: d.strftime('%I'),
+    'l': lambda d: str(int(d.strftime('%I'))),
+    'i': lambda d: '{:02d}'.format(d.minute),
+    's': lambda d: '{:02d}'.format(d.second),
+    'S': lambda d: '{:02d}'.format(d.second),
+    'f': lambda d: '{:06d}'.format(d.microsecond),
+    'p': lambda d: d.strftime('%p'),
+    'b': lambda d: d.strftime('%b'),
+    'M': lambda d: d.strftime('%B'),
+    'a': lambda d: d.strftime('%a'),
+    'W': lambda d: d.strftime('%A'),
+    'j': lambda d: d.strftime('%j'),
+    'T': lambda d: d.strftime('%H:%M:%S'),
+    'r': lambda d: d.strftime('%I:%M:%S %p'),
+}
+
+
+def _date_format(value, fmt):
+    d = _to_datetime(value)
+    if d is None or fmt is None:
+        return None
+    out = []
+    i = 0
+    while i < len(fmt):
+        ch = fmt[i]
+        if ch == '%' and i + 1 < len(fmt):
+            spec = fmt[i + 1]
+            part = _DATE_PARTS.get(spec)
+            out.append(part(d) if part else spec)
+            i += 2
+        else:
+            out.append(ch)
+            i += 1
+    return ''.join(out)
+
+
+def _str_to_date(value, fmt):
+    if value is None or fmt is None:
+        return None
+    py_fmt = fmt.replace('%i', '%M').replace('%s', '%S').replace('%T', '%H:%M:%S')
+    try:
+        parsed = datetime.datetime.strptime(str(value), py_fmt)
+    except ValueError:
+        return None
+    return _sql_datetime(parsed)
+
+
+def _sql_datetime(value):
+    return value.isoformat(sep=' ', timespec='seconds')
+
+
+def _shift(value, amount, unit, sign):
+    d = _to_datetime(value)
+    if d is None or amount is None:
+        return None
+    amount = sign * float(amount)
+    unit = unit.lower()
+    if unit in ('month', 'year'):
+        months = int(amount) * (12 if unit == 'year' else 1)
+        month = d.month - 1 + months
+        year = d.year + month // 12
+        month = month % 12 + 1
+        day = min(d.day, [31, 29 if year % 4 == 0 and (year % 100 or year % 400 == 0) else 28,
+                          31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1])
+        shifted = d.replace(year=year, month=month, day=day)
+    else:
+        shifted = d + datetime.timedelta(**{unit + 's': amount})
+    if isinstance(value, str) and len(value.strip()) == 10:
+        return shifted.date().isoformat()
+    return _sql_datetime(shifted)
+
+
+def _datediff(a, b):
+    a, b = _to_datetime(a), _to_datetime(b)
+    if a is None or b is None:
+        return None
+    return (a.date() - b.date()).days
+
+
+def _concat(*args):
+    if any(a is None for a in args):
+        return None
+    return ''.join(str(a) for a in args)
+
+
+def _concat_ws(sep, *args):
+    if sep is None:
+        return None
+    return str(sep).join(str(a) for a in args if a is not None)
+
+
+def _format(value, decimals):
+    if value is None:
+        return None
+    return '{:,.{}f}'.format(float(value), max(0, int(decimals or 0)))
+
+
+def _substring_index(value, delim, count):
+    if value is None or delim is None or count is None:
+        return None
+    value, count = str(value), int(count)
+    if count == 0 or not delim:
+        return ''
+    parts = value.split(delim)
+    if count > 0:
+        return delim.join(parts[:count])
+    return delim.join(parts[count:])
+
+
+def _locate(substr, value, pos=1):
+    if substr is None or value is None:
+        return None
+    return str(value).find(str(substr), max(int(pos) - 1, 0)) + 1
+
+
+def _regexp(pattern, value):
+    if pattern is None or value is None:
+        return None
+    return 1 if re.search(pattern, str(value), re.IGNORECASE) else 0
+
+
+def _part(attr):
+    def get(value):
+        d = _to_datetime(value)
+        return None if d is None else getattr(d, attr)
+    return get
+
+
+def _greatest(*args):
+    return None if any(a is None for a in args) else max(args)
+
+
+def _least(*args):
+    return None if any(a is None for a in args) else min(args)
+
+
+def _register_functions(conn):
+    functions = [
+        ('now', 0, lambda: _sql_datetime(datetime.datetime.now())),
+        ('curdate', 0, lambda: datetime.date.today().isoformat()),
+        ('unix_timestamp', 0, lambda: int(datetime.datetime.now().timestamp())),
+        ('date_format', 2, _date_format),
+        ('str_to_date', 2, _str_to_date),
+        ('date_sub', 3, lambda v, n, u: _shift(v, n, u, -1)),
+        ('date_add', 3, lambda v, n, u: _shift(v, n, u, 1)),
+        ('datediff', 2, _datediff),
+        ('year', 1, _part('year')),
+        ('month', 1, _part('month')),
+        ('day', 1, _part('day')),
+        ('hour', 1, _part('hour')),
+        ('concat', -1, _concat),
+        ('concat_ws', -1, _concat_ws),
+        ('format', 2, _format),
+        ('substring_index', 3, _substring_index),
+        ('locate', 2, _locate),
+        ('locate', 3, _locate),
+        ('regexp', 2, _regexp),
+        ('greatest', -1, _greatest),
+        ('least', -1, _least),
+        ('uuid', 0, lambda: str(uuid.uuid4())),
+        ('uuid_v4s', 0, lambda: str(uuid.uuid4())),
+    ]
+    for name, nargs, func in functions:
+        conn.create_function(name, nargs, func, deterministic=name not in (
+            'now', 'curdate', 'unix_timestamp', 'uuid', 'uuid_v4s'))
+
+
+# ---------------------------------------------------------------------------
+# Statement translation
+# ---------------------------------------------------------------------------
+
+
+_LITERAL = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*\"""")
+_PLACEHOLDER = re.compile(_LITERAL.pattern + r"|%\((\w+)\)s|%s")
+_CODE_REWRITES = [
+    (re.compile(r"\bIF\s*\(", re.IGNORECASE), 'iif('),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE), 'INSERT OR IGNORE'),
+    (re.compile(r"\bTRUNCATE\s+(?:TABLE\s+)?", re.IGNORECASE), 'DELETE FROM '),
+    (re.compile(r"\s+SEPARATOR\s+", re.IGNORECASE), ', '),
+    (re.compile(r"\bINTERVAL\s+([:\w.?-]+)\s+(SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)\b",
+                re.IGNORECASE), r"\1, '\2'"),
+]
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.IGNORECASE)
+_UPDATE_START = re.compile(r"\s*(?:WITH\b.*?\)\s*)?(UPDATE)\b", re.IGNORECASE | re.DOTALL)
+_SELECT = re.compile(r"\bSELECT\b", re.IGNORECASE)
+_SET = re.compile(r"\bSET\b", re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_JOIN = re.compile(r"\b(?:INNER\s+|CROSS\s+)?JOIN\b", re.IGNORECASE)
+_ON = re.compile(r"\bON\b", re.IGNORECASE)
+_COMMA = re.compile(",")
+_SEMICOLON = re.compile(";")
+
+
+def _mask(sql, parens=False):
+    """Blank out string literals (and, with ``parens``, bracketed text).
+
+    The result has the same length as ``sql``, so keyword positions found in
+    it can be used to slice the original statement.
+    """
+    out = list(sql)
+    for m in _LITERAL.finditer(sql):
+        out[m.start():m.end()] = ' ' * (m.end() - m.start())
+    if parens:
+        depth = 0
+        for i, ch in enumerate(out):
+            if ch == '(':
+                depth += 1
+                if depth > 1:
+                    out[i] = ' '
+            elif ch == ')':
+                depth -= 1
+                if depth > 0:
+                    out[i] = ' '
+            elif depth:
+                out[i] = ' '
+    return ''.join(out)
+
+
+def _split_at(sql, mask, pattern):
+    """Split ``sql`` where ``pattern`` matches in ``mask``; returns (text, mask) pairs."""
+    pieces = []
+    start = 0
+    for m in pattern.finditer(mask):
+        pieces.append((sql[start:m.start()], mask[start:m.start()]))
+        start = m.end()
+    pieces.append((sql[start:], mask[start:]))
+    return pieces
+
+
+def _placeholders(sql, named):
+    def sub(m):
+        text = m.group(0)
+        if text[0] in '\'"':
+            return text
+        if m.group(1) is not None:
+            return ':' + m.group(1) if named else text
+        return text if named else '?'
+    return _PLACEHOLDER.sub(sub, sql)
+
+
+def _rewrite_code(sql):
+    """Keyword rewrites, applied outside string literals only."""
+    out = []
+    start = 0
+    for m in list(_LITERAL.finditer(sql)) + [None]:
+        end = m.start() if m else len(sql)
+        code = sql[start:end]
+        for pattern, repl in _CODE_REWRITES:
+            code = pattern.sub(repl, code)
+        out.append(code)
+        if m:
+            out.append(m.group(0))
+            start = m.end()
+    return ''.join(out)
+
+
+def _rewrite_upsert(sql):
+    """``ON DUPLICATE KEY UPDATE c = VALUES(c)`` -> ``ON CONFLICT DO UPDATE SET c = excluded.c``."""
+    m = _ON_DUPLICATE.search(_mask(sql))
+    if m is None:
+        return sql
+    head = sql[:m.start()]
+    tail = _VALUES_REF.sub(r"excluded.\1", sql[m.end():])
+    top = _mask(head, parens=True)
+    select = _SELECT.search(top)
+    if select and not _WHERE.search(top, select.end()):
+        # SQLite needs a WHERE to tell the upsert clause from a join constraint.
+        head = head.rstrip() + ' WHERE true '
+    return head + 'ON CONFLICT DO UPDATE SET' + tail
+
+
+def _rewrite_update(sql):
+    """Rewrite MySQL multi-table and aliased UPDATEs as ``UPDATE ... SET ... FROM ...``."""
+    mask = _mask(sql, parens=True)
+    m = _UPDATE_START.match(mask)
+    if m is None:
+        return sql
+    set_kw = _SET.search(mask, m.end())
+    if set_kw is None:
+        return sql
+    where = _WHERE.search(mask, set_kw.end())
+    set_end = where.start() if where else len(sql)
+
+    refs = _split_at(sql[m.end():set_kw.start()], mask[m.end():set_kw.start()], _JOIN)
+    tables = [text for text, _ in _split_at(refs[0][0], refs[0][1], _COMMA)]
+    conditions = []
+    for text, text_mask in refs[1:]:
+        on = _ON.search(text_mask)
+        if on is None:
+            tables.append(text)
+        else:
+            tables.append(text[:on.start()])
+            conditions.append(text[on.end():].strip())
+    target = tables[0].split()
+    if len(tables) == 1 and len(target) == 1:
+        return sql
+    alias = target[-1] if len(target) > 1 else None
+
+    assignments = []
+    for text, _ in _split_at(sql[set_kw.end():set_end], mask[set_kw.end():set_end], _COMMA):
+        column, _, value = text.partition('=')
+        # SQLite does not allow a qualified column on the left of SET.
+        assignments.append('{} = {}'.format(column.strip().split('.')[-1], value.strip()))
+    if where:
+        conditions.append(sql[where.end():].strip())
+
+    out = sql[:m.start(1)] + 'UPDATE ' + target[0]
+    if alias:
+        out += ' AS ' + alias
+    out += ' SET ' + ', '.join(assignments)
+    if len(tables) > 1:
+        out += ' FROM ' + ', '.join(t.strip() for t in tables[1:])
+    if conditions:
+        out += ' WHERE ' + ' AND '.join('({})'.format(c) for c in conditions)
+    return out
+
+
+def translate(query, named):
+    """MySQL statement(s) -> list of SQLite statements (cached)."""
+    key = (query, named)
+    statements = _TRANSLATED.get(key)
+    if statements is None:
+        sql = _placeholders(str(query), named)
+        statements = []
+        for text, _ in _split_at(sql, _mask(sql), _SEMICOLON):
+            if text.strip():
+                statements.append(_rewrite_update(_rewrite_upsert(_rewrite_code(text.strip()))))
+        if len(_TRANSLATED) >= _TRANSLATED_MAX:
+            _TRANSLATED.clear()
+        _TRANSLATED[key] = statements
+    return statements
+
+
+# ---------------------------------------------------------------------------
+# mysql-connector lookalikes
+# ---------------------------------------------------------------------------
+
+def _database_error(err):
+    if isinstance(err, sqlite3.IntegrityError):
+        cls = mysql.connector.errors.IntegrityError
+    elif isinstance(err, (sqlite3.OperationalError, sqlite3.ProgrammingError)):
+        cls = mysql.connector.errors.ProgrammingError
+    else:
+        cls = mysql.connector.errors.DatabaseError
+    return cls(msg=str(err))
+
+
+def _parse_datetime(raw):
+    text = raw.decode()
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _parse_date(raw):
+    text = raw.decode()
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_adapter(datetime.datetime, _sql_datetime)
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_converter('DATETIME', _parse_datetime)
+sqlite3.register_converter('TIMESTAMP', _parse_datetime)
+sqlite3.register_converter('DATE', _parse_date)
+
+
+class SqliteCursor:
+    """Cursor with the parts of the mysql-connector API osprey.db uses."""
+
+    def __init__(self, db, dictionary=False, buffered=False):
+        self._db = db
+        self._dictionary = dictionary
+        self._buffered = buffered
+        self._cur = None
+        self._rows = None
+        self.statement = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self.column_names = ()
+
+    def _run(self, method, sql, args):
+        self.statement = sql
+        with _LOCK:
+            # Outside a transaction every executemany row would commit on
+            # its own; run the whole call as one, like MySQL's bulk insert.
+            wrap = method == 'executemany' and not self._db.in_transaction
+            try:
+                cur = self._db.cursor()
+                if wrap:
+                    self._db.execute('BEGIN')
+                getattr(cur, method)(sql, args)
+                if wrap:
+                    self._db.commit()
+            except sqlite3.Error as err:
+                if wrap and self._db.in_transaction:
+                    self._db.rollback()
+                raise _database_error(err) from err
+            self._cur = cur
+            self._rows = None
+            self.lastrowid = cur.lastrowid
+            self.column_names = tuple(d[0] for d in cur.description or ())
+            self.rowcount = cur.rowcount
+            if self._buffered and cur.description is not None:
+                self._rows = cur.fetchall()
+                self.rowcount = len(self._rows)
+
+    def execute(self, operation, params=None):
+        named = isinstance(params, dict)
+        positional = list(params or ()) if not named else None
+        for sql in translate(operation, named):
+            if named:
+                args = params
+            else:
+                count = _mask(sql).count('?')
+                args, positional = positional[:count], positional[count:]
+            self._run('execute', sql, args)
+
+    def executemany(self, operation, seq_params):
+        seq_params = list(seq_params)
+        if not seq_params:
+            self.rowcount = 0
+            return
+        statements = translate(operation, isinstance(seq_params[0], dict))
+        if len(statements) != 1:
+            raise mysql.connector.errors.ProgrammingError(msg="executemany() takes one statement")
+        self._run('executemany', statements[0], seq_params)
+
+    def _shape(self, rows):
+        if self._dictionary:
+            return [dict(zip(self.column_names, row)) for row in rows]
+        return rows
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return self._shape(rows)
+        if self._cur is None:
+            return []
+        with _LOCK:
+            return self._shape(self._cur.fetchall())
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return self._shape(rows)
+        if self._cur is None:
+            return []
+        with _LOCK:
+            return self._shape(self._cur.fetchmany(size))
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def nextset(self):
+        # Multi-statement calls run statement by statement in execute().
+        return None
+
+    def close(self):
+        if self._cur is not None:
+            self._cur.close()
+            self._cur = None
+
+
+class SqliteConnection:
+    """Connection handle returned by ``SqlitePool.get_connection()``."""
+
+    def __init__(self, db):
+        self._db = db
+        self.time_zone = None
+
+    def cursor(self, dictionary=False, buffered=False, **kwargs):
+        return SqliteCursor(self._db, dictionary=dictionary, buffered=buffered)
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        return None
+
+    def is_connected(self):
+        return True
+
+    def start_transaction(self, **kwargs):
+        with _LOCK:
+            try:
+                self._db.execute('BEGIN')
+            except sqlite3.Error as err:
+                raise _database_error(err) from err
+
+    def commit(self):
+        with _LOCK:
+            if self._db.in_transaction:
+                self._db.commit()
+
+    def rollback(self):
+        with _LOCK:
+            if self._db.in_transaction:
+                self._db.rollback()
+
+    def consume_results(self):
+        return None
+
+    def close(self):
+        # The shared sqlite3 connection lives as long as the pool.
+        return None
+
+
+class SqlitePool:
+    """Pool-shaped wrapper around one shared sqlite3 connection."""
+
+    def __init__(self, path=':memory:', schema=SCHEMA):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+        _register_functions(self._db)
+        if schema:
+            self._db.executescript(schema)
+        self.borrows = 0
+
+    def get_connection(self):
+        self.borrows += 1
+        return SqliteConnection(self._db)
+
+    def snapshot(self):
+        return {'pool': 'sqlite', 'path': self.path, 'borrows': self.borrows}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,32 @@
+"""Lightweight SQL text inspection (no parsing, no database access)."""
+
+import re
+
+_COMMENT = re.compile(r"/\*.*?\*/|(?:--|#)[^\n]*", re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+# Statements a WITH clause can lead into; INSERT() is also a string function.
+_WRITE_WORD = re.compile(r"\b(update|delete)\b|\binsert\b(?!\s*\()", re.I)
+_LOCKING = re.compile(r"\bfor\s+(update|share)\b|\block\s+in\s+share\s+mode\b|\binto\s+(outfile|dumpfile|@)", re.I)
+_READ_START = ('select', 'show', 'describe', 'desc', 'explain', 'with')
+
+
+def strip_sql(query):
+    """Query text without comments and string literals, for keyword checks."""
+    return _STRING.sub("''", _COMMENT.sub(' ', str(query)))
+
+
+def is_read_only(query):
+    """True for a single SELECT/SHOW/EXPLAIN statement that takes no locks.
+
+    Errs on the side of False: anything that mentions a write keyword outside
+    a string literal (e.g. ``WITH ... UPDATE``) is treated as a write.
+    """
+    text = strip_sql(query).strip().lstrip('(').strip()
+    if not text:
+        return False
+    first = text.split(None, 1)[0].lower()
+    if first not in _READ_START:
+        return False
+    if ';' in text.rstrip().rstrip(';'):
+        return False
+    return not (_WRITE_WORD.search(text) or _LOCKING.search(text))
@@ -0,0 +1,110 @@
+"""Stale-while-revalidate caching for slow aggregate queries.
+
+``@stale_while_revalidate()`` caches a function's result (keyed by its
+positional arguments) in ``cache`` together with the time it was computed.
+Within the soft TTL the value is returned as is; past it the stale value is
+still returned at once while one background thread recomputes it. Only
+when nothing is cached, or the entry outlived the hard TTL, does the caller
+wait for the query.
+
+A cache lock (``cache.add``) makes sure one refresh per key runs across all
+processes sharing the cache; a failed refresh is logged and the stale value
+stays until the hard TTL.
+
+Functions declared with a ``group`` can be marked stale together with
+``expire(group)`` when their data changed (``osprey.invalidation`` does
+this for the homepage). A request that was served a stale value sets
+``g.osprey_swr_stale``, so ``@cached_page`` does not store the page.
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context
+
+import settings
+from cache import cache
+from logger import logger
+
+SOFT_TTL = getattr(settings, 'swr_soft_seconds', 60)
+HARD_TTL = getattr(settings, 'swr_hard_seconds', 3600)
+
+
+def _key(name, args):
+    digest = hashlib.sha1(repr(args).encode('utf-8')).hexdigest()
+    return 'swr:{}:{}'.format(name, digest)
+
+
+def _expired_key(group):
+    return 'swr-expired:{}'.format(group)
+
+
+def expire(group):
+    """Mark every value of ``group`` computed until now as stale."""
+    cache.set(_expired_key(group), time.time(), timeout=0)
+
+
+def _compute(key, fn, args, hard):
+    # Stamped with the start time: data changed during the query counts as newer.
+    started = time.time()
+    value = fn(*args)
+    cache.set(key, (value, started), timeout=hard)
+    return value
+
+
+def _refresh(app, key, fn, args, hard):
+    with app.app_context():
+        try:
+            _compute(key, fn, args, hard)
+        except Exception:
+            logger.exception("swr: refresh of %s failed", key)
+        finally:
+            cache.delete('lock:' + key)
+
+
+def _refresh_in_background(key, fn, args, soft, hard):
+    # One refresher per key across processes; the lock expires on its own if the thread dies.
+    if not cache.add('lock:' + key, 1, timeout=max(soft, 30)):
+        return
+    thread = threading.Thread(target=_refresh, name='swr-refresh',
+                              args=(current_app._get_current_object(), key, fn, args, hard),
+                              daemon=True)
+    thread.start()
+
+
+def stale_while_revalidate(soft=None, hard=None, group=None):
+    """Cache with a soft TTL (serve stale, refresh in background) and a hard TTL.
+
+    The wrapped function gets ``refresh(*args)`` to recompute synchronously.
+    With ``group``, values computed before the last ``expire(group)`` are
+    stale too. Outside an application context the function just runs.
+    """
+    def decorator(fn):
+        name = '{}.{}'.format(fn.__module__, fn.__qualname__)
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            if not has_app_context():
+                return fn(*args)
+            soft_ttl = SOFT_TTL if soft is None else soft
+            hard_ttl = HARD_TTL if hard is None else hard
+            key = _key(name, args)
+            if group is None:
+                entry, expired_at = cache.get(key), None
+            else:
+                entry, expired_at = cache.get_many(key, _expired_key(group))
+            if entry is None:
+                return _compute(key, fn, args, hard_ttl)
+            value, computed_at = entry
+            if time.time() - computed_at >= soft_ttl or computed_at < (expired_at or 0):
+                _refresh_in_background(key, fn, args, soft_ttl, hard_ttl)
+                if has_request_context():
+                    g.osprey_swr_stale = True
+            return value
+
+        wrapper.refresh = lambda *args: _compute(_key(name, args), fn, args,
+                                                 HARD_TTL if hard is None else hard)
+        return wrapper
+    return decorator
@@ -0,0 +1,266 @@
+"""Deterministic synthetic projects for service tests, load and benchmark runs.
+
+``generate_project()`` yields ``(table, rows)`` chunks (one set per folder, so
+large projects never sit in memory at once) and ``load()`` inserts them with
+``executemany``. The same seed always produces the same rows.
+
+The data follows the shape of production projects: folder sizes vary around
+the requested mean, most files pass every check while errors cluster in a
+few bad folders, objects have one to three images, and TIF/RAW sizes and
+EXIF tags look like camera output. Folder totals and badges match the rows
+generated, as if ``recalculate_folder_stats`` had already run.
+
+Ids are derived from ``project_id`` (folders ``project_id * 100000 + n``,
+files ``project_id * 10000000 + n``) so several projects can share a database.
+"""
+
+import datetime
+import hashlib
+import math
+import random
+
+DEFAULT_CHECKS = ('unique_file', 'raw_pair', 'jhove', 'tifpages', 'magick', 'md5')
+DEFAULT_POSTPROCESSING = ('ready_for_dams', 'in_dams', 'public')
+
+# Object identity is the first two parts of the file name: P1_000123_002 -> P1_000123
+IMG2OBJ = "SUBSTRING_INDEX(file_name, '_', 2)"
+
+# (taggroup, tag, value or callable(rng, taken)) written to files_exif per file.
+EXIF_TAGS = (
+    ('File', 'FileType', 'TIFF'),
+    ('File', 'MIMEType', 'image/tiff'),
+    ('EXIF', 'Make', 'Phase One'),
+    ('EXIF', 'Model', 'IQ4 150MP'),
+    ('EXIF', 'ImageWidth', '14204'),
+    ('EXIF', 'ImageHeight', '10652'),
+    ('EXIF', 'BitsPerSample', '16 16 16'),
+    ('EXIF', 'XResolution', '600'),
+    ('EXIF', 'YResolution', '600'),
+    ('EXIF', 'ExposureTime', lambda rng, taken: '1/{}'.format(rng.choice((60, 125, 250)))),
+    ('EXIF', 'FNumber', lambda rng, taken: str(rng.choice((5.6, 8.0, 11.0)))),
+    ('EXIF', 'ISO', lambda rng, taken: str(rng.choice((50, 100, 200)))),
+    ('EXIF', 'DateTimeOriginal', lambda rng, taken: taken.strftime('%Y:%m:%d %H:%M:%S')),
+    ('ICC_Profile', 'ProfileDescription', 'eciRGB v2'),
+)
+
+# Share of QC'd files per outcome: 0 ok, 1 critical, 2 major, 3 minor.
+QC_OUTCOMES = ((0, 0.94), (3, 0.04), (2, 0.015), (1, 0.005))
+
+
+def _folder_size(rng, mean, sigma):
+    if sigma <= 0:
+        return mean
+    # Lognormal with the requested mean: a few very large folders, many near it.
+    return max(1, int(rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)))
+
+
+def _weighted(rng, outcomes):
+    roll = rng.random()
+    for value, share in outcomes:
+        if roll < share:
+            return value
+        roll -= share
+    return outcomes[0][0]
+
+
+def generate_project(project_id=1, folders=3, files_per_folder=20, checks=DEFAULT_CHECKS,
+                     postprocessing=DEFAULT_POSTPROCESSING, error_rate=0.02, pending_rate=0.0,
+                     folder_size_sigma=0.0, exif_tags=len(EXIF_TAGS), qc_fraction=0.0,
+                     qc_percent=10, start=datetime.date(2024, 1, 1), seed=0):
+    """Yield ``(table, rows)`` for one project; rows are lists of dicts.
+
+    ``error_rate`` is the mean share of failed checks; each folder draws its
+    own rate around it. ``folder_size_sigma`` > 0 varies folder sizes around
+    ``files_per_folder``. ``exif_tags`` caps the EXIF rows per file and
+    ``qc_fraction`` is the share of folders with visual QC done, sampling
+    ``qc_percent`` % of their files.
+    """
+    rng = random.Random('{}:{}'.format(seed, project_id))
+    alias = 'synthetic{}'.format(project_id)
+    prefix = 'P{}'.format(project_id)
+
+    yield 'projects', [{
+        'project_id': project_id,
+        'proj_id': project_id,
+        'project_title': 'Synthetic project {}'.format(project_id),
+        'project_alias': alias,
+        'project_unit': 'SI',
+        'project_status': 'Ongoing',
+        'project_type': 'production',
+        'project_start': start,
+        'images_estimated': folders * files_per_folder,
+        'transcription': 0,
+        'img2obj': IMG2OBJ,
+        'project_object_query': 'COUNT(DISTINCT {})'.format(IMG2OBJ.replace('file_name', 'f.file_name')),
+    }]
+    yield 'projects_settings', (
+        [{'project_id': project_id, 'project_setting': 'project_checks', 'settings_value': c}
+         for c in checks]
+        + [{'project_id': project_id, 'project_setting': 'project_postprocessing', 'settings_value': p}
+           for p in postprocessing]
+    )
+    yield 'qc_settings', [{
+        'project_id': project_id, 'qc_level': 'Normal', 'qc_percent': qc_percent,
+        'qc_threshold_critical': 0, 'qc_threshold_major': 1.5, 'qc_threshold_minor': 4,
+        'qc_normal_percent': 10, 'qc_reduced_percent': 5, 'qc_tightened_percent': 40,
+    }]
+
+    step_id = project_id * 100
+    yield 'projects_detail_statistics_steps', [
+        {'step_id': step_id, 'project_id': project_id, 'step_info': 'Images per day',
+         'step_units': 'images', 'css': 'primary', 'round_val': 0, 'stat_type': 'column',
+         'active': 1, 'step_order': 1},
+        {'step_id': step_id + 1, 'project_id': project_id, 'step_info': 'Average image size',
+         'step_units': 'MB', 'css': 'info', 'round_val': 2, 'stat_type': 'stat',
+         'active': 1, 'step_order': 2},
+    ]
+
+    tags = EXIF_TAGS[:max(0, exif_tags)]
+    file_no = 0
+    object_no = 0
+    totals = {'files': 0, 'ok': 0, 'errors': 0, 'tif_bytes': 0}
+    daily = []
+    for n in range(1, folders + 1):
+        folder_id = project_id * 100000 + n
+        day = start + datetime.timedelta(days=n - 1)
+        folder_error_rate = min(1.0, error_rate * rng.expovariate(1.0))
+        no_files = _folder_size(rng, files_per_folder, folder_size_sigma)
+
+        files, file_checks, md5s, sizes, exif, post = [], [], [], [], [], []
+        taken = datetime.datetime.combine(day, datetime.time(9))
+        views = 0
+        no_ok = 0
+        no_errors = 0
+        for _ in range(no_files):
+            if views == 0:
+                object_no += 1
+                views = rng.choice((1, 1, 2, 3))
+            view = views
+            views -= 1
+            file_no += 1
+            file_id = project_id * 10000000 + file_no
+            taken += datetime.timedelta(seconds=rng.randint(20, 90))
+            file_name = '{}_{:06d}_{:03d}'.format(prefix, object_no, view)
+            files.append({
+                'file_id': file_id,
+                'folder_id': folder_id,
+                'file_name': file_name,
+                'uid': '{:032x}'.format(rng.getrandbits(128)),
+                'file_timestamp': taken,
+                'datetime_created': taken,
+            })
+            md5s.append({'file_id': file_id, 'filetype': 'tif',
+                         'md5': hashlib.md5(file_name.encode()).hexdigest()})
+            tif_size = max(1, int(rng.gauss(120e6, 20e6)))
+            totals['tif_bytes'] += tif_size
+            sizes.append({'file_id': file_id, 'filetype': 'tif', 'filesize': tif_size})
+            sizes.append({'file_id': file_id, 'filetype': 'raw', 'filesize': int(tif_size * rng.uniform(0.5, 0.7))})
+            for taggroup, tag, value in tags:
+                exif.append({
+                    'file_id': file_id,
+                    'filetype': 'tif',
+                    'taggroup': taggroup,
+                    'tag': tag,
+                    'value': value(rng, taken) if callable(value) else value,
+                })
+            results = []
+            for check in checks:
+                roll = rng.random()
+                if roll < pending_rate:
+                    result = 9
+                elif roll < pending_rate + folder_error_rate:
+                    result = 1
+                else:
+                    result = 0
+                results.append(result)
+                file_checks.append({
+                    'file_id': file_id,
+                    'file_check': check,
+                    'check_results': result,
+                    'check_info': 'Check failed' if result == 1 else '',
+                })
+            if 1 in results:
+                no_errors += 1
+            elif all(r == 0 for r in results):
+                no_ok += 1
+            for step in postprocessing[:1]:
+                post.append({'file_id': file_id, 'post_step': step, 'post_results': 0, 'post_info': ''})
+
+        yield 'folders', [{
+            'folder_id': folder_id,
+            'project_id': project_id,
+            'project_folder': '{}_{}'.format(prefix, day.strftime('%Y%m%d')),
+            'path': '/synthetic/{}/{}'.format(alias, n),
+            'status': 0,
+            'date': day,
+            'delivered_to_dams': 9,
+            'previews': 0,
+            'file_errors': 1 if no_errors else 0,
+            'no_files': no_files,
+            'no_files_total': no_files,
+            'no_files_errors': no_errors,
+            'no_files_ok': no_ok,
+        }]
+        badges = [{'folder_id': folder_id, 'badge_type': 'no_files', 'badge_css': 'bg-primary',
+                   'badge_text': '1 file' if no_files == 1 else '{} files'.format(no_files)}]
+        if no_errors:
+            badges.append({'folder_id': folder_id, 'badge_type': 'error_files', 'badge_css': 'bg-danger',
+                           'badge_text': 'Files with errors'})
+        yield 'folders_badges', badges
+        yield 'files', files
+        yield 'files_name_index', [{'project_id': project_id, 'file_name': f['file_name'],
+                                    'file_id': f['file_id'], 'folder_id': folder_id} for f in files]
+        yield 'file_md5', md5s
+        yield 'files_size', sizes
+        yield 'files_exif', exif
+        yield 'files_checks', file_checks
+        yield 'file_postprocessing', post
+
+        if rng.random() < qc_fraction:
+            sample = rng.sample(files, max(1, len(files) * qc_percent // 100))
+            qc_files = [{
+                'folder_id': folder_id,
+                'file_id': f['file_id'],
+                'file_qc': _weighted(rng, QC_OUTCOMES),
+                'qc_info': None,
+            } for f in sample]
+            failed = any(q['file_qc'] in (1, 2) for q in qc_files)
+            yield 'qc_files', qc_files
+            yield 'qc_folders', [{'folder_id': folder_id, 'qc_status': 1 if failed else 0,
+                                  'qc_level': 'Normal', 'qc_info': None}]
+
+        totals['files'] += no_files
+        totals['ok'] += no_ok
+        totals['errors'] += no_errors
+        daily.append({'step_id': step_id, 'date': day, 'step_value': str(no_files), 'file_name': None})
+
+    yield 'projects_stats', [{
+        'project_id': project_id,
+        'images_taken': totals['files'],
+        'objects_digitized': object_no,
+        'project_ok': totals['ok'],
+        'project_err': totals['errors'],
+    }]
+    avg_mb = totals['tif_bytes'] / totals['files'] / 1e6 if totals['files'] else 0
+    yield 'projects_detail_statistics', daily + [
+        {'step_id': step_id + 1, 'date': start, 'step_value': '{:.2f}'.format(avg_mb), 'file_name': None},
+    ]
+
+
+def load(chunks, executemany, chunk_size=5000):
+    """Insert ``(table, rows)`` chunks with ``executemany``; returns rows per table.
+
+    ``executemany`` is ``osprey.db.executemany`` or ``Batch.executemany``;
+    mysql-connector sends each chunk as one multi-row INSERT.
+    """
+    counts = {}
+    for table, rows in chunks:
+        if not rows:
+            continue
+        columns = list(rows[0])
+        query = "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ', '.join(columns), ', '.join('%({})s'.format(c) for c in columns))
+        for i in range(0, len(rows), chunk_size):
+            executemany(query, rows[i:i + chunk_size])
+        counts[table] = counts.get(table, 0) + len(rows)
+    return counts
@@ -0,0 +1,244 @@
+"""Two-tier cache backend for Flask-Caching: in-process LRU over a shared store.
+
+``TwoTierCache`` is used as ``CACHE_TYPE = 'osprey.tiercache.TwoTierCache'``.
+Every read goes to a small per-process LRU (L1) first and then to the
+backend named by ``CACHE_L2_TYPE`` (``RedisCache``, ``MemcachedCache``,
+``FileSystemCache``, ...), which several app nodes can share, so a restarted
+process or a new node starts warm instead of sending every request to MySQL.
+
+L1 entries live at most ``CACHE_L1_TIMEOUT`` seconds: a delete or overwrite
+on one node reaches the other nodes' L1 within that window. Keys starting
+with one of ``CACHE_L1_BYPASS`` (page cache tag versions) are always read
+from L2 so invalidation is immediate everywhere. L1 keeps pickled values,
+so callers that mutate what they get back cannot change the cached copy.
+
+Keys are versioned by the backend's ``CACHE_KEY_PREFIX`` (see ``cache.py``)
+rather than wiped at startup; entries of older versions simply expire.
+
+Hits (per tier), misses, writes and L1 evictions are counted per namespace
+in ``stats`` (``osprey.cachestats``) and summarized in the log every
+``CACHE_STATS_LOG_SECONDS``; ``size()`` reports what each tier holds.
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask_caching.backends.base import BaseCache
+from werkzeug.utils import import_string
+
+from logger import logger
+from osprey.cachestats import CacheStatsRegistry, namespace, note_versions
+
+
+class LRU:
+    """Thread-safe bounded LRU of pickled values with per-entry expiry."""
+
+    def __init__(self, maxsize=1000, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(len(blob) for _, blob in self._data.values())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, blob = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return pickle.loads(blob)
+
+    def set(self, key, value, timeout):
+        if self.maxsize <= 0 or timeout <= 0:
+            return
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        evicted = []
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, blob)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[0])
+        if self.on_evict is not None:
+            for old in evicted:
+                self.on_evict(old)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache(BaseCache):
+    """Read-through L1 LRU in front of any Flask-Caching backend."""
+
+    def __init__(self, l2, default_timeout=300, l1_size=1000, l1_timeout=5, l1_bypass=(),
+                 stats_log_seconds=600):
+        super().__init__(default_timeout=default_timeout)
+        self.l2 = l2
+        self.stats = CacheStatsRegistry(log_seconds=stats_log_seconds)
+        self.l1 = LRU(l1_size, on_evict=lambda key: self.stats.record(namespace(key), 'evictions'))
+        self.l1_timeout = l1_timeout
+        self.l1_bypass = tuple(l1_bypass)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        l2_type = config.get('CACHE_L2_TYPE', 'SimpleCache')
+        if '.' not in l2_type:
+            l2_type = 'flask_caching.backends.' + l2_type
+        l2_factory = import_string(l2_type)
+        l2 = l2_factory.factory(app, config, list(args), dict(kwargs))
+        return cls(
+            l2,
+            default_timeout=kwargs.get('default_timeout', 300),
+            l1_size=config.get('CACHE_L1_SIZE', 1000),
+            l1_timeout=config.get('CACHE_L1_TIMEOUT', 5),
+            l1_bypass=config.get('CACHE_L1_BYPASS', ()),
+            stats_log_seconds=config.get('CACHE_STATS_LOG_SECONDS', 600),
+        )
+
+    def _record(self, key, event):
+        self.stats.record(namespace(key), event)
+        if self.stats.due():
+            logger.info("cache stats: %s", self.stats.summary())
+
+    def _local(self, key):
+        return not key.startswith(self.l1_bypass)
+
+    def _l1_timeout(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return self.l1_timeout if timeout == 0 else min(timeout, self.l1_timeout)
+
+    def _remember(self, key, value, timeout=None):
+        if value is not None and self._local(key):
+            self.l1.set(key, value, self._l1_timeout(timeout))
+
+    def get(self, key):
+        if self._local(key):
+            value = self.l1.get(key)
+            if value is not None:
+                self._record(key, 'l1_hits')
+                return value
+        value = self.l2.get(key)
+        self._record(key, 'misses' if value is None else 'l2_hits')
+        self._remember(key, value)
+        return value
+
+    def get_many(self, *keys):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.l1.get(key) if self._local(key) else None
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+                self._record(key, 'l1_hits')
+        if missing:
+            for key, value in zip(missing, self.l2.get_many(*missing)):
+                found[key] = value
+                self._record(key, 'misses' if value is None else 'l2_hits')
+                self._remember(key, value)
+        note_versions(keys)
+        return [found.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        result = self.l2.set(key, value, timeout=timeout)
+        self._record(key, 'sets')
+        self.l1.delete(key)
+        if result:
+            self._remember(key, value, timeout)
+        return result
+
+    def set_many(self, mapping, timeout=None):
+        result = self.l2.set_many(mapping, timeout=timeout)
+        for key, value in mapping.items():
+            self._record(key, 'sets')
+            self.l1.delete(key)
+            if key in result:
+                self._remember(key, value, timeout)
+        return result
+
+    def add(self, key, value, timeout=None):
+        result = self.l2.add(key, value, timeout=timeout)
+        if result:
+            self._record(key, 'sets')
+            self._remember(key, value, timeout)
+        return result
+
+    def delete(self, key):
+        self._record(key, 'deletes')
+        self.l1.delete(key)
+        return self.l2.delete(key)
+
+    def delete_many(self, *keys):
+        for key in keys:
+            self._record(key, 'deletes')
+            self.l1.delete(key)
+        return self.l2.delete_many(*keys)
+
+    def has(self, key):
+        if self._local(key) and self.l1.get(key) is not None:
+            return True
+        return self.l2.has(key)
+
+    def clear(self):
+        self.l1.clear()
+        return self.l2.clear()
+
+    def inc(self, key, delta=1):
+        self.l1.delete(key)
+        return self.l2.inc(key, delta=delta)
+
+    def dec(self, key, delta=1):
+        self.l1.delete(key)
+        return self.l2.dec(key, delta=delta)
+
+    def size(self):
+        """Entries and bytes held by each tier, as far as the backend tells."""
+        return {
+            'l1': {'entries': len(self.l1), 'bytes': self.l1.nbytes(), 'max_entries': self.l1.maxsize},
+            'l2': _backend_size(self.l2),
+        }
+
+
+def _backend_size(backend):
+    data = {'type': type(backend).__name__}
+    try:
+        if hasattr(backend, '_path'):
+            # FileSystemCache: one file per entry
+            entries = [e for e in os.scandir(backend._path) if e.is_file()]
+            data.update(entries=len(entries), bytes=sum(e.stat().st_size for e in entries),
+                        threshold=backend._threshold)
+        elif hasattr(backend, '_read_client'):
+            # RedisCache
+            info = backend._read_client.info()
+            data.update(entries=backend._read_client.dbsize(), bytes=info.get('used_memory'),
+                        evictions=info.get('evicted_keys'))
+        elif hasattr(backend, '_client') and hasattr(backend._client, 'get_stats'):
+            # MemcachedCache
+            servers = backend._client.get_stats()
+            stats = dict(servers[0][1]) if servers else {}
+            data.update(entries=stats.get('curr_items'), bytes=stats.get('bytes'),
+                        evictions=stats.get('evictions'))
+        elif hasattr(backend, '_cache'):
+            # SimpleCache
+            data.update(entries=len(backend._cache), threshold=backend._threshold)
+    except Exception as err:
+        data['error'] = str(err)
+    return data
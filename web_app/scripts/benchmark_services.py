@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Time service-layer calls and count their statements on the SQLite backend.
+
+Seeds an in-memory database with a synthetic project, then runs each service
+``--repeat`` times and prints the average time and statements per call, so
+changes to query shape can be compared on a laptop without MySQL.
+
+    PYTHONPATH=. python scripts/benchmark_services.py --folders 5 --files 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from osprey import db, synthetic
+from osprey.services import daily_throughput, folder_details, folder_stats, project_statistics
+
+
+def _statements():
+    return sum(s['count'] for s in db.query_stats.snapshot(limit=10000)['statements'])
+
+
+def _bench(name, func, repeat):
+    db.query_stats.reset()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    print("{:<32} {:>10.2f} ms {:>8.1f} statements".format(name, elapsed_ms, _statements() / repeat))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--folders', type=int, default=5)
+    parser.add_argument('--files', type=int, default=500, help='Files per folder')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sqlite-path', default=':memory:')
+    args = parser.parse_args()
+
+    db.init_sqlite(args.sqlite_path)
+    start = time.perf_counter()
+    counts = synthetic.load(
+        synthetic.generate_project(1, folders=args.folders, files_per_folder=args.files),
+        db.executemany,
+    )
+    print("seeded {} rows in {:.0f} ms".format(sum(counts.values()), (time.perf_counter() - start) * 1000))
+
+    folder_id = str(100001)
+    _bench('folder_details.files_payload',
+           lambda: folder_details.get_folder_files_payload(folder_id), args.repeat)
+    _bench('folder_stats.folder', lambda: folder_stats.recalculate_folder_stats(1, 100001, 0), args.repeat)
+    _bench('folder_stats.project', lambda: folder_stats.recalculate_project_stats(1, 0), args.repeat)
+    _bench('daily_throughput.rows', lambda: daily_throughput.load_daily_throughput_rows(1), args.repeat)
+    _bench('project_statistics.context',
+           lambda: project_statistics.load_statistics_page_context('synthetic1'), args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Populate a database with synthetic projects for load and benchmark runs.
+
+Writes projects, folders, files, files_checks, files_exif, files_size,
+folders_badges and qc_* rows (see ``osprey.synthetic``) with bulk
+``executemany`` inserts, one folder at a time, so it can build projects of
+hundreds of thousands of files without holding them in memory.
+
+Runs against the database in ``settings.py`` or, with ``--sqlite``, an
+embedded SQLite file. Never point it at production: ids are fixed per
+``--project-id`` and ``--replace`` deletes them first.
+
+    PYTHONPATH=. python scripts/generate_synthetic_project.py --project-id 9001 \\
+        --folders 400 --files-per-folder 1000 --replace
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from logger import logger
+from osprey import db, synthetic
+
+# (table, id column, which id range) in delete order.
+_CLEANUP = (
+    ('files_checks', 'file_id', 'files'),
+    ('files_exif', 'file_id', 'files'),
+    ('files_size', 'file_id', 'files'),
+    ('file_md5', 'file_id', 'files'),
+    ('file_postprocessing', 'file_id', 'files'),
+    ('qc_files', 'file_id', 'files'),
+    ('files_name_index', 'file_id', 'files'),
+    ('files', 'file_id', 'files'),
+    ('folders_badges', 'folder_id', 'folders'),
+    ('qc_folders', 'folder_id', 'folders'),
+    ('folders', 'folder_id', 'folders'),
+    ('projects_detail_statistics', 'step_id', 'steps'),
+    ('projects_detail_statistics_steps', 'step_id', 'steps'),
+    ('projects_settings', 'project_id', 'project'),
+    ('qc_settings', 'project_id', 'project'),
+    ('projects_stats', 'project_id', 'project'),
+    ('projects', 'project_id', 'project'),
+)
+
+
+def _id_ranges(project_id):
+    return {
+        'files': (project_id * 10000000, (project_id + 1) * 10000000 - 1),
+        'folders': (project_id * 100000, (project_id + 1) * 100000 - 1),
+        'steps': (project_id * 100, project_id * 100 + 99),
+        'project': (project_id, project_id),
+    }
+
+
+def delete_project(project_id):
+    ranges = _id_ranges(project_id)
+    for table, column, kind in _CLEANUP:
+        low, high = ranges[kind]
+        db.run_query(
+            "DELETE FROM {} WHERE {} BETWEEN %(low)s AND %(high)s".format(table, column),
+            {'low': low, 'high': high},
+            return_val=False,
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--project-id', type=int, required=True)
+    parser.add_argument('--projects', type=int, default=1,
+                        help='Number of projects, with consecutive ids from --project-id')
+    parser.add_argument('--folders', type=int, default=100)
+    parser.add_argument('--files-per-folder', type=int, default=500, help='Mean files per folder')
+    parser.add_argument('--folder-size-sigma', type=float, default=0.6,
+                        help='Spread of folder sizes (lognormal sigma; 0 for equal folders)')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='Mean share of failed checks')
+    parser.add_argument('--pending-rate', type=float, default=0.0, help='Share of checks still pending')
+    parser.add_argument('--exif-tags', type=int, default=len(synthetic.EXIF_TAGS),
+                        help='files_exif rows per file (max {})'.format(len(synthetic.EXIF_TAGS)))
+    parser.add_argument('--qc-fraction', type=float, default=0.5, help='Share of folders with visual QC done')
+    parser.add_argument('--qc-percent', type=int, default=10, help='Percent of files sampled in QC')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per INSERT')
+    parser.add_argument('--sqlite', metavar='PATH', help='Write to an embedded SQLite file instead')
+    parser.add_argument('--replace', action='store_true', help='Delete the project ids first')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        db.init_sqlite(args.sqlite)
+
+    for project_id in range(args.project_id, args.project_id + args.projects):
+        start = time.perf_counter()
+        if args.replace:
+            delete_project(project_id)
+        counts = synthetic.load(
+            synthetic.generate_project(
+                project_id,
+                folders=args.folders,
+                files_per_folder=args.files_per_folder,
+                error_rate=args.error_rate,
+                pending_rate=args.pending_rate,
+                folder_size_sigma=args.folder_size_sigma,
+                exif_tags=args.exif_tags,
+                qc_fraction=args.qc_fraction,
+                qc_percent=args.qc_percent,
+                seed=args.seed,
+            ),
+            db.executemany,
+            chunk_size=args.chunk_size,
+        )
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        print("project {}: {} rows in {:.1f}s ({:.0f} rows/s)".format(
+            project_id, total, elapsed, total / elapsed if elapsed else 0))
+        for table, rows in sorted(counts.items()):
+            print("  {:<34} {:>12,}".format(table, rows))
+        logger.info("generate_synthetic_project: project %s, %s rows", project_id, total)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
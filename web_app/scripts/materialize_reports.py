@@ -18,11 +18,10 @@ import time
 from pathlib import Path
 from typing import Optional
 
-import pandas as pd
-
 import settings
 from logger import logger
-from osprey.db import run_query
+from osprey.db import run_query, stream_query
+from osprey.services import exports as export_service
 from osprey.services import reports as report_service
 
 
@@ -221,10 +220,14 @@ def _materialize_one(project_id: int, report_id: str) -> None:
         run_query(f"TRUNCATE TABLE `{table_name}`", return_val=False, log_vals=False)
         run_query(f"INSERT INTO `{table_name}` {select_sql}", return_val=False, log_vals=False)
 
-        data = run_query(f"SELECT * FROM `{table_name}`", log_vals=False)
-        df = pd.DataFrame(data if data else [])
-        df.to_csv(abs_csv, index=False)
-        df.to_excel(abs_xlsx, index=False)
+        # Stream the table into both artifacts so memory stays flat for
+        # multi-million-row reports.
+        with open(abs_csv, "w", newline="", encoding="utf-8") as csv_file:
+            row_count = export_service.write_rows(
+                stream_query(f"SELECT * FROM `{table_name}`"),
+                csv_file=csv_file,
+                xlsx_file=abs_xlsx,
+            )
 
         _cleanup_old_artifacts(str(materialized_view), {rel_csv, rel_xlsx})
 
@@ -234,7 +237,7 @@ def _materialize_one(project_id: int, report_id: str) -> None:
             report_id,
             status="succeeded",
             duration_ms=duration_ms,
-            row_count=len(df.index),
+            row_count=row_count,
             source_updated_at=source_updated_at,
             artifact_path_csv=rel_csv,
             artifact_path_xlsx=rel_xlsx,
@@ -7,6 +7,8 @@
 # Usage (from the web_app root, with settings.py available):
 #   ./scripts/run_nightly_reports.sh
 #
+# Set WARM_CACHE_URL (the site root) to pre-render the busiest pages afterwards.
+#
 # Cron example (2:00 AM): see scripts/cron/nightly_reports.cron.example
 
 set -euo pipefail
@@ -36,4 +38,9 @@ echo "$(date -Is) queueing pregenerated reports"
 echo "$(date -Is) materializing until queue empty"
 "${PYTHON}" scripts/materialize_reports.py --until-empty
 
+if [[ -n "${WARM_CACHE_URL:-}" ]]; then
+  echo "$(date -Is) warming page cache"
+  "${PYTHON}" scripts/warm_cache.py --base-url "${WARM_CACHE_URL}" || echo "$(date -Is) cache warm-up failed"
+fi
+
 echo "$(date -Is) nightly reports complete"
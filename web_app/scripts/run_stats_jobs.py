@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Drain the debounced folder/project stats queue.
+
+The worker API queues ``stats_jobs`` rows for ``property=stats`` (see
+``osprey/services/stats_jobs.py``). Each pass claims every due job of one
+project, recalculates those folders, rolls the project up once and then
+evicts the cached pages of the project and folders. Run it as a service
+with ``--loop``:
+
+    PYTHONPATH=. python scripts/run_stats_jobs.py --loop 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from flask import Flask
+
+import settings
+from cache import cache
+from osprey.invalidation import publish
+from osprey.services import stats_jobs
+
+# Jobs running longer than this are assumed lost with their runner.
+STALE_SECONDS = getattr(settings, 'stats_jobs_stale_seconds', 1800)
+# How often a looping runner checks for such jobs.
+REQUEUE_EVERY_SECONDS = 60
+
+
+def run_one() -> bool:
+    claim = stats_jobs.claim_next()
+    if not claim:
+        return False
+    try:
+        stats_jobs.run_claimed(claim)
+    except Exception:
+        # Logged and recorded on the jobs by run_claimed.
+        return True
+    publish(claim['project_id'], project_alias=claim['project_alias'], summary=True)
+    for folder_id in claim['folder_ids']:
+        publish(claim['project_id'], folder_id=folder_id, project_alias=claim['project_alias'])
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run queued folder/project stats recalculations.")
+    parser.add_argument("--once", action="store_true", help="Run at most one project's jobs then exit.")
+    parser.add_argument(
+        "--loop",
+        type=int,
+        default=0,
+        help="If >0, keep running, polling every N seconds when the queue is empty.",
+    )
+    args = parser.parse_args()
+
+    # Cache eviction needs an app context bound to the shared cache.
+    app = Flask(__name__)
+    cache.init_app(app)
+    with app.app_context():
+        if args.once:
+            stats_jobs.requeue_stale(STALE_SECONDS)
+            run_one()
+            return 0
+        next_requeue = 0
+        while True:
+            if time.monotonic() >= next_requeue:
+                stats_jobs.requeue_stale(STALE_SECONDS)
+                next_requeue = time.monotonic() + REQUEUE_EVERY_SECONDS
+            if run_one():
+                continue
+            if not args.loop:
+                return 0
+            time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Pre-render the most visited pages into the shared cache.
+
+Run after the nightly report and stats jobs so morning visitors hit warm
+entries. Requests the homepage tabs, then for each active project its
+dashboard, statistics page, ``/api/projects/<alias>`` and its most recent
+folders, as an anonymous visitor over HTTP: pages land in the page cache
+(``osprey/pagecache.py``) exactly as a real visit would store them, in the
+store every app node shares.
+
+At most ``--concurrency`` requests run at once and no new request starts
+after ``--budget`` seconds; whatever did not fit is left for visitors.
+
+    PYTHONPATH=. python scripts/warm_cache.py --base-url https://example.si.edu/osprey
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import settings
+from logger import logger
+from osprey.db import run_query
+
+HOMEPAGE_PATHS = ('/', '/team/md', '/team/is', '/team/inf')
+
+
+def list_active_projects() -> list[dict]:
+    rows = run_query(
+        "SELECT project_id, project_alias FROM projects "
+        " WHERE project_status = 'Ongoing' AND project_alias IS NOT NULL AND skip_project IS NOT True "
+        " ORDER BY updated_at DESC",
+        log_vals=False,
+    )
+    if rows is False:
+        raise RuntimeError("Failed to list active projects")
+    return rows or []
+
+
+def list_recent_folders(project_id: int, limit: int) -> list[int]:
+    if limit <= 0:
+        return []
+    rows = run_query(
+        "SELECT folder_id FROM folders WHERE project_id = %(project_id)s "
+        " ORDER BY updated_at DESC LIMIT %(limit)s",
+        {'project_id': project_id, 'limit': limit},
+        log_vals=False,
+    )
+    return [row['folder_id'] for row in rows or []]
+
+
+def warm_paths(folders_per_project: int) -> list[str]:
+    """Paths in warm-up order: homepage tabs, then project pages, then folders."""
+    projects = list_active_projects()
+    paths = list(HOMEPAGE_PATHS)
+    for project in projects:
+        alias = project['project_alias']
+        paths += ['/dashboard/{}/'.format(alias),
+                  '/dashboard/{}/statistics/'.format(alias),
+                  '/api/projects/{}'.format(alias)]
+    for project in projects:
+        paths += ['/dashboard/{}/{}/'.format(project['project_alias'], folder_id)
+                  for folder_id in list_recent_folders(project['project_id'], folders_per_project)]
+    return paths
+
+
+def fetch(url: str, timeout: float) -> tuple[str, int | str, float]:
+    start = time.perf_counter()
+    request = urllib.request.Request(url, headers={'User-Agent': 'osprey-warm-cache'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.headers.get('X-Osprey-Cache', response.status)
+    except urllib.error.HTTPError as err:
+        status = err.code
+    except (urllib.error.URLError, TimeoutError, OSError) as err:
+        status = str(getattr(err, 'reason', err))
+    return url, status, time.perf_counter() - start
+
+
+def warm(base_url: str, paths: list[str], concurrency: int, budget: float, timeout: float) -> dict:
+    """Request ``paths``; returns counts of 'miss' (rendered), 'hit', 'error' and 'skipped'."""
+    deadline = time.monotonic() + budget
+    counts = {'miss': 0, 'hit': 0, 'error': 0, 'skipped': 0}
+    pending = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for path in paths:
+            if time.monotonic() >= deadline:
+                counts['skipped'] += 1
+                continue
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _record(done, counts)
+                if time.monotonic() >= deadline:
+                    counts['skipped'] += 1
+                    continue
+            pending.add(pool.submit(fetch, base_url.rstrip('/') + path, timeout))
+        done, _ = wait(pending)
+        _record(done, counts)
+    return counts
+
+
+def _record(done, counts):
+    for future in done:
+        url, status, elapsed = future.result()
+        if status in ('hit', 'miss'):
+            counts[status] += 1
+        elif status == 200:
+            # Not a cached view (or served to a kiosk address): rendered anyway.
+            counts['miss'] += 1
+        else:
+            counts['error'] += 1
+            logger.warning("warm_cache: %s -> %s", url, status)
+        logger.debug("warm_cache: %s -> %s in %.2fs", url, status, elapsed)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default=getattr(settings, 'warm_cache_url', None),
+                        help='Site root the pages are requested from (default: settings.warm_cache_url)')
+    parser.add_argument('--folders-per-project', type=int, default=10,
+                        help='Most recently updated folders to warm per project')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight at once')
+    parser.add_argument('--budget', type=float, default=600, help='Seconds after which no request starts')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds per request')
+    args = parser.parse_args()
+    if not args.base_url:
+        parser.error('--base-url is required (or set warm_cache_url in settings.py)')
+
+    start = time.perf_counter()
+    try:
+        paths = warm_paths(args.folders_per_project)
+    except Exception:
+        logger.exception("warm_cache: failed to list projects")
+        return 1
+    counts = warm(args.base_url, paths, args.concurrency, args.budget, args.timeout)
+    logger.info("warm_cache: %s paths in %.0fs | rendered=%s already_warm=%s errors=%s skipped=%s",
+                len(paths), time.perf_counter() - start, counts['miss'], counts['hit'],
+                counts['error'], counts['skipped'])
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
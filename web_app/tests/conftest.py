@@ -0,0 +1,36 @@
+"""Shared test setup: a stand-in ``osprey.db`` and a small Flask app (no MySQL)."""
+
+import sys
+import types
+from unittest.mock import MagicMock
+
+import pytest
+
+# Stub DB before test modules import services (test env may lack mysql.connector).
+if 'osprey.db' not in sys.modules:
+    _db = types.ModuleType('osprey.db')
+    _db.run_query = MagicMock(return_value=[])
+    _db.query_database_insert = MagicMock()
+    _db.batch = MagicMock()
+    _db.executemany = MagicMock()
+    sys.modules['osprey.db'] = _db
+
+
+@pytest.fixture
+def app():
+    """Flask app with anonymous users and an empty SimpleCache; ``app.calls`` counts view runs."""
+    pytest.importorskip('flask_caching')
+    pytest.importorskip('flask_login')
+    from flask import Flask
+    from flask_login import LoginManager
+
+    from cache import cache
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    LoginManager(app).user_loader(lambda user_id: None)
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+    with app.app_context():
+        cache.clear()
+    app.calls = {'n': 0}
+    return app
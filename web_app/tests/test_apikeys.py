@@ -0,0 +1,71 @@
+"""Tests for the API key cache and the buffered usage log."""
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from osprey import apikeys
+
+KEY = '0f8fad5b-d9cb-469f-a165-70867728950e'
+
+
+@pytest.fixture
+def run_query(monkeypatch):
+    rows = {KEY: {'api_key': KEY, 'is_admin': 0}}
+    mock = MagicMock(side_effect=lambda query, params, **kw: [rows[params['api_key']]]
+                     if query.startswith('SELECT') and params['api_key'] in rows else [])
+    monkeypatch.setattr(apikeys, 'run_query', mock)
+    apikeys.forget()
+    yield mock
+    apikeys.forget()
+
+
+def test_active_keys_are_cached(run_query):
+    assert apikeys.lookup(KEY) == {'is_admin': False}
+    assert apikeys.lookup(KEY) == {'is_admin': False}
+    assert run_query.call_count == 1
+    # Unknown keys are looked up every time.
+    assert apikeys.lookup('unknown') is None
+    assert apikeys.lookup('unknown') is None
+    assert run_query.call_count == 3
+
+
+def test_revoke_drops_the_cached_key(run_query):
+    apikeys.lookup(KEY)
+    apikeys.revoke(KEY)
+    assert 'UPDATE api_keys SET is_active = 0' in run_query.call_args_list[-1].args[0]
+    apikeys.lookup(KEY)
+    assert run_query.call_count == 3
+
+
+def test_expired_keys_are_looked_up_again(run_query, monkeypatch):
+    monkeypatch.setattr(apikeys, 'KEY_CACHE_SECONDS', 0)
+    apikeys.lookup(KEY)
+    apikeys.lookup(KEY)
+    assert run_query.call_count == 2
+
+
+def test_usage_rows_are_written_in_batches(monkeypatch):
+    writes = []
+    monkeypatch.setattr(apikeys, 'executemany', lambda query, rows: writes.append(rows))
+    buffer = apikeys.UsageBuffer('INSERT ...', maxsize=3, batch_size=2)
+    monkeypatch.setattr(buffer, '_ensure_thread', lambda: None)
+    for n in range(4):
+        buffer.record({'n': n})
+    assert buffer.dropped == 1
+    buffer.flush()
+    assert writes == [[{'n': 0}, {'n': 1}], [{'n': 2}]]
+
+
+def test_flusher_thread_writes_queued_rows(monkeypatch):
+    written = MagicMock()
+    monkeypatch.setattr(apikeys, 'executemany', written)
+    buffer = apikeys.UsageBuffer('INSERT ...', batch_size=10, flush_seconds=0.05)
+    buffer.record({'n': 1})
+    buffer.record({'n': 2})
+    for _ in range(100):
+        if written.called:
+            break
+        time.sleep(0.02)
+    written.assert_called_once_with('INSERT ...', [{'n': 1}, {'n': 2}])
@@ -0,0 +1,107 @@
+"""Tests for the ArchivesSpace client against a local stub server."""
+
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from osprey.services.aspace import ASpaceClient
+
+
+class _StubASpace(BaseHTTPRequestHandler):
+    refids = {'ref_a', 'ref_b'}
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.logins += 1
+            server.token = 'token{}'.format(server.logins)
+        if urllib.parse.urlparse(self.path).path != '/users/osprey/login':
+            return self._reply(404, {})
+        self._reply(200, {'session': server.token})
+
+    def do_GET(self):
+        server = self.server
+        if self.headers.get('X-ArchivesSpace-Session') != server.token:
+            return self._reply(412, {'error': 'session expired'})
+        url = urllib.parse.urlparse(self.path)
+        refid = urllib.parse.parse_qs(url.query)['ref_id[]'][0]
+        with server.lock:
+            server.lookups.append(refid)
+        if refid == 'broken':
+            return self._reply(500, {})
+        objects = [{'ref': '/x', '_resolved': {'ref_id': refid}}] if refid in self.refids else []
+        self._reply(200, {'archival_objects': objects})
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubASpace)
+    server.lock = threading.Lock()
+    server.logins = 0
+    server.token = None
+    server.lookups = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **kwargs):
+    return ASpaceClient('http://127.0.0.1:{}'.format(server.server_port), 'osprey', 'secret', **kwargs)
+
+
+def test_one_login_and_cached_lookups(server):
+    client = _client(server)
+    assert client.lookup('ref_a') is True
+    assert client.lookup('ref_a') is True
+    assert client.lookup('missing') is False
+    assert client.lookup('missing') is False
+    assert server.logins == 1
+    assert server.lookups == ['ref_a', 'missing']
+
+
+def test_rejected_session_logs_in_again(server):
+    client = _client(server)
+    client.lookup('ref_a')
+    server.token = 'rotated'
+    assert client.lookup('ref_b') is True
+    assert server.logins == 2
+
+
+def test_session_expires_after_session_seconds(server):
+    client = _client(server, session_seconds=0)
+    client.lookup('ref_a')
+    client.lookup('ref_b')
+    assert server.logins == 2
+
+
+def test_failures_are_not_cached(server):
+    client = _client(server)
+    assert client.lookup('broken') is None
+    assert client.lookup('broken') is None
+    assert server.lookups == ['broken', 'broken']
+    assert ASpaceClient('http://127.0.0.1:1', 'osprey', 'secret', timeout=1).lookup('ref_a') is None
+
+
+def test_lookup_many_runs_concurrently_with_one_login(server):
+    client = _client(server, max_workers=4)
+    client.session()
+    refids = ['ref_a', 'ref_b', 'missing', 'ref_a']
+    assert client.lookup_many(refids) == {'ref_a': True, 'ref_b': True, 'missing': False}
+    assert server.logins == 1
+    assert sorted(server.lookups) == ['missing', 'ref_a', 'ref_b']
@@ -0,0 +1,81 @@
+"""Tests for cache hit/miss counters."""
+
+import time
+
+import pytest
+
+from osprey.cachestats import CacheStatsRegistry, namespace
+
+pytest.importorskip('flask_caching')
+
+from flask import Flask  # noqa: E402
+from flask_caching import Cache, function_namespace  # noqa: E402
+
+
+def test_namespace_groups_keys_by_owner():
+    assert namespace('page:0a1b') == 'page'
+    assert namespace('tag:project:3') == 'tag'
+    assert namespace('swr:osprey.services.homepage.team_summary:ab12') == 'swr:osprey.services.homepage.team_summary'
+    assert namespace('osprey.services.permissions.user_perms_memver') == 'memoize-version'
+    assert namespace('eClNRIbnIXrxIPd5NxFecH') == 'other'
+
+
+def test_registry_snapshot_and_hit_ratio():
+    stats = CacheStatsRegistry()
+    stats.record('page', 'l1_hits', 3)
+    stats.record('page', 'misses')
+    stats.record('tag', 'l2_hits')
+    data = stats.snapshot()
+    assert data['namespaces'][0]['namespace'] == 'page'
+    assert data['namespaces'][0]['hit_ratio'] == 0.75
+    assert data['totals']['hit_ratio'] == 0.8
+    assert 'page 75% of 4' in stats.summary()
+    stats.reset()
+    assert stats.snapshot()['namespaces'] == []
+
+
+def test_log_summary_is_due_once_per_interval():
+    stats = CacheStatsRegistry(log_seconds=0.01)
+    assert not stats.due()
+    time.sleep(0.02)
+    assert stats.due()
+    assert not stats.due()
+    assert not CacheStatsRegistry(log_seconds=0).due()
+
+
+@pytest.fixture
+def cache():
+    app = Flask(__name__)
+    cache = Cache(app, config={'CACHE_TYPE': 'osprey.tiercache.TwoTierCache',
+                               'CACHE_L2_TYPE': 'SimpleCache', 'CACHE_L1_SIZE': 2})
+    with app.app_context():
+        yield cache
+
+
+def _row(cache, name):
+    return next(r for r in cache.cache.stats.snapshot()['namespaces'] if r['namespace'] == name)
+
+
+def test_memoized_functions_are_counted_by_name(cache):
+    @cache.memoize()
+    def user_perms(project_id):
+        return project_id
+
+    for _ in range(3):
+        user_perms(1)
+    row = _row(cache, function_namespace(user_perms)[0])
+    assert (row['misses'], row['l1_hits'], row['sets']) == (1, 2, 1)
+
+
+def test_l1_evictions_and_tier_hits_are_counted(cache):
+    for n in range(3):
+        cache.set('page:{}'.format(n), n)
+    cache.cache.l1.clear()
+    cache.get('page:0')
+    cache.get('page:0')
+    row = _row(cache, 'page')
+    assert row['evictions'] == 1
+    assert (row['l2_hits'], row['l1_hits']) == (1, 1)
+    size = cache.cache.size()
+    assert size['l1']['entries'] == 1
+    assert size['l2']['entries'] == 3
@@ -0,0 +1,82 @@
+"""Tests for ETag / Last-Modified conditional GETs (small Flask app, no MySQL)."""
+
+import datetime
+import types
+
+import pytest
+
+pytest.importorskip('flask_caching')
+pytest.importorskip('flask_login')
+pytest.importorskip('flask_wtf')
+
+from osprey import conditional, pagecache  # noqa: E402
+
+STATS = datetime.datetime(2024, 5, 1, 10, 0, 0)
+FOLDERS = datetime.datetime(2024, 5, 2, 8, 30, 0)
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    rows = {'stats_updated_at': STATS, 'folders_updated_at': FOLDERS}
+    monkeypatch.setattr(pagecache, 'project_id_for_alias', {'alpha': 1}.get)
+    monkeypatch.setattr(conditional, 'run_query', lambda query, params=None: [dict(rows)])
+    calls = app.calls
+
+    @app.route('/dashboard/<project_alias>/', methods=['GET', 'POST'])
+    @conditional.conditional(conditional.project_validators)
+    def dashboard(project_alias):
+        calls['n'] += 1
+        return 'dashboard'
+
+    client = app.test_client()
+    client.calls = calls
+    client.rows = rows
+    return client
+
+
+def test_response_carries_validators(client):
+    response = client.get('/dashboard/alpha/')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.last_modified == FOLDERS.replace(tzinfo=datetime.timezone.utc)
+    assert 'no-cache' in response.headers['Cache-Control']
+
+
+def test_matching_etag_is_answered_without_running_the_view(client):
+    etag = client.get('/dashboard/alpha/').headers['ETag']
+    response = client.get('/dashboard/alpha/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert client.calls['n'] == 1
+
+
+def test_if_modified_since(client):
+    last_modified = client.get('/dashboard/alpha/').headers['Last-Modified']
+    assert client.get('/dashboard/alpha/', headers={'If-Modified-Since': last_modified}).status_code == 304
+    client.rows['stats_updated_at'] = FOLDERS + datetime.timedelta(minutes=1)
+    assert client.get('/dashboard/alpha/', headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_published_change_moves_last_modified(client):
+    last_modified = client.get('/dashboard/alpha/').headers['Last-Modified']
+    with client.application.app_context():
+        pagecache.invalidate_tags(pagecache.project_tag(1))
+    response = client.get('/dashboard/alpha/', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert response.last_modified > FOLDERS.replace(tzinfo=datetime.timezone.utc)
+
+
+def test_new_data_or_published_change_changes_the_etag(client):
+    etag = client.get('/dashboard/alpha/').headers['ETag']
+    client.rows['folders_updated_at'] = FOLDERS + datetime.timedelta(seconds=1)
+    assert client.get('/dashboard/alpha/', headers={'If-None-Match': etag}).status_code == 200
+    etag = client.get('/dashboard/alpha/').headers['ETag']
+    with client.application.app_context():
+        pagecache.invalidate_tags(pagecache.project_tag(1))
+    assert client.get('/dashboard/alpha/', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_post_and_logged_in_users_are_not_validated(client, monkeypatch):
+    assert 'ETag' not in client.post('/dashboard/alpha/').headers
+    monkeypatch.setattr(conditional, 'current_user', types.SimpleNamespace(is_authenticated=True))
+    assert 'ETag' not in client.get('/dashboard/alpha/').headers
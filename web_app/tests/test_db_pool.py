@@ -0,0 +1,86 @@
+"""Unit tests for the bounded connection pool (no MySQL server needed)."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from mysql.connector.errors import PoolError  # noqa: E402
+
+from osprey import pool as pool_module  # noqa: E402
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.time_zone = None
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeConnectorPool:
+    """Stands in for MySQLConnectionPool: raises PoolError when empty."""
+
+    def __init__(self, pool_name, pool_size, **config):
+        self.free = pool_size
+
+    def get_connection(self):
+        if self.free == 0:
+            raise PoolError("Failed getting connection; pool exhausted")
+        self.free -= 1
+        conn = _FakeConnection()
+        conn.close = lambda: setattr(self, 'free', self.free + 1)
+        return conn
+
+
+def _make_pool(size, overflow, timeout):
+    with patch.object(pool_module.pooling, 'MySQLConnectionPool', _FakeConnectorPool):
+        return pool_module.BoundedPool('test_pool', size=size, overflow=overflow, timeout=timeout, wait_log_ms=10000)
+
+
+@patch.object(pool_module.mysql.connector, 'connect', side_effect=lambda **kw: _FakeConnection())
+def test_overflow_connections_beyond_pool_size(mock_connect):
+    pool = _make_pool(size=1, overflow=1, timeout=0.1)
+    first = pool.get_connection()
+    second = pool.get_connection()
+    assert not first.overflow and second.overflow
+    assert mock_connect.call_count == 1
+    second.time_zone = '-05:00'
+    assert second._conn.time_zone == '-05:00'
+    stats = pool.snapshot()
+    assert stats['in_use'] == 2 and stats['overflow_in_use'] == 1
+    second.close()
+    second.close()
+    first.close()
+    assert pool.snapshot()['in_use'] == 0
+
+
+def test_exhausted_pool_times_out_and_counts():
+    pool = _make_pool(size=1, overflow=0, timeout=0.05)
+    held = pool.get_connection()
+    with pytest.raises(PoolError):
+        pool.get_connection()
+    assert pool.snapshot()['exhausted'] == 1
+    held.close()
+
+
+def test_waiting_borrower_gets_released_connection():
+    pool = _make_pool(size=1, overflow=0, timeout=2)
+    held = pool.get_connection()
+    threading.Timer(0.05, held.close).start()
+    start = time.perf_counter()
+    conn = pool.get_connection()
+    assert time.perf_counter() - start >= 0.04
+    stats = pool.snapshot()
+    assert stats['waits'] == 1 and stats['max_wait_ms'] > 0
+    conn.close()
+
+
+def test_size_above_connector_limit_becomes_overflow():
+    pool = _make_pool(size=40, overflow=2, timeout=1)
+    assert pool.size == 32
+    assert pool.overflow == 10
@@ -0,0 +1,86 @@
+"""Tests for request_id replay protection on worker writes."""
+
+import hashlib
+
+import pytest
+
+pytest.importorskip('flask_caching')
+
+from flask import jsonify  # noqa: E402
+
+from cache import cache  # noqa: E402
+from osprey import idempotency  # noqa: E402
+from osprey.idempotency import idempotent  # noqa: E402
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    revoked = set()
+    monkeypatch.setattr(idempotency.apikeys, 'lookup',
+                        lambda api_key: None if api_key in revoked else {'is_admin': True})
+    calls = []
+
+    @app.route('/update/<project_alias>', methods=['POST', 'GET'])
+    @idempotent
+    def update(project_alias=None):
+        calls.append(project_alias)
+        if project_alias == 'broken':
+            return jsonify({'error': 'db'}), 500
+        return jsonify({'result': True, 'calls': len(calls)})
+
+    client = app.test_client()
+    client.calls = calls
+    client.revoked = revoked
+    return client
+
+
+def test_replay_returns_stored_response_without_running_view(client):
+    data = {'api_key': 'k', 'request_id': 'r1', 'type': 'file'}
+    first = client.post('/update/p', data=data)
+    second = client.post('/update/p', data=data)
+    assert second.get_json() == first.get_json() == {'result': True, 'calls': 1}
+    assert second.headers['X-Osprey-Replayed'] == 'true'
+    assert client.calls == ['p']
+
+
+def test_replay_needs_an_active_api_key(client):
+    data = {'api_key': 'k', 'request_id': 'r1'}
+    client.post('/update/p', data=data)
+    client.revoked.add('k')
+    response = client.post('/update/p', data=data)
+    assert response.status_code == 403
+    assert 'X-Osprey-Replayed' not in response.headers
+    assert client.calls == ['p']
+
+
+def test_requests_without_request_id_or_other_keys_run(client):
+    client.post('/update/p', data={'api_key': 'k'})
+    client.post('/update/p', data={'api_key': 'k'})
+    client.post('/update/p', data={'api_key': 'k', 'request_id': 'r1'})
+    client.post('/update/p', data={'api_key': 'other', 'request_id': 'r1'})
+    client.post('/update/p', json={'api_key': 'k', 'request_id': 'r2', 'rows': []})
+    assert len(client.calls) == 5
+
+
+def test_reused_request_id_with_different_body_is_refused(client):
+    client.post('/update/p', data={'api_key': 'k', 'request_id': 'r1', 'value': '1'})
+    response = client.post('/update/p', data={'api_key': 'k', 'request_id': 'r1', 'value': '2'})
+    assert response.status_code == 422
+    assert len(client.calls) == 1
+
+
+def test_server_errors_are_not_stored(client):
+    data = {'api_key': 'k', 'request_id': 'r1'}
+    assert client.post('/update/broken', data=data).status_code == 500
+    assert client.post('/update/broken', data=data).status_code == 500
+    assert len(client.calls) == 2
+
+
+def test_retry_while_in_flight_gets_409(client):
+    scope = hashlib.sha1('update\0k\0r1'.encode()).hexdigest()
+    with client.application.app_context():
+        cache.add('lock:idem:' + scope, True)
+    response = client.post('/update/p', data={'api_key': 'k', 'request_id': 'r1'})
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '5'
+    assert client.calls == []
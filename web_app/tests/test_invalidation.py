@@ -0,0 +1,98 @@
+"""Tests for change events evicting cached pages (small Flask app, no MySQL)."""
+
+import pytest
+
+pytest.importorskip('flask_caching')
+pytest.importorskip('flask_login')
+pytest.importorskip('flask_wtf')
+
+from flask import jsonify, request  # noqa: E402
+
+from osprey import invalidation, pagecache  # noqa: E402
+
+PROJECTS = {'alpha': 1, 'beta': 2}
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(pagecache, 'project_id_for_alias', PROJECTS.get)
+    calls = app.calls
+
+    @app.route('/')
+    @pagecache.cached_page(tags=[pagecache.PROJECTS_TAG])
+    def home():
+        calls['n'] += 1
+        return 'home'
+
+    @app.route('/dashboard/<project_alias>/')
+    @app.route('/dashboard/<project_alias>/<folder_id>/')
+    @pagecache.cached_page(tags=pagecache.project_page_tags)
+    def dashboard(project_alias, folder_id=None):
+        calls['n'] += 1
+        return 'dashboard'
+
+    @app.route('/api/update/<project_alias>', methods=['POST', 'GET'])
+    @invalidation.publishes_changes
+    def update(project_alias=None):
+        if request.form.get('fail'):
+            return jsonify({'error': 'Missing args'}), 400
+        if request.form.get('queued'):
+            invalidation.nothing_published()
+        return jsonify({'result': True})
+
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+def _warm(client, *paths):
+    for path in paths:
+        client.get(path)
+    return client.calls['n']
+
+
+def test_folder_stats_update_evicts_project_folder_and_homepage(client):
+    before = _warm(client, '/', '/dashboard/alpha/', '/dashboard/alpha/7/', '/dashboard/beta/')
+    client.post('/api/update/alpha', data={'type': 'folder', 'property': 'stats', 'folder_id': '7'})
+    after = _warm(client, '/', '/dashboard/alpha/', '/dashboard/alpha/7/', '/dashboard/beta/')
+    # Everything re-rendered except the other project's dashboard.
+    assert after - before == 3
+
+
+def test_file_update_keeps_the_homepage(client):
+    before = _warm(client, '/', '/dashboard/alpha/', '/dashboard/alpha/7/')
+    client.post('/api/update/alpha', data={'type': 'file', 'property': 'filechecks', 'folder_id': '7'})
+    after = _warm(client, '/', '/dashboard/alpha/', '/dashboard/alpha/7/')
+    assert after - before == 2
+
+
+def test_failed_write_publishes_nothing(client):
+    before = _warm(client, '/', '/dashboard/alpha/')
+    client.post('/api/update/alpha', data={'fail': '1'})
+    client.get('/api/update/alpha')
+    assert _warm(client, '/', '/dashboard/alpha/') == before
+
+
+def test_queued_work_publishes_nothing(client):
+    before = _warm(client, '/', '/dashboard/alpha/')
+    client.post('/api/update/alpha', data={'type': 'folder', 'property': 'stats', 'queued': '1'})
+    assert _warm(client, '/', '/dashboard/alpha/') == before
+
+
+def test_subscribers_get_the_event_and_failures_are_isolated(client):
+    seen = []
+
+    def broken(project_id, folder_id, project_alias, summary):
+        raise RuntimeError('boom')
+
+    def record(project_id, folder_id, project_alias, summary):
+        seen.append((project_id, folder_id, project_alias, summary))
+
+    invalidation.subscribe(broken)
+    invalidation.subscribe(record)
+    try:
+        client.post('/api/update/beta', data={'folder_id': '9'})
+    finally:
+        invalidation.unsubscribe(broken)
+        invalidation.unsubscribe(record)
+    assert seen == [(2, '9', 'beta', False)]
@@ -0,0 +1,113 @@
+"""Tests for the anonymous page cache (small Flask app, no MySQL)."""
+
+import re
+import types
+
+import pytest
+
+pytest.importorskip('flask_caching')
+pytest.importorskip('flask_login')
+pytest.importorskip('flask_wtf')
+
+from flask import g, render_template_string  # noqa: E402
+from flask_wtf.csrf import generate_csrf  # noqa: E402
+
+from cache import cache  # noqa: E402
+from osprey import pagecache  # noqa: E402
+
+PAGE = '<meta name="csrf-token" content="{{ csrf_token() }}">{{ name }} {{ calls }}'
+
+
+@pytest.fixture
+def client(app):
+    app.jinja_env.globals['csrf_token'] = generate_csrf
+    calls = app.calls
+
+    @app.route('/page/<name>/', methods=['GET', 'POST'])
+    @pagecache.cached_page(tags=lambda name: [pagecache.project_tag(name)])
+    def page(name):
+        calls['n'] += 1
+        return render_template_string(PAGE, name=name, calls=calls['n'])
+
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+def _token(body):
+    return re.search(r'content="([^"]+)"', body).group(1)
+
+
+def test_second_get_is_served_from_cache(client):
+    first = client.get('/page/a/')
+    second = client.get('/page/a/')
+    assert client.calls['n'] == 1
+    assert first.headers['X-Osprey-Cache'] == 'miss'
+    assert second.headers['X-Osprey-Cache'] == 'hit'
+    assert second.get_data(as_text=True).endswith('a 1')
+
+
+def test_query_string_is_part_of_the_key(client):
+    client.get('/page/a/?x=1')
+    client.get('/page/a/?x=2')
+    client.get('/page/a/?x=1')
+    assert client.calls['n'] == 2
+
+
+def test_cached_page_carries_each_visitors_csrf_token(client):
+    first = _token(client.get('/page/a/').get_data(as_text=True))
+    other = client.application.test_client()
+    response = other.get('/page/a/')
+    assert response.headers['X-Osprey-Cache'] == 'hit'
+    second = _token(response.get_data(as_text=True))
+    assert second not in (first, '__osprey_csrf_token__')
+
+
+def test_page_built_from_stale_summaries_is_not_stored(client):
+    @client.application.route('/stale/')
+    @pagecache.cached_page()
+    def stale():
+        client.calls['n'] += 1
+        g.osprey_swr_stale = True
+        return 'stale'
+
+    client.get('/stale/')
+    assert 'X-Osprey-Cache' not in client.get('/stale/').headers
+    assert client.calls['n'] == 2
+
+
+def test_post_bypasses_cache(client):
+    client.get('/page/a/')
+    client.post('/page/a/')
+    assert client.calls['n'] == 2
+
+
+def test_kiosk_bypasses_cache(client, monkeypatch):
+    monkeypatch.setattr(pagecache.settings, 'kiosks', ['127.0.0.1'], raising=False)
+    client.get('/page/a/')
+    client.get('/page/a/')
+    assert client.calls['n'] == 2
+
+
+def test_authenticated_user_bypasses_cache(client, monkeypatch):
+    monkeypatch.setattr(pagecache, 'current_user', types.SimpleNamespace(is_authenticated=True))
+    client.get('/page/a/')
+    client.get('/page/a/')
+    assert client.calls['n'] == 2
+
+
+def test_invalidate_tags_evicts_only_that_project(client):
+    client.get('/page/a/')
+    client.get('/page/b/')
+    with client.application.app_context():
+        pagecache.invalidate_tags(pagecache.project_tag('a'))
+    client.get('/page/a/')
+    client.get('/page/b/')
+    assert client.calls['n'] == 3
+
+
+def test_invalidate_tags_increments_the_version(client):
+    with client.application.app_context():
+        pagecache.invalidate_tags(pagecache.project_tag('a'))
+        pagecache.invalidate_tags(pagecache.project_tag('a'))
+        assert cache.get('tag:project:a') == 2
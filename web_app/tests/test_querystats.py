@@ -0,0 +1,54 @@
+"""Unit tests for query timing aggregates."""
+
+from osprey.querystats import QueryStatsRegistry, RequestStats, fingerprint
+
+
+def test_fingerprint_groups_values():
+    a = fingerprint("SELECT * FROM files WHERE folder_id = 12 AND file_name = 'a.tif'")
+    b = fingerprint("select *  from files\n WHERE folder_id = 7 AND file_name = 'b.tif'")
+    assert a == b == "select * from files where folder_id = ? and file_name = ?"
+
+
+def test_fingerprint_placeholders_and_in_lists():
+    assert fingerprint("DELETE FROM t WHERE id = %(file_id)s") == "delete from t where id = ?"
+    assert fingerprint("SELECT 1 FROM t WHERE id IN (1, 2, 3)") == fingerprint("SELECT 1 FROM t WHERE id IN (4,5)")
+
+
+def test_request_stats_tracks_slowest():
+    stats = RequestStats()
+    stats.record("SELECT 1", 2.0)
+    stats.record("SELECT * FROM folders WHERE folder_id = 3", 10.0)
+    stats.record("SELECT 2", 1.0)
+    assert stats.count == 3
+    assert stats.total_ms == 13.0
+    assert stats.slowest == "select * from folders where folder_id = ?"
+    assert stats.server_timing() == 'db;dur=13.0;desc="3 queries"'
+
+
+def test_registry_snapshot_orders_endpoints_by_queries():
+    registry = QueryStatsRegistry()
+    many = RequestStats()
+    for i in range(30):
+        many.record("SELECT * FROM files WHERE file_id = {}".format(i), 1.0)
+        registry.record_statement("SELECT * FROM files WHERE file_id = {}".format(i), 1.0)
+    few = RequestStats()
+    few.record("SELECT 1", 5.0)
+    registry.record_request('home', few)
+    registry.record_request('dashboard', many)
+    snap = registry.snapshot()
+    assert snap['endpoints'][0]['endpoint'] == 'dashboard'
+    assert snap['endpoints'][0]['avg_queries'] == 30
+    assert snap['statements'] == [{
+        'fingerprint': 'select * from files where file_id = ?',
+        'count': 30, 'total_ms': 30.0, 'avg_ms': 1.0, 'max_ms': 1.0,
+    }]
+    assert len(snap['recent_requests']) == 2
+
+
+def test_registry_is_bounded():
+    registry = QueryStatsRegistry(max_statements=2)
+    registry.record_statement("SELECT a FROM t", 5.0)
+    registry.record_statement("SELECT b FROM t", 1.0)
+    registry.record_statement("SELECT c FROM t", 3.0)
+    keys = [s['fingerprint'] for s in registry.snapshot()['statements']]
+    assert keys == ["select a from t", "select c from t"]
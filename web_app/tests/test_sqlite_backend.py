@@ -0,0 +1,348 @@
+"""Service-layer tests on the embedded SQLite backend (no MySQL server needed)."""
+
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from osprey import synthetic  # noqa: E402
+from osprey.sqlite_backend import translate  # noqa: E402
+
+FOLDER_ID = 100001
+
+
+def _load_db_module():
+    path = Path(__file__).resolve().parents[1] / 'osprey' / 'db.py'
+    spec = importlib.util.spec_from_file_location('osprey_db_sqlite_test', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Other tests put a stub osprey.db in sys.modules; import the services against
+# a private copy of the real module so this file does not depend on test order.
+real_db = _load_db_module()
+_previous = sys.modules.get('osprey.db')
+sys.modules['osprey.db'] = real_db
+try:
+    from osprey.services import (  # noqa: E402
+        daily_throughput,
+        exif,
+        file_checks,
+        file_registration,
+        folder_details,
+        folder_stats,
+        img2obj,
+        name_index,
+        project_statistics,
+        stats_jobs,
+    )
+finally:
+    if _previous is None:
+        del sys.modules['osprey.db']
+    else:
+        sys.modules['osprey.db'] = _previous
+
+
+@pytest.fixture
+def db(monkeypatch):
+    module = real_db
+    module.init_sqlite()
+    synthetic.load(
+        synthetic.generate_project(1, folders=2, files_per_folder=12, error_rate=0.1),
+        module.executemany,
+    )
+    for service in (folder_details, daily_throughput, exif, file_checks, img2obj, name_index, project_statistics,
+                    stats_jobs):
+        monkeypatch.setattr(service, 'run_query', module.run_query)
+    monkeypatch.setattr(folder_stats, 'batch', module.batch)
+    monkeypatch.setattr(file_checks, 'batch', module.batch)
+    monkeypatch.setattr(exif, 'batch', module.batch)
+    monkeypatch.setattr(name_index, 'batch', module.batch)
+    monkeypatch.setattr(file_registration, 'batch', module.batch)
+    module.query_stats.reset()
+    return module
+
+
+def _statement_count(db):
+    return sum(s['count'] for s in db.query_stats.snapshot(limit=1000)['statements'])
+
+
+def test_translate_named_placeholders_and_upsert():
+    assert translate(
+        "INSERT INTO t (a, b) VALUES (%(a)s, '%s') ON DUPLICATE KEY UPDATE b = VALUES(b)", True,
+    ) == ["INSERT INTO t (a, b) VALUES (:a, '%s') ON CONFLICT DO UPDATE SET b = excluded.b"]
+
+
+def test_translate_multi_table_update():
+    assert translate(
+        "UPDATE projects_stats p, data SET p.images_taken = data.no_files "
+        "WHERE p.project_id = data.project_id", True,
+    ) == [
+        "UPDATE projects_stats AS p SET images_taken = data.no_files FROM data "
+        "WHERE (p.project_id = data.project_id)"
+    ]
+
+
+def test_translate_splits_statements_and_positional_params():
+    assert translate("DELETE FROM a WHERE x = %s; UPDATE b SET y = IF(%s, 1, 0)", False) == [
+        'DELETE FROM a WHERE x = ?',
+        'UPDATE b SET y = iif(?, 1, 0)',
+    ]
+
+
+def test_mysql_functions(db):
+    row = db.run_query(
+        "SELECT DATE_FORMAT('2024-03-05 14:07:09', '%Y-%m-%d %H:%i:%s') AS d, "
+        "CONCAT('a', 1) AS c, SUBSTRING_INDEX('P1_000001_002', '_', 2) AS s, "
+        "FORMAT(1234567.891, 2) AS f"
+    )[0]
+    assert row == {'d': '2024-03-05 14:07:09', 'c': 'a1', 's': 'P1_000001', 'f': '1,234,567.89'}
+
+
+def test_folder_files_payload_query_count(db):
+    payload, status, _ = folder_details.get_folder_files_payload(str(FOLDER_ID))
+    assert status == 200
+    assert len(payload['files']) == 12
+    assert [c['file_check'] for c in payload['files'][0]['file_checks']] == list(synthetic.DEFAULT_CHECKS)
+    # One statement per result set, however many files the folder has.
+    assert _statement_count(db) == 6
+
+
+def test_recalculate_folder_stats_is_repeatable(db):
+    first = folder_stats.recalculate_folder_stats(1, FOLDER_ID, 0)
+    second = folder_stats.recalculate_folder_stats(1, FOLDER_ID, 0)
+    assert first == second
+    assert first['no_files_total'] == 12
+    assert first['no_files_errors'] + first['no_files_ok'] == 12
+    folder = db.run_query(
+        "SELECT no_files_total, no_files_ok FROM folders WHERE folder_id = %(f)s", {'f': FOLDER_ID})[0]
+    assert folder == {'no_files_total': 12, 'no_files_ok': first['no_files_ok']}
+    badges = db.run_query(
+        "SELECT badge_type, badge_text FROM folders_badges WHERE folder_id = %(f)s ORDER BY badge_type",
+        {'f': FOLDER_ID})
+    assert {'badge_type': 'no_files', 'badge_text': '12 files'} in badges
+
+
+def test_recalculate_project_stats_rolls_up_folders(db):
+    folder_stats.recalculate_folder_stats(1, FOLDER_ID, 0)
+    folder_stats.recalculate_folder_stats(1, FOLDER_ID + 1, 0)
+    folder_stats.recalculate_project_stats(1, 0)
+    stats = db.run_query("SELECT images_taken, objects_digitized FROM projects_stats")[0]
+    assert stats['images_taken'] == 24
+    objects = db.run_query(
+        "SELECT COUNT(DISTINCT SUBSTRING_INDEX(file_name, '_', 2)) AS n FROM files")[0]['n']
+    assert stats['objects_digitized'] == objects
+
+
+def test_daily_throughput_rows(db):
+    rows = daily_throughput.load_daily_throughput_rows(1)
+    assert [r['day'] for r in rows] == ['2024-01-01', '2024-01-02']
+    assert all(r['images'] == 12 for r in rows)
+
+
+def test_statistics_page_context(db):
+    context = project_statistics.load_statistics_page_context('synthetic1')
+    assert context['found']
+    assert len(context['detail_stat_cards']) == 1
+    assert len(context['chart_figures']) == 1
+
+
+def _check_row(file_id, result, folder_id=FOLDER_ID, check='jhove'):
+    return {'file_id': file_id, 'folder_id': folder_id, 'file_check': check,
+            'check_results': result, 'check_info': 'bulk'}
+
+
+def test_bulk_file_checks_upsert_in_one_transaction(db):
+    files = [r['file_id'] for r in db.run_query(
+        "SELECT file_id FROM files WHERE folder_id = %(f)s", {'f': FOLDER_ID})]
+    rows = file_checks.parse_check_rows(
+        [_check_row(f, 1) for f in files] + [_check_row(files[0], 0, check='new_check')])
+    assert file_checks.bulk_upsert_file_checks(1, rows) == len(files) + 1
+    results = db.run_query(
+        "SELECT check_results, COUNT(*) AS n FROM files_checks "
+        " WHERE file_check = 'jhove' AND file_id IN (SELECT file_id FROM files WHERE folder_id = %(f)s)"
+        " GROUP BY check_results", {'f': FOLDER_ID})
+    assert results == [{'check_results': 1, 'n': len(files)}]
+    assert db.run_query("SELECT folder_id FROM files_checks WHERE file_check = 'new_check'") == [
+        {'folder_id': FOLDER_ID}]
+
+
+def test_bulk_file_checks_reject_files_of_other_folders(db):
+    file_id = db.run_query("SELECT MIN(file_id) AS f FROM files")[0]['f']
+    rows = file_checks.parse_check_rows([_check_row(file_id, 1, check='new_check'),
+                                         _check_row(file_id, 1, folder_id=FOLDER_ID + 1, check='other')])
+    with pytest.raises(ValueError, match=str(file_id)):
+        file_checks.bulk_upsert_file_checks(1, rows)
+    with pytest.raises(ValueError):
+        file_checks.bulk_upsert_file_checks(2, rows[:1])
+    assert db.run_query("SELECT COUNT(*) AS n FROM files_checks WHERE file_check IN ('new_check', 'other')") == [
+        {'n': 0}]
+
+
+def test_bulk_filename_checks_look_up_failing_refids_together(db, monkeypatch):
+    files = [r['file_id'] for r in db.run_query(
+        "SELECT file_id FROM files WHERE folder_id = %(f)s", {'f': FOLDER_ID})]
+    db.run_query("INSERT INTO projects_settings (project_id, project_setting, settings_value) "
+                 " VALUES (1, 'project_checks', 'filename')", return_val=False)
+    monkeypatch.setattr(file_checks, '_JPCA_PROJECT_IDS', {'1'})
+    lookups = []
+
+    class Client:
+        def lookup_many(self, refids):
+            lookups.append(refids)
+            return {refid: True for refid in refids}
+
+    monkeypatch.setattr(file_checks.aspace_service, 'get_client', Client)
+    rows = file_checks.parse_check_rows([{'file_id': f, 'folder_id': FOLDER_ID, 'file_check': 'filename'}
+                                         for f in files])
+    assert file_checks.bulk_upsert_file_checks(1, rows) == len(files)
+    # Every synthetic file of the project shares one RefID: one batched lookup.
+    assert len(lookups) == 1 and len(lookups[0]) == 1
+    assert db.run_query("SELECT refid FROM jpc_aspace_data") == [{'refid': lookups[0][0]}]
+    assert db.run_query(
+        "SELECT check_results, COUNT(*) AS n FROM files_checks WHERE file_check = 'filename' "
+        " GROUP BY check_results") == [{'check_results': 0, 'n': len(files)}]
+
+
+def test_parse_check_rows_validates_rows():
+    assert file_checks.parse_check_rows([{'file_id': 1, 'folder_id': 2, 'file_check': 'filename'}])[0][
+        'check_results'] is None
+    with pytest.raises(ValueError, match='computed by the server'):
+        file_checks.parse_check_rows([_check_row(1, 0, check='filename')], transcription=1)
+    with pytest.raises(ValueError, match='Row 1'):
+        file_checks.parse_check_rows([_check_row(1, 0), {'file_id': 2, 'file_check': 'jhove'}])
+    with pytest.raises(ValueError):
+        file_checks.parse_check_rows([])
+
+
+def test_register_files_maps_ids_and_flags_names_used_in_other_folders(db):
+    taken = db.run_query("SELECT file_name FROM files WHERE folder_id = %(f)s LIMIT 1", {'f': FOLDER_ID})[0]['file_name']
+    rows = file_registration.parse_file_rows([
+        {'filename': 'new_000001_001', 'timestamp': '2024-01-02 10:00:00', 'filetype': 'tif'},
+        {'filename': taken, 'timestamp': '2024-01-02 10:01:00', 'filetype': 'tif'},
+    ])
+    folder_id = db.run_query("SELECT folder_id FROM folders WHERE folder_id != %(f)s", {'f': FOLDER_ID})[0]['folder_id']
+    files = file_registration.register_files(1, folder_id, rows)
+    stored = {r['file_name']: r['file_id'] for r in db.run_query(
+        "SELECT file_id, file_name FROM files WHERE folder_id = %(f)s", {'f': folder_id})}
+    assert [f['file_id'] for f in files] == [stored['new_000001_001'], stored[taken]]
+    assert files[0]['unique_file'] == {'check_results': 0, 'check_info': ''}
+    assert files[1]['unique_file']['check_results'] == 1
+    # Registering again keeps the existing rows and ids.
+    assert file_registration.register_files(1, folder_id, rows) == files
+
+
+def test_register_files_checks_folder_and_rows(db):
+    rows = file_registration.parse_file_rows([{'filename': 'a.tif', 'timestamp': '2024-01-02'}])
+    with pytest.raises(ValueError, match='not in this project'):
+        file_registration.register_files(2, FOLDER_ID, rows)
+    with pytest.raises(ValueError, match='listed twice'):
+        file_registration.parse_file_rows([{'filename': 'a.tif', 'timestamp': 1}] * 2)
+    with pytest.raises(ValueError, match='Row 0'):
+        file_registration.parse_file_rows([{'filename': 'a.tif'}])
+    assert file_registration.unique_file_check(['a', 'b']) == (1, 'Files with the same name in folders: a, b')
+
+
+def _exiftool_json(date_created):
+    return [{'SourceFile': 'x.tif',
+             'System:FileSize': {'id': 'FileSize', 'val': '120 MB'},
+             'XMP:DateCreated': {'id': 'DateCreated', 'val': date_created},
+             'EXIF:Model': {'id': 272, 'val': 'Camera'}}]
+
+
+def test_store_exif_replaces_tags_and_derives_datetime_created(db):
+    file_ids = [r['file_id'] for r in db.run_query(
+        "SELECT file_id FROM files WHERE folder_id = %(f)s ORDER BY file_id LIMIT 2", {'f': FOLDER_ID})]
+    entries = exif.parse_exif_entries([
+        {'file_id': file_ids[0], 'filetype': 'tif', 'exiftool_json': _exiftool_json('2023:05:06 10:00:00')},
+        {'file_id': file_ids[1], 'filetype': 'tif', 'exiftool_json': json.dumps(_exiftool_json('2023:07:08'))},
+    ])
+    assert exif.store_exif(entries, project_id=1) == 4
+    tags = db.run_query("SELECT file_id, taggroup, tag, tagid, value FROM files_exif "
+                        " WHERE file_id IN (%(a)s, %(b)s) ORDER BY file_id, tag", {'a': file_ids[0], 'b': file_ids[1]})
+    assert [(t['taggroup'], t['tag'], t['value']) for t in tags[:2]] == [
+        ('XMP', 'DateCreated', '2023:05:06 10:00:00'), ('EXIF', 'Model', 'Camera')]
+    created = db.run_query("SELECT datetime_created FROM files WHERE file_id IN (%(a)s, %(b)s) ORDER BY file_id",
+                           {'a': file_ids[0], 'b': file_ids[1]})
+    assert [str(r['datetime_created'])[:10] for r in created] == ['2023-05-06', '2023-07-08']
+    assert exif.exif_folders(entries) == [FOLDER_ID]
+
+
+def test_exif_rows_keep_group_and_tag_of_colon_keys():
+    rows = exif.exif_rows(1, 'tif', [{'XMP:Region:Name': {'id': 'Name', 'val': 'a'}}])
+    assert (rows[0]['taggroup'], rows[0]['tag']) == ('XMP', 'Region')
+    with pytest.raises(ValueError, match='Entry 0'):
+        exif.parse_exif_entries([{'file_id': 1, 'filetype': 'tif',
+                                  'exiftool_json': [{'NoGroup': {'id': 'x', 'val': 'y'}}]}])
+
+
+def test_store_exif_rejects_files_of_other_projects(db):
+    entries = exif.parse_exif_entries([{'file_id': 1, 'filetype': 'tif', 'exiftool_json': _exiftool_json('2023')}])
+    with pytest.raises(ValueError, match='not in this project'):
+        exif.store_exif(entries, project_id=1)
+    with pytest.raises(ValueError, match='Entry 0'):
+        exif.parse_exif_entries([{'file_id': 1, 'filetype': 'tif', 'exiftool_json': '{}'}])
+
+
+def test_name_index_lookups(db):
+    synthetic.load(synthetic.generate_project(2, folders=1, files_per_folder=3), db.executemany)
+    folders = [r['folder_id'] for r in db.run_query("SELECT folder_id FROM folders WHERE project_id = 1")]
+    file_id, file_name = next((r['file_id'], r['file_name']) for r in db.run_query(
+        "SELECT file_id, file_name FROM files WHERE folder_id = %(f)s", {'f': folders[0]}))
+    assert name_index.same_name_in_project(1, file_id, folders[0]) == []
+    # The same name in another folder of the project and in another project.
+    db.run_query("INSERT INTO files (folder_id, file_name) VALUES (%(f)s, %(n)s)",
+                 {'f': folders[1], 'n': file_name}, return_val=False)
+    other_folder = db.run_query("SELECT folder_id FROM folders WHERE project_id = 2")[0]['folder_id']
+    db.run_query("INSERT INTO files (folder_id, file_name) VALUES (%(f)s, %(n)s)",
+                 {'f': other_folder, 'n': file_name}, return_val=False)
+    name_index.rebuild(1)
+    name_index.rebuild(2)
+    assert [r['project_folder'] for r in name_index.same_name_in_project(1, file_id, folders[0])] == [
+        db.run_query("SELECT project_folder FROM folders WHERE folder_id = %(f)s", {'f': folders[1]})[0]['project_folder']]
+    elsewhere = name_index.same_name_elsewhere(1, file_id)
+    assert [r['project_id'] for r in elsewhere] == [2]
+    name_index.unindex_file(elsewhere[0]['file_id'])
+    assert name_index.same_name_elsewhere(1, file_id) == []
+
+
+def test_stats_jobs_repeat_requests_push_the_job_back_up_to_the_cap(db, monkeypatch):
+    folder = db.run_query("SELECT folder_id FROM folders WHERE project_id = 1")[0]['folder_id']
+    monkeypatch.setattr(stats_jobs, 'DEBOUNCE_SECONDS', 0)
+    job = stats_jobs.enqueue(1, folder)
+    monkeypatch.setattr(stats_jobs, 'DEBOUNCE_SECONDS', 60)
+    assert stats_jobs.enqueue(1, folder) == job
+    # The repeat moved run_after forward, so the job is no longer due.
+    assert stats_jobs.claim_next() is None
+    db.run_query("UPDATE stats_jobs SET requested_at = DATE_SUB(NOW(), INTERVAL 600 SECOND)", return_val=False)
+    assert stats_jobs.enqueue(1, folder) == job
+    # ...but never past stats_debounce_max_seconds after the first request.
+    assert stats_jobs.claim_next()['folder_ids'] == [str(folder)]
+
+
+def test_stats_jobs_coalesce_per_folder_and_run_once_per_project(db, monkeypatch):
+    folders = [r['folder_id'] for r in db.run_query("SELECT folder_id FROM folders WHERE project_id = 1")]
+    monkeypatch.setattr(stats_jobs, 'DEBOUNCE_SECONDS', 60)
+    first = stats_jobs.enqueue(1, folders[0])
+    assert stats_jobs.enqueue(1, folders[0]) == first
+    assert stats_jobs.get_job(first)['requests'] == 2
+    # Still inside the debounce window.
+    assert stats_jobs.claim_next() is None
+
+    monkeypatch.setattr(stats_jobs, 'DEBOUNCE_SECONDS', 0)
+    second = stats_jobs.enqueue(1, folders[1])
+    db.run_query("UPDATE stats_jobs SET run_after = requested_at", return_val=False)
+    claim = stats_jobs.claim_next()
+    assert claim['project_alias'] == 'synthetic1'
+    assert claim['folder_ids'] == sorted(str(f) for f in folders)
+    # A request arriving while the job runs queues a new one.
+    assert stats_jobs.enqueue(1, folders[0]) not in (first, second)
+    stats_jobs.run_claimed(claim)
+    assert {stats_jobs.get_job(j)['status'] for j in (first, second)} == {'succeeded'}
+    assert db.run_query("SELECT COUNT(*) AS n FROM stats_jobs WHERE status = 'queued'") == [{'n': 1}]
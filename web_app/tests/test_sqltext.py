@@ -0,0 +1,26 @@
+"""Unit tests for read-only statement detection (replica routing)."""
+
+from osprey.sqltext import is_read_only
+
+
+def test_plain_reads_are_read_only():
+    assert is_read_only("SELECT * FROM folders WHERE folder_id = %(folder_id)s")
+    assert is_read_only("  (select 1) union (select 2)")
+    assert is_read_only("SHOW TABLES")
+    assert is_read_only("WITH d AS (SELECT 1 AS a) SELECT a FROM d")
+    assert is_read_only("SELECT updated_at, REPLACE(file_name, '.tif', '') FROM files")
+
+
+def test_writes_and_locks_go_to_primary():
+    assert not is_read_only("UPDATE folders SET status = 0")
+    assert not is_read_only("INSERT INTO files (file_name) VALUES (%s)")
+    assert not is_read_only("DELETE FROM folders_badges WHERE folder_id = 1")
+    assert not is_read_only("WITH data AS (SELECT 1 AS n) UPDATE projects_stats p, data SET p.images_taken = data.n")
+    assert not is_read_only("SELECT * FROM report_materializations FOR UPDATE")
+    assert not is_read_only("SELECT 1; DELETE FROM files")
+    assert not is_read_only("")
+
+
+def test_keywords_inside_strings_and_comments_are_ignored():
+    assert is_read_only("SELECT * FROM files WHERE file_name = 'update me'")
+    assert is_read_only("SELECT 1 /* delete later */")
@@ -0,0 +1,119 @@
+"""Tests for the stale-while-revalidate cache."""
+
+import threading
+
+import pytest
+
+pytest.importorskip('flask_caching')
+
+from flask import g  # noqa: E402
+
+from cache import cache  # noqa: E402
+from osprey import swr  # noqa: E402
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        yield app
+
+
+def _wait_for_refreshes():
+    for thread in threading.enumerate():
+        if thread.name == 'swr-refresh':
+            thread.join(5)
+
+
+def test_fresh_value_is_served_from_cache(app):
+    calls = []
+
+    @swr.stale_while_revalidate(soft=60, hard=600)
+    def total(section):
+        calls.append(section)
+        return len(calls)
+
+    assert total('MD') == 1
+    assert total('MD') == 1
+    assert total('IS') == 2
+    assert calls == ['MD', 'IS']
+
+
+def test_stale_value_is_returned_while_refreshing_in_background(app):
+    release = threading.Event()
+    values = iter([1, 2])
+
+    @swr.stale_while_revalidate(soft=0, hard=600)
+    def total():
+        value = next(values)
+        if value == 2:
+            release.wait(5)
+        return value
+
+    assert total() == 1
+    # Past the soft TTL: the caller does not wait for the refresh.
+    assert total() == 1
+    release.set()
+    _wait_for_refreshes()
+    assert total() == 2
+
+
+def test_one_refresh_per_key(app):
+    calls = []
+    release = threading.Event()
+
+    @swr.stale_while_revalidate(soft=0, hard=600)
+    def total():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return len(calls)
+
+    total()
+    for _ in range(5):
+        total()
+    release.set()
+    _wait_for_refreshes()
+    assert len(calls) == 2
+
+
+def test_failed_refresh_keeps_the_stale_value(app):
+    values = iter([1])
+
+    @swr.stale_while_revalidate(soft=0, hard=600)
+    def total():
+        return next(values)
+
+    assert total() == 1
+    assert total() == 1
+    _wait_for_refreshes()
+    assert total() == 1
+
+
+def test_hard_ttl_expiry_recomputes_synchronously(app):
+    values = iter([1, 2])
+
+    @swr.stale_while_revalidate(soft=60, hard=600)
+    def total():
+        return next(values)
+
+    assert total() == 1
+    cache.clear()
+    assert total() == 2
+
+
+def test_expired_group_is_refreshed_and_flags_the_request(app):
+    values = iter([1, 2])
+
+    @swr.stale_while_revalidate(soft=60, hard=600, group='projects')
+    def total():
+        return next(values)
+
+    assert total() == 1
+    swr.expire('projects')
+    with app.test_request_context():
+        assert total() == 1
+        assert g.pop('osprey_swr_stale') is True
+    _wait_for_refreshes()
+    with app.test_request_context():
+        assert total() == 2
+        assert 'osprey_swr_stale' not in g
@@ -0,0 +1,125 @@
+"""Tests for the two-tier cache backend.
+
+Two ``TwoTierCache`` instances over one ``SimpleCache`` stand in for two app
+nodes sharing Redis. ``test_redis_round_trip`` runs against a local Redis
+server (``OSPREY_TEST_REDIS_URL``, default ``redis://localhost:6379/15``)
+and is skipped when there is none.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip('flask_caching')
+
+from flask import Flask  # noqa: E402
+from flask_caching import Cache  # noqa: E402
+from flask_caching.backends.simplecache import SimpleCache  # noqa: E402
+
+from osprey.tiercache import LRU, TwoTierCache  # noqa: E402
+
+
+@pytest.fixture
+def nodes():
+    shared = SimpleCache()
+    return (TwoTierCache(shared, l1_size=10, l1_timeout=60, l1_bypass=('tag:',)),
+            TwoTierCache(shared, l1_size=10, l1_timeout=60, l1_bypass=('tag:',)))
+
+
+def test_second_node_reads_what_the_first_wrote(nodes):
+    a, b = nodes
+    a.set('k', {'rows': [1, 2]})
+    assert b.get('k') == {'rows': [1, 2]}
+    assert b.get_many('k', 'missing') == [{'rows': [1, 2]}, None]
+
+
+def test_l1_serves_reads_until_it_expires(nodes):
+    a, b = nodes
+    a.set('k', 1)
+    assert b.get('k') == 1
+    a.set('k', 2)
+    # b keeps its L1 copy for up to l1_timeout; a sees its own write.
+    assert b.get('k') == 1
+    assert a.get('k') == 2
+    b.l1.clear()
+    assert b.get('k') == 2
+
+
+def test_bypassed_keys_always_come_from_the_shared_store(nodes):
+    a, b = nodes
+    a.set('tag:project:1', 1, timeout=0)
+    assert b.get('tag:project:1') == 1
+    a.set('tag:project:1', 2, timeout=0)
+    assert b.get_many('tag:project:1') == [2]
+
+
+def test_delete_clears_both_tiers(nodes):
+    a, _ = nodes
+    a.set('k', 1)
+    a.delete('k')
+    assert a.get('k') is None
+    assert not a.has('k')
+
+
+def test_cached_values_cannot_be_mutated_by_callers(nodes):
+    a, _ = nodes
+    a.set('k', [1])
+    a.get('k').append(2)
+    assert a.get('k') == [1]
+
+
+def test_lru_is_bounded_and_evicts_least_recently_used():
+    lru = LRU(maxsize=2)
+    lru.set('a', 1, 60)
+    lru.set('b', 2, 60)
+    lru.get('a')
+    lru.set('c', 3, 60)
+    assert len(lru) == 2
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+
+
+def test_lru_entries_expire():
+    lru = LRU(maxsize=2)
+    lru.set('a', 1, -1)
+    lru.set('b', 2, 0.000001)
+    assert lru.get('a') is None
+    assert lru.get('b') is None
+
+
+def test_flask_caching_builds_the_l2_from_config():
+    app = Flask(__name__)
+    cache = Cache(app, config={'CACHE_TYPE': 'osprey.tiercache.TwoTierCache',
+                               'CACHE_L2_TYPE': 'SimpleCache', 'CACHE_L1_SIZE': 5})
+    with app.app_context():
+        calls = []
+
+        @cache.memoize()
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        assert double(2) == double(2) == 4
+        cache.delete_memoized(double, 2)
+        double(2)
+    assert isinstance(cache.cache.l2, SimpleCache)
+    assert calls == [2, 2]
+
+
+def test_redis_round_trip():
+    redis = pytest.importorskip('redis')
+    url = os.environ.get('OSPREY_TEST_REDIS_URL', 'redis://localhost:6379/15')
+    try:
+        redis.from_url(url).ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip('no Redis server at {}'.format(url))
+    app = Flask(__name__)
+    config = {'CACHE_TYPE': 'osprey.tiercache.TwoTierCache', 'CACHE_L2_TYPE': 'RedisCache',
+              'CACHE_REDIS_URL': url, 'CACHE_KEY_PREFIX': 'osprey-test:'}
+    a, b = Cache(app, config=dict(config)), Cache(app, config=dict(config))
+    with app.app_context():
+        a.set('k', {'x': 1})
+        assert b.get('k') == {'x': 1}
+        a.clear()
+        b.cache.l1.clear()
+        assert b.get('k') is None
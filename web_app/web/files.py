@@ -9,9 +9,9 @@ from flask_login import current_user
 from flask_login import login_required
 
 import settings
-from cache import cache
 from logger import logger
 from osprey.files import attach_preview_paths, check_file_id, resolve_image_viewer, static_preview_path
+from osprey.pagecache import cached_page, project_page_tags
 from osprey.version import __version__
 from osprey.services import file_search as file_search_service
 from osprey.services import files as files_service
@@ -219,8 +219,8 @@ def preview_image(folder_id=None, file_id=None):
     return redirect(url_for('static', filename=path))
 
 
-@cache.memoize()
 @files_bp.route('/dashboard/<project_alias>/search_files', methods=['GET'], provide_automatic_options=False)
+@cached_page(tags=project_page_tags)
 def search_files(project_alias):
     """Search files by filename."""
     site_env = settings.env
@@ -1,14 +1,14 @@
 """Web views for invoice reconciliation."""
 
-import io
+import tempfile
 from datetime import datetime
 from time import strftime, localtime
 
 from flask import Blueprint
-from flask import Response
 from flask import redirect
 from flask import render_template
 from flask import request
+from flask import send_file
 from flask import url_for
 from flask_login import current_user
 from flask_login import login_required
@@ -111,11 +111,9 @@ def invoice_recon_dl(randomint=None):
     else:
         randomint = request.values.get('randomint')
         current_time = strftime("%Y%m%d_%H%M%S", localtime())
-        # from https://stackoverflow.com/a/68136716
-        buffer = io.BytesIO()
-        invoice_service.build_invoice_export(randomint).to_excel(buffer, index=False)
-        headers = {
-            'Content-Disposition': 'attachment; filename=invoice_reconciliation_{}.xlsx'.format(current_time),
-            'Content-type': 'application/vnd.ms-excel'
-        }
-        return Response(buffer.getvalue(), mimetype='application/vnd.ms-excel', headers=headers)
+        # Spool to disk instead of memory; send_file streams it back in chunks
+        export_file = tempfile.TemporaryFile()
+        invoice_service.write_invoice_export(randomint, export_file)
+        export_file.seek(0)
+        return send_file(export_file, mimetype='application/vnd.ms-excel', as_attachment=True,
+                         download_name='invoice_reconciliation_{}.xlsx'.format(current_time))
@@ -14,6 +14,7 @@ from flask_login import current_user
 
 import settings
 from cache import cache
+from osprey.conditional import conditional, report_validators
 from osprey.services import builtin_reports as builtin_report_service
 from osprey.services import reports as report_service
 from osprey.version import __version__
@@ -154,6 +155,7 @@ def report_refresh(project_alias=None, report_id=None):
 
 @reports_bp.route('/reports/<project_alias>/<report_id>/', methods=['GET'], provide_automatic_options=False)
 @reports_bp.route('/reports/<project_alias>/<report_id>/<rendering>', methods=['GET'], provide_automatic_options=False)
+@conditional(report_validators)
 def data_reports(project_alias=None, report_id=None, rendering=RENDERING_PENDING):
     """Report of a project"""
     site_env = settings.env